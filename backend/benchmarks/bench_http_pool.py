@@ -0,0 +1,158 @@
+"""
+Upstream client benchmark: a new httpx.AsyncClient per call (as the
+routers did) vs. the pooled, kept-alive clients from http_clients.
+
+Starts a local stub server in a subprocess that answers every GET with a
+KMB-ETA-sized JSON body over HTTP/1.1 keep-alive, plain and over TLS (a
+throwaway self-signed certificate made with the openssl CLI; skipped if
+it is missing). The stub can also add a simulated network round trip:
+one per response, and two more when a connection opens (TCP and TLS
+handshakes), so the localhost numbers can be read against a real link.
+
+Reports p50/p99 latency per request, for requests one after another and
+in bursts of concurrent requests (as transit_detail and the ETA pages
+make them).
+
+Run from the backend directory:
+    python -m benchmarks.bench_http_pool [--rtt MS]
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from routers.http_clients import HTTP2_AVAILABLE, ClientPool, Upstream
+
+REQUESTS = 300
+BURST = 8
+BODY = json.dumps({"type": "ETA", "data": [
+    {"co": "KMB", "route": str(r), "dir": "O", "service_type": 1, "seq": 12, "dest_en": "STAR FERRY",
+     "eta_seq": i, "eta": "2024-01-01T12:00:00+08:00", "rmk_en": ""} for r in range(8) for i in range(1, 4)
+]}).encode()
+
+
+def serve(port: int, cert: str, key: str, rtt_s: float, ready):
+    """Stub upstream: HTTP/1.1 keep-alive, fixed JSON body, optional TLS and simulated RTT"""
+    async def handle(reader, writer):
+        await asyncio.sleep(2 * rtt_s)  # TCP and TLS handshakes
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                if not head:
+                    break
+                await asyncio.sleep(rtt_s)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                             b"Content-Length: %d\r\nConnection: keep-alive\r\n\r\n%s" % (len(BODY), BODY))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def main():
+        context = None
+        if cert:
+            context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            context.load_cert_chain(cert, key)
+        server = await asyncio.start_server(handle, "127.0.0.1", port, ssl=context, backlog=256)
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def self_signed(directory: str):
+    """(cert, key) paths for localhost, or None without the openssl CLI"""
+    if not shutil.which("openssl"):
+        return None
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+                    "-keyout", key, "-out", cert], check=True, capture_output=True)
+    return cert, key
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return statistics.median(ordered), ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+
+async def timed(call) -> float:
+    t0 = time.perf_counter()
+    response = await call()
+    response.raise_for_status()
+    return (time.perf_counter() - t0) * 1000
+
+
+async def run(base_url: str):
+    pool = ClientPool({"stub": Upstream(base_url)})
+    url = f"{base_url}/v1/transport/kmb/eta/STOP/"
+
+    async def per_call():
+        async with httpx.AsyncClient() as client:
+            return await client.get(url)
+
+    async def pooled():
+        return await pool.get("stub").get(url)
+
+    results = {}
+    for label, call in (("new client per call", per_call), ("pooled client", pooled)):
+        await call()  # warm up (imports, the pool's first connection)
+        sequential = [await timed(call) for _ in range(REQUESTS)]
+        bursts = []
+        for _ in range(REQUESTS // BURST):
+            bursts += await asyncio.gather(*(timed(call) for _ in range(BURST)))
+        results[label] = (percentiles(sequential), percentiles(bursts))
+    await pool.aclose()
+    return results
+
+
+def main():
+    rtt_ms = float(sys.argv[sys.argv.index("--rtt") + 1]) if "--rtt" in sys.argv else 0.0
+    print(f"{REQUESTS} requests, {len(BODY) / 1000:.1f} KB body, simulated RTT {rtt_ms:g} ms, "
+          f"HTTP/2 {'available' if HTTP2_AVAILABLE else 'unavailable (h2 not installed)'}; the stub speaks HTTP/1.1")
+    print(f"{'scheme':<6} {'client':<20} {'sequential p50 / p99 ms':>24} {f'bursts of {BURST} p50 / p99 ms':>26}")
+    with tempfile.TemporaryDirectory() as tmp:
+        schemes = [("http", None)]
+        pair = self_signed(tmp)
+        if pair:
+            schemes.append(("https", pair))
+            # httpx reads this when it builds its SSL context
+            os.environ["SSL_CERT_FILE"] = pair[0]
+        for scheme, pair in schemes:
+            port = free_port()
+            ready = multiprocessing.Event()
+            server = multiprocessing.Process(target=serve, daemon=True,
+                                             args=(port, *(pair or ("", "")), rtt_ms / 1000, ready))
+            server.start()
+            ready.wait(10)
+            try:
+                host = "localhost" if pair else "127.0.0.1"
+                results = asyncio.run(run(f"{scheme}://{host}:{port}"))
+            finally:
+                server.terminate()
+                server.join()
+            for label, ((s50, s99), (b50, b99)) in results.items():
+                print(f"{scheme:<6} {label:<20} {f'{s50:.2f} / {s99:.2f}':>24} {f'{b50:.2f} / {b99:.2f}':>26}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+MTR journey lookup: find_mtr_connection's former line scan (the first
+line pair sharing a station, any shared station, "Central" when none)
+vs. the precomputed journeys in MTRNetwork.
+
+Reports:
+
+- time to build the network, and us per lookup for both
+- a check of every precomputed journey against Floyd-Warshall over the
+  same platform graph (equal minutes), and that each journey's legs and
+  changes add up to its duration
+- for every station pair, how often the former lookup returned the
+  "Central" fallback, and how many minutes slower its suggested route
+  was than the fastest one (costed on the same run and interchange times)
+
+Run from the backend directory:
+    python -m benchmarks.bench_mtr_network
+"""
+
+import itertools
+import statistics
+import time
+
+from routers.mtr_network import (DEFAULT_INTERCHANGE_MINUTES, INTERCHANGE_MINUTES, MTR_LINES,
+                                 MTRNetwork)
+
+# The former station lists: each line's branches run end to end
+OLD_LINES = {line: [s for i, branch in enumerate(branches) for s, _ in (branch if i == 0 else branch[1:])]
+             for line, branches in MTR_LINES.items()}
+
+
+def old_find_mtr_connection(start_station: str, end_station: str) -> dict:
+    """find_mtr_connection as it was"""
+    start_lines = []
+    end_lines = []
+    for line_name, stations in OLD_LINES.items():
+        if start_station in stations:
+            start_lines.append((line_name, stations.index(start_station)))
+        if end_station in stations:
+            end_lines.append((line_name, stations.index(end_station)))
+    for start_line, start_idx in start_lines:
+        for end_line, end_idx in end_lines:
+            if start_line == end_line:
+                return {"direct": True, "line": start_line, "transfer_at": None}
+    for start_line, start_idx in start_lines:
+        for end_line, end_idx in end_lines:
+            common = set(OLD_LINES[start_line]) & set(OLD_LINES[end_line])
+            if common:
+                return {"direct": False, "start_line": start_line, "end_line": end_line,
+                        "transfer_at": list(common)[0]}
+    return {"direct": False, "transfer_at": "Central"}
+
+
+def floyd_warshall(network: MTRNetwork):
+    """Station-to-station minutes over the network's platform graph"""
+    n = len(network.platforms)
+    inf = float("inf")
+    dist = [[0.0 if i == j else inf for j in range(n)] for i in range(n)]
+    for a, edges in enumerate(network._edges):
+        for b, minutes, _ in edges:
+            dist[a][b] = min(dist[a][b], minutes)
+    for k in range(n):
+        dk = dist[k]
+        for i in range(n):
+            dik = dist[i][k]
+            if dik == inf:
+                continue
+            di = dist[i]
+            for j in range(n):
+                if dik + dk[j] < di[j]:
+                    di[j] = dik + dk[j]
+    platforms = network._station_platforms
+    return {(a, b): min(dist[p][q] for p in platforms[i] for q in platforms[j])
+            for i, a in enumerate(network.stations) for j, b in enumerate(network.stations)}
+
+
+def main():
+    t0 = time.perf_counter()
+    network = MTRNetwork()
+    build_ms = (time.perf_counter() - t0) * 1000
+    pairs = list(itertools.product(network.stations, repeat=2))
+    print(f"{len(network)} stations, {len(network.platforms)} platforms, {len(pairs)} journeys "
+          f"precomputed in {build_ms:.0f} ms")
+
+    for label, lookup in (("line scan (before)", old_find_mtr_connection), ("precomputed", network.journey)):
+        t0 = time.perf_counter()
+        for a, b in pairs:
+            lookup(a, b)
+        print(f"  {label:<20} {(time.perf_counter() - t0) * 1e6 / len(pairs):6.2f} us per lookup")
+
+    fastest = floyd_warshall(network)
+    for a, b in pairs:
+        journey = network.journey(a, b)
+        assert abs(journey["duration_min"] - fastest[a, b]) < 1e-9, (a, b, journey, fastest[a, b])
+        changes = sum(INTERCHANGE_MINUTES.get(s, DEFAULT_INTERCHANGE_MINUTES) for s in journey["transfers"]
+                      if not any(leg.get("walk") and leg["from"] == s for leg in journey["legs"]))
+        assert abs(sum(leg["minutes"] for leg in journey["legs"]) + changes - journey["duration_min"]) < 1e-9, journey
+    print("every journey matches Floyd-Warshall and its legs add up")
+
+    # Each line alone, to cost the former suggestions on the same times
+    rides = {line: MTRNetwork({line: branches}, {}, {}) for line, branches in MTR_LINES.items()}
+
+    def ride(line, a, b):
+        journey = rides[line].journey(a, b)
+        return journey["duration_min"] if journey else None
+
+    fallbacks, excess = 0, []
+    for a, b in pairs:
+        if a == b:
+            continue
+        old = old_find_mtr_connection(a, b)
+        if old["direct"]:
+            minutes = ride(old["line"], a, b)
+        elif old.get("start_line"):
+            x = old["transfer_at"]
+            first, second = ride(old["start_line"], a, x), ride(old["end_line"], x, b)
+            minutes = None if first is None or second is None else (
+                first + second + (INTERCHANGE_MINUTES.get(x, DEFAULT_INTERCHANGE_MINUTES) if a != x != b else 0))
+        else:
+            fallbacks += 1
+            continue
+        excess.append(minutes - fastest[a, b])
+    slower = [e for e in excess if e > 1e-9]
+    total = len(pairs) - len(network)
+    print(f"former lookup over {total} station pairs: {fallbacks} fell back to \"Central\" "
+          f"({fallbacks / total:.0%}); of the rest, {len(slower)} suggested a slower route "
+          f"(median {statistics.median(slower) if slower else 0:g} min, worst {max(slower, default=0):g} min slower)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Nearby index resolution benchmark: the multi-level (Morton) stop index
+choosing a block level per query radius vs. the same index pinned to the
+former fixed 0.005 degree grid.
+
+Builds a synthetic stop set with districts of very different density
+(dense Mong Kok and Central, medium Sha Tin, sparse Yuen Long and Sai
+Kung, over a thin territory-wide spread), then sweeps query radii in each
+district and reports per query:
+
+- rows scanned (rows in the blocks covering the query's bounding box)
+- ms per query for the fixed grid and the adaptive index
+- the block level the adaptive index picked
+
+Both must return the same stops. Pass --python to force the pure-Python
+kernel.
+
+Run from the backend directory:
+    python -m benchmarks.bench_nearby_index [--python]
+"""
+
+import math
+import random
+import sys
+import time
+
+from routers.stop_store import BASE_CELL_DEG, StopStore
+
+TERRITORY = ((22.20, 22.50), (113.95, 114.30))
+SPREAD_STOPS = 3000
+TYPES = ["Bus Stop"] * 8 + ["Minibus", "Taxi Stand", "MTR", "Ferry Pier"]
+# name: (center, stops, spread in degrees)
+DISTRICTS = {
+    "Mong Kok": ((22.3193, 114.1694), 3000, 0.008),
+    "Central": ((22.2819, 114.1582), 1500, 0.006),
+    "Sha Tin": ((22.3817, 114.1887), 800, 0.015),
+    "Yuen Long": ((22.4450, 114.0220), 300, 0.02),
+    "Sai Kung": ((22.3814, 114.2705), 60, 0.02),
+}
+RADII = (200, 500, 800, 1500, 3000)
+QUERIES = 200
+FIXED_CELL_DEG = 0.005
+
+
+def synthetic_stops(seed: int = 19):
+    rng = random.Random(seed)
+    stops = [{"name": f"Stop {i}", "type": rng.choice(TYPES),
+              "lat": rng.uniform(*TERRITORY[0]), "lng": rng.uniform(*TERRITORY[1])}
+             for i in range(SPREAD_STOPS)]
+    for district, ((lat, lng), count, spread) in DISTRICTS.items():
+        stops += [{"name": f"{district} {i}", "type": rng.choice(TYPES),
+                   "lat": rng.gauss(lat, spread), "lng": rng.gauss(lng, spread)}
+                  for i in range(count)]
+    return stops
+
+
+def per_query_ms(run, origins) -> float:
+    t0 = time.perf_counter()
+    for lat, lng in origins:
+        run(lat, lng)
+    return (time.perf_counter() - t0) / len(origins) * 1000
+
+
+def main():
+    store = StopStore.build(synthetic_stops())
+    if "--python" in sys.argv:
+        store._lat_np = store._lng_np = store._type_np = None
+    kernel = "numpy" if store._lat_np is not None else "python"
+    fixed_level = round(math.log2(FIXED_CELL_DEG / BASE_CELL_DEG))
+    assert BASE_CELL_DEG * (1 << fixed_level) == FIXED_CELL_DEG
+
+    print(f"{len(store)} stops, {kernel} kernel, {QUERIES} queries per row, limit 50")
+    print(f"{'district':<10} {'radius':>6} {'in range':>9} {'rows fixed':>11} {'rows adapt':>11} "
+          f"{'level':>5} {'ms fixed':>9} {'ms adapt':>9} {'speedup':>8}")
+    rng = random.Random(1)
+    for district, ((lat0, lng0), _, spread) in DISTRICTS.items():
+        origins = [(rng.gauss(lat0, spread / 2), rng.gauss(lng0, spread / 2)) for _ in range(QUERIES)]
+        for radius in RADII:
+            in_range = rows_fixed = rows_adaptive = 0
+            for lat, lng in origins[:20]:
+                fixed = store.within(lat, lng, radius, None, 50, level=fixed_level)
+                assert fixed == store.within(lat, lng, radius, None, 50), (district, radius)
+                in_range += len(store.within(lat, lng, radius))
+                rows_fixed += sum(e - s for s, e in store._spans_for(lat, lng, radius, None, fixed_level))
+                rows_adaptive += sum(e - s for s, e in store._spans_for(lat, lng, radius, None))
+            level = store._level_for(lat0, radius)
+            ms_fixed = per_query_ms(lambda la, ln: store.within(la, ln, radius, None, 50, level=fixed_level), origins)
+            ms_adaptive = per_query_ms(lambda la, ln: store.within(la, ln, radius, None, 50), origins)
+            print(f"{district:<10} {radius:>6} {in_range / 20:>9.0f} {rows_fixed / 20:>11.0f} "
+                  f"{rows_adaptive / 20:>11.0f} {level:>5} {ms_fixed:>9.3f} {ms_adaptive:>9.3f} "
+                  f"{ms_fixed / ms_adaptive:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+query_nearby benchmark: the original list-of-dicts cache with per-point
+geopy geodesic vs. the columnar StopStore.
+
+Fills the nearby cache with a synthetic stop set (stops spread over the
+territory plus a dense cluster around Mong Kok, roughly matching the
+merged KMB/MTR/minibus/ferry/taxi data), then reports:
+
+- memory held by each representation, and the time to build the store
+  vs. loading it from a binary snapshot (a worker's cold start, minus
+  the network fetch that the snapshot also saves)
+- time and allocations per query from Mong Kok at 800 m and 1500 m for
+  the previous implementation (kept here for reference), the store with
+  numpy, and the store's pure-Python fallback
+
+- transit_detail's three queries (destination, plus bus stops and MTR
+  around the chosen stop) as separate query_nearby calls vs. one
+  query_nearby_batch, and a /batch request for points along a route
+- radius queries filtered by type (one grid per type), as in
+  transit_detail
+- k-nearest (ring search) against a radius query truncated to k, from
+  Mong Kok and from a sparse point in the New Territories
+
+Results are checked against geodesic: same stops (up to a 1 m band at the
+radius) and distances within 1 m.
+
+Run from the backend directory:
+    python -m benchmarks.bench_nearby_query
+"""
+
+import asyncio
+import math
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from geopy.distance import geodesic
+
+from routers.nearby_utils import _cache, query_nearby, query_nearby_batch
+from routers.stop_store import StopStore, np
+
+MONG_KOK = (22.3193, 114.1694)
+YUEN_LONG = (22.4450, 114.0220)
+TERRITORY = ((22.20, 22.50), (113.95, 114.30))
+SPREAD_STOPS = 6000
+MONG_KOK_STOPS = 2500
+TYPES = ["Bus Stop"] * 8 + ["Minibus", "Taxi Stand", "MTR", "Ferry Pier"]
+QUERIES = 200
+ROUTE_POINTS = 40
+CELL_SIZE_DEG = 0.005
+
+
+def synthetic_stops(seed: int = 8):
+    rng = random.Random(seed)
+    stops = []
+    for i in range(SPREAD_STOPS):
+        stops.append({"name": f"Stop {i}", "type": rng.choice(TYPES),
+                      "lat": rng.uniform(*TERRITORY[0]), "lng": rng.uniform(*TERRITORY[1])})
+    for i in range(MONG_KOK_STOPS):
+        stops.append({"name": f"Mong Kok {i}", "type": rng.choice(TYPES),
+                      "lat": rng.gauss(MONG_KOK[0], 0.01), "lng": rng.gauss(MONG_KOK[1], 0.01)})
+    return stops
+
+
+def grid_key(lat: float, lng: float, cell_size_deg: float):
+    return int(math.floor(lat / cell_size_deg)), int(math.floor(lng / cell_size_deg))
+
+
+def bbox_keys(lat: float, lng: float, radius_m: float, cell_size_deg: float):
+    """Fixed-grid cells covering the bounding box of a circle (the previous cache's lookup)"""
+    lat_deg = radius_m / 111320.0
+    lng_deg = radius_m / (111320.0 * max(math.cos(math.radians(lat)), 0.0001))
+    ix_min, iy_min = grid_key(lat - lat_deg, lng - lng_deg, cell_size_deg)
+    ix_max, iy_max = grid_key(lat + lat_deg, lng + lng_deg, cell_size_deg)
+    return [(ix, iy) for ix in range(ix_min, ix_max + 1) for iy in range(iy_min, iy_max + 1)]
+
+
+def dict_grid(points):
+    """The previous cache layout: cell -> list of point dicts"""
+    grid = {}
+    for p in points:
+        grid.setdefault(grid_key(p["lat"], p["lng"], CELL_SIZE_DEG), []).append(p)
+    return grid
+
+
+def geodesic_query(grid, lat, lng, radius_m, limit=50):
+    """The previous query_nearby loop (without the types filter)"""
+    candidates = []
+    for k in bbox_keys(lat, lng, radius_m, CELL_SIZE_DEG):
+        for p in grid.get(k, []):
+            d = geodesic((lat, lng), (p["lat"], p["lng"])).meters
+            if d <= radius_m:
+                item = p.copy()
+                item["distance"] = round(d)
+                item["walk_min"] = round(d / 70)
+                candidates.append(item)
+    candidates.sort(key=lambda x: x["distance"])
+    return candidates[:limit]
+
+
+def cold_start_ms(stops):
+    """(build ms, snapshot load ms), checking the loaded store matches"""
+    t0 = time.perf_counter()
+    built = StopStore.build(stops)
+    build_ms = (time.perf_counter() - t0) * 1000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "nearby_stops.bin")
+        built.save(path)
+        t0 = time.perf_counter()
+        loaded, _ = StopStore.load(path)
+        load_ms = (time.perf_counter() - t0) * 1000
+        assert list(loaded.cell_codes) == list(built.cell_codes) and loaded.type_names == built.type_names
+        assert all(loaded.row(r) == built.row(r) for r in range(0, len(built), 97))
+        del loaded
+    return build_ms, load_ms
+
+
+def use_store(store: StopStore, vectorized: bool):
+    if not vectorized:
+        store._lat_np = store._lng_np = store._type_np = None
+    _cache["store"] = store
+    _cache["fetched"] = True
+
+
+def traced_mb(build):
+    tracemalloc.start()
+    try:
+        value = build()
+        return value, tracemalloc.get_traced_memory()[0] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def per_query(run, origins, radius):
+    """(ms per query, KB allocated per query)"""
+    t0 = time.perf_counter()
+    for lat, lng in origins:
+        run(lat, lng, radius)
+    ms = (time.perf_counter() - t0) / len(origins) * 1000
+    tracemalloc.start()
+    for lat, lng in origins[:20]:
+        tracemalloc.reset_peak()
+        run(lat, lng, radius)
+    peak_kb = tracemalloc.get_traced_memory()[1] / 1e3
+    tracemalloc.stop()
+    return ms, peak_kb
+
+
+def check(grid, origins, radius):
+    """Compare the store's full result set with geodesic distances"""
+    loop = asyncio.new_event_loop()
+    for lat, lng in origins[:20]:
+        fast = loop.run_until_complete(query_nearby(lat, lng, radius, limit=100_000))
+        for item in fast:
+            exact = geodesic((lat, lng), (item["lat"], item["lng"])).meters
+            assert abs(item["distance"] - exact) <= 1.0, (item, exact)
+        found = {item["name"] for item in fast}
+        for item in geodesic_query(grid, lat, lng, radius, limit=100_000):
+            assert item["name"] in found or item["distance"] >= radius - 1, item
+    loop.close()
+
+
+def main():
+    stops, dicts_mb = traced_mb(lambda: (lambda pts: (pts, dict_grid(pts)))(synthetic_stops()))
+    stops, grid = stops
+    store, store_mb = traced_mb(lambda: StopStore.build(stops))
+
+    rng = random.Random(1)
+    origins = [(rng.gauss(MONG_KOK[0], 0.003), rng.gauss(MONG_KOK[1], 0.003)) for _ in range(QUERIES)]
+    loop = asyncio.new_event_loop()
+
+    def kernel(lat, lng, radius):
+        return loop.run_until_complete(query_nearby(lat, lng, radius))
+
+    def baseline(lat, lng, radius):
+        return geodesic_query(grid, lat, lng, radius)
+
+    print(f"{len(stops)} stops: list of dicts + grid {dicts_mb:.2f} MB, StopStore {store_mb:.2f} MB")
+    build_ms, load_ms = cold_start_ms(stops)
+    print(f"cold start: StopStore.build {build_ms:.1f} ms, snapshot load {load_ms:.1f} ms")
+    print(f"{QUERIES} queries around Mong Kok, limit 50; ms / KB allocated per query")
+    print(f"{'radius':>7} {'in range':>9} {'dicts+geodesic':>16} {'store numpy':>14} {'store python':>14}")
+    for radius in (800, 1500):
+        use_store(StopStore.build(stops), vectorized=True)
+        in_range = sum(len(store.within(lat, lng, radius)) for lat, lng in origins[:20]) / 20
+        # The geodesic baseline is slow; a smaller sample is enough
+        results = {"dicts+geodesic": per_query(baseline, origins[:40], radius)}
+        if np is not None:
+            check(grid, origins, radius)
+            results["numpy"] = per_query(kernel, origins, radius)
+        use_store(StopStore.build(stops), vectorized=False)
+        check(grid, origins, radius)
+        results["python"] = per_query(kernel, origins, radius)
+        cols = [f"{ms:.2f} / {kb:.0f}" for ms, kb in results.values()]
+        if np is None:
+            cols.insert(1, "-")
+        print(f"{radius:>7} {in_range:>9.0f} {cols[0]:>16} {cols[1]:>14} {cols[2]:>14}")
+
+    use_store(StopStore.build(stops), vectorized=np is not None)
+    dest = (MONG_KOK[0] - 0.012, MONG_KOK[1] + 0.004)
+    batch = [
+        {"lat": dest[0], "lng": dest[1], "radius_m": 800, "limit": 20},
+        {"lat": MONG_KOK[0], "lng": MONG_KOK[1], "radius_m": 1500, "limit": 15, "types": ["Bus Stop"]},
+        {"lat": MONG_KOK[0], "lng": MONG_KOK[1], "radius_m": 1500, "limit": 5, "types": ["MTR"]},
+    ]
+
+    async def separate():
+        return [await query_nearby(q["lat"], q["lng"], q["radius_m"], q.get("types"), q["limit"]) for q in batch]
+
+    assert loop.run_until_complete(separate()) == loop.run_until_complete(query_nearby_batch(batch))
+    timings = []
+    for run in (separate, lambda: query_nearby_batch(batch)):
+        t0 = time.perf_counter()
+        for _ in range(QUERIES):
+            loop.run_until_complete(run())
+        timings.append((time.perf_counter() - t0) / QUERIES * 1000)
+    print(f"transit_detail queries: 3 x query_nearby {timings[0]:.3f} ms, query_nearby_batch {timings[1]:.3f} ms")
+
+    # A /batch request for points along a route, 100 m apart
+    route = [{"lat": MONG_KOK[0] - 0.0009 * i, "lng": MONG_KOK[1] + 0.0002 * i, "radius_m": 300, "limit": 10}
+             for i in range(ROUTE_POINTS)]
+
+    async def one_by_one():
+        return [await query_nearby(q["lat"], q["lng"], q["radius_m"], None, q["limit"]) for q in route]
+
+    assert loop.run_until_complete(one_by_one()) == loop.run_until_complete(query_nearby_batch(route))
+    timings = []
+    for run in (one_by_one, lambda: query_nearby_batch(route)):
+        t0 = time.perf_counter()
+        for _ in range(QUERIES // 10):
+            loop.run_until_complete(run())
+        timings.append((time.perf_counter() - t0) / (QUERIES // 10) * 1000)
+    print(f"{ROUTE_POINTS} points along a route: {ROUTE_POINTS} x query_nearby {timings[0]:.2f} ms, "
+          f"query_nearby_batch {timings[1]:.2f} ms")
+
+    print("types filter, within 1500 m of Mong Kok, ms per query (numpy / python)")
+    for types, limit in ((["MTR"], 5), (["Bus Stop"], 15), (None, 50)):
+        cols = []
+        for vectorized in (True, False):
+            filtered = StopStore.build(stops)
+            if not vectorized or np is None:
+                filtered._lat_np = filtered._lng_np = filtered._type_np = None
+            codes = filtered.type_codes_for(types)
+            expected = [r for r in filtered.within(*MONG_KOK, 1500) if codes is None or filtered.type_codes[r[0]] in codes]
+            assert filtered.within(*MONG_KOK, 1500, codes) == expected
+            t0 = time.perf_counter()
+            for _ in range(QUERIES):
+                filtered.within(*MONG_KOK, 1500, codes, limit)
+            cols.append((time.perf_counter() - t0) / QUERIES * 1000)
+        print(f"  {', '.join(types) if types else 'all types':<26} {cols[0]:.3f} / {cols[1]:.3f}")
+
+    print("k-nearest vs radius + limit, ms per query (numpy / python)")
+    mtr = store.type_codes_for(["MTR"])
+    for label, (lat, lng), codes, k in (("5 nearest, Mong Kok", MONG_KOK, None, 5),
+                                        ("3 nearest MTR, Mong Kok", MONG_KOK, mtr, 3),
+                                        ("3 nearest MTR, Yuen Long", YUEN_LONG, mtr, 3)):
+        cols = []
+        for vectorized in (True, False):
+            ring = StopStore.build(stops)
+            if not vectorized or np is None:
+                ring._lat_np = ring._lng_np = ring._type_np = None
+            # The radius query needs a radius wide enough to hold k results
+            radius = 800
+            while len(ring.within(lat, lng, radius, codes, k)) < k:
+                radius *= 2
+            assert [r for r, _ in ring.nearest(lat, lng, k, codes)] == [r for r, _ in ring.within(lat, lng, radius, codes, k)]
+            for run in (lambda: ring.nearest(lat, lng, k, codes), lambda: ring.within(lat, lng, radius, codes, k)):
+                t0 = time.perf_counter()
+                for _ in range(QUERIES):
+                    run()
+                cols.append((time.perf_counter() - t0) / QUERIES * 1000)
+        print(f"  {label:<26} nearest {cols[0]:.3f} / {cols[2]:.3f}   within {radius} m {cols[1]:.3f} / {cols[3]:.3f}")
+
+
+if __name__ == "__main__":
+    main()
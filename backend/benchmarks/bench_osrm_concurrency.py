@@ -0,0 +1,194 @@
+"""
+OSRM concurrency check: the route endpoints' former blocking
+requests.get calls vs. the async client in routers.osrm, while OSRM is
+slow.
+
+Starts a stub OSRM server in a subprocess that answers /route and /table
+with valid bodies after DELAY seconds, points the pooled "osrm" client at
+it, and reports:
+
+- event loop lag (how late a 10 ms ticker wakes up, at worst) while a
+  coroutine waits on OSRM, calling requests.get as the endpoints did vs.
+  awaiting osrm.route
+- /api/nearby latency through the app while several /api/route/enhanced
+  requests are waiting on OSRM
+- that a call given a shorter timeout than the delay fails with
+  OSRMTimeout after that timeout, not after the delay
+
+Asserts that with the async client the ticker is never late by more than
+a small fraction of the delay and /api/nearby is served throughout.
+
+Run from the backend directory:
+    python -m benchmarks.bench_osrm_concurrency
+"""
+
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import statistics
+import time
+
+import httpx
+import requests
+
+from routers import http_clients, osrm
+from routers.http_clients import Upstream
+from routers.name_index import NameIndex
+from routers.nearby_utils import _swap_store
+from routers.stop_store import StopStore
+
+DELAY = 1.0
+TICK = 0.01
+CONCURRENT_ROUTES = 8
+START, END = (22.2988, 114.1722), (22.3193, 114.1694)
+
+
+def serve(port: int, delay: float, ready):
+    """Stub OSRM: every /route and /table answers Ok after delay seconds"""
+    async def handle(reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                path = head.split(b" ", 2)[1].decode()
+                points = path.split("?")[0].rsplit("/", 1)[1].split(";")
+                await asyncio.sleep(delay)
+                coords = [[float(v) for v in p.split(",")] for p in points]
+                if path.startswith("/table/"):
+                    n = len(coords)
+                    matrix = [[abs(i - j) * 60.0 for j in range(n)] for i in range(n)]
+                    body = {"code": "Ok", "durations": matrix, "distances": matrix}
+                else:
+                    body = {"code": "Ok", "routes": [{"distance": 2400.0, "duration": 1800.0,
+                                                      "geometry": {"type": "LineString", "coordinates": coords},
+                                                      "legs": [{"steps": []}]}]}
+                data = json.dumps(body).encode()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                             b"Content-Length: %d\r\nConnection: keep-alive\r\n\r\n%s" % (len(data), data))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, "127.0.0.1", port, backlog=256)
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def max_lag(work) -> float:
+    """Worst lateness (ms) of a TICK-second ticker while work() runs"""
+    worst = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal worst
+        while not done.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(TICK)
+            worst = max(worst, time.perf_counter() - t0 - TICK)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(TICK)
+    try:
+        await work()
+    finally:
+        done.set()
+        await task
+    return worst * 1000
+
+
+def synthetic_store() -> StopStore:
+    rng = random.Random(7)
+    return StopStore.build({"name": f"STOP {i}", "type": "Bus Stop", "stop_id": f"{i:016X}",
+                            "lat": 22.28 + rng.random() * 0.06, "lng": 114.14 + rng.random() * 0.06}
+                           for i in range(5000))
+
+
+async def run(base_url: str):
+    path = f"/route/v1/foot/{START[1]},{START[0]};{END[1]},{END[0]}"
+
+    async def blocking():
+        # What enhanced_route and transit_detail did: a sync call inside async def
+        requests.get(f"{base_url}{path}?overview=full&geometries=geojson", timeout=10).json()
+
+    async def awaited():
+        await osrm.route([START, END], profile="foot")
+
+    await awaited()  # warm up the pooled connection
+    print(f"event loop lag while one call waits {DELAY:g} s on OSRM (ticker every {TICK * 1000:g} ms):")
+    lags = {}
+    for label, work in (("requests.get (before)", blocking), ("await osrm.route", awaited)):
+        lags[label] = await max_lag(work)
+        print(f"  {label:<22} worst lateness {lags[label]:8.1f} ms")
+    assert lags["await osrm.route"] < DELAY * 1000 / 10, lags
+
+    # The app (without its lifespan: no snapshot load or refresher) over ASGI
+    from main import app
+    store = synthetic_store()
+    _swap_store(store, NameIndex(store))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+        route_body = {"start_lat": START[0], "start_lng": START[1], "end_lat": END[0], "end_lng": END[1]}
+        t0 = time.perf_counter()
+        routes = [asyncio.create_task(client.post("/api/route/enhanced", json=route_body))
+                  for _ in range(CONCURRENT_ROUTES)]
+        nearby = []
+        while not all(task.done() for task in routes):
+            t1 = time.perf_counter()
+            res = await client.get("/api/nearby/", params={"lat": 22.30, "lng": 114.17, "radius": 500})
+            res.raise_for_status()
+            nearby.append((time.perf_counter() - t1) * 1000)
+            await asyncio.sleep(0.02)
+        responses = await asyncio.gather(*routes)
+        elapsed = time.perf_counter() - t0
+    for res in responses:
+        res.raise_for_status()
+        assert res.json()["distance_m"] == 2400, res.json()
+    ordered = sorted(nearby)
+    p50, p99 = statistics.median(ordered), ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{CONCURRENT_ROUTES} concurrent /api/route/enhanced done in {elapsed:.2f} s; meanwhile "
+          f"{len(nearby)} /api/nearby requests, p50 {p50:.1f} ms, p99 {p99:.1f} ms")
+    assert elapsed < 2 * DELAY, elapsed
+    assert len(nearby) >= 10 and p99 < DELAY * 1000 / 4, nearby
+
+    t0 = time.perf_counter()
+    try:
+        await osrm.route([START, END], profile="foot", timeout=DELAY / 5)
+    except osrm.OSRMTimeout as e:
+        waited = time.perf_counter() - t0
+        print(f"timeout {DELAY / 5:g} s: {type(e).__name__} after {waited:.2f} s")
+        assert waited < DELAY / 2, waited
+    else:
+        raise AssertionError("expected OSRMTimeout")
+    await http_clients.pool.aclose()
+
+
+def main():
+    port = free_port()
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=serve, args=(port, DELAY, ready), daemon=True)
+    server.start()
+    ready.wait(10)
+    base_url = f"http://127.0.0.1:{port}"
+    http_clients.pool.upstreams = {**http_clients.UPSTREAMS, "osrm": Upstream(base_url, timeout=10.0)}
+    try:
+        asyncio.run(run(base_url))
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Search-space benchmark: A* vs. ALT landmarks vs. bidirectional search.
+
+The synthetic network is a jittered street grid cut by an "expressway"
+that can only be crossed at two footbridges, so the straight-line
+heuristic badly underestimates walks across it. This mimics a Central to
+Admiralty walk. Reports nodes settled and latency per query for each
+search mode, checking that all modes agree on the distance.
+
+If data/hk_pedestrian_network.{bin,geojson} exists, the same comparison
+also runs on a few real Central/Admiralty-style walks.
+
+Run from the backend directory:
+    python -m benchmarks.bench_pedestrian_alt
+"""
+
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from routers.pedestrian_alt import Landmarks
+from routers.pedestrian_router import PedestrianNetworkGraph, load_pedestrian_network
+from benchmarks.bench_pedestrian_load import ORIGIN_LAT, ORIGIN_LNG, SPACING_DEG
+
+SIDE = 150
+BARRIER_ROW = 75
+FOOTBRIDGE_COLS = (10, 140)
+
+REAL_WALKS = {
+    "Central -> Admiralty": (22.2820, 114.1580, 22.2790, 114.1650),
+    "IFC -> Pacific Place": (22.2855, 114.1590, 22.2775, 114.1660),
+    "Wan Chai -> Causeway Bay": (22.2775, 114.1730, 22.2800, 114.1840),
+}
+
+MODES = {
+    "A* (haversine)": lambda g, s, t: g._a_star_ids(s, t),
+    "A* (ALT)": lambda g, s, t: g._a_star_ids(s, t, use_landmarks=True),
+    "bidirectional (haversine)": lambda g, s, t: g._bidirectional_a_star_ids(s, t, use_landmarks=False),
+    "bidirectional (ALT)": lambda g, s, t: g._bidirectional_a_star_ids(s, t, use_landmarks=True),
+}
+
+
+def write_barrier_grid(path: Path, seed: int = 11):
+    rng = random.Random(seed)
+    jitter = 0.3 * SPACING_DEG
+    pos = [[(ORIGIN_LAT + r * SPACING_DEG + rng.uniform(-jitter, jitter),
+             ORIGIN_LNG + c * SPACING_DEG + rng.uniform(-jitter, jitter)) for c in range(SIDE)] for r in range(SIDE)]
+
+    def segment(a, b):
+        return {"type": "Feature", "properties": {},
+                "geometry": {"type": "LineString", "coordinates": [[a[1], a[0]], [b[1], b[0]]]}}
+
+    features = []
+    for r in range(SIDE):
+        for c in range(SIDE):
+            if c + 1 < SIDE:
+                features.append(segment(pos[r][c], pos[r][c + 1]))
+            if r + 1 < SIDE and (r != BARRIER_ROW or c in FOOTBRIDGE_COLS):
+                features.append(segment(pos[r][c], pos[r + 1][c]))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
+    return pos
+
+
+def compare(graph: PedestrianNetworkGraph, pairs, label: str):
+    print(f"\n{label}: {len(pairs)} queries")
+    print(f"{'mode':<28} {'settled/query':>14} {'ms/query':>9}")
+    reference = None
+    for name, search in MODES.items():
+        settled = 0
+        distances = []
+        t0 = time.perf_counter()
+        for s, t in pairs:
+            _, dist, n = search(graph, s, t)
+            settled += n
+            distances.append(dist)
+        elapsed = time.perf_counter() - t0
+        if reference is None:
+            reference = distances
+        else:
+            assert all(abs(a - b) < 1e-6 for a, b in zip(reference, distances)), f"{name} disagrees with A*"
+        print(f"{name:<28} {settled / len(pairs):>14.0f} {elapsed / len(pairs) * 1000:>9.2f}")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "barrier.geojson"
+        pos = write_barrier_grid(path)
+        graph = PedestrianNetworkGraph()
+        assert graph.load_from_geojson(path), "load failed"
+
+    t0 = time.perf_counter()
+    graph.landmarks = Landmarks.select(graph, 8)
+    print(f"{graph.node_count} nodes; selected 8 landmarks in {time.perf_counter() - t0:.1f} s")
+
+    def node_at(r, c):
+        return graph.find_nearest_node(*pos[r][c]).id
+
+    rng = random.Random(5)
+    across = [(node_at(BARRIER_ROW - rng.randint(1, 4), c), node_at(BARRIER_ROW + rng.randint(1, 5), c + rng.randint(-5, 5)))
+              for c in rng.sample(range(50, 100), 30)]
+    compare(graph, across, "Short walks across the expressway (Central -> Admiralty style)")
+
+    anywhere = [(rng.randrange(graph.node_count), rng.randrange(graph.node_count)) for _ in range(100)]
+    compare(graph, anywhere, "Random walks")
+
+    if load_pedestrian_network():
+        from routers import pedestrian_router
+        real = pedestrian_router._network
+        if real.landmarks is None:
+            real.landmarks = Landmarks.select(real, 8)
+        pairs = []
+        for s_lat, s_lng, e_lat, e_lng in REAL_WALKS.values():
+            s, e = real.find_nearest_node(s_lat, s_lng), real.find_nearest_node(e_lat, e_lng)
+            if s and e:
+                pairs.append((s.id, e.id))
+        if pairs:
+            compare(real, pairs, "HK pedestrian network: " + ", ".join(REAL_WALKS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Route cache benchmark.
+
+Replays a skewed workload (a few popular origin/destination pairs, such as
+MTR exits and malls, plus a long tail of one-off walks) through
+find_route, and reports cold vs. cached latency and the cache counters.
+
+Run from the backend directory:
+    python -m benchmarks.bench_pedestrian_cache [vertices]
+"""
+
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from routers.pedestrian_router import PedestrianNetworkGraph
+from benchmarks.bench_pedestrian_load import write_lattice
+
+QUERIES = 2000
+POPULAR = 20
+POPULAR_SHARE = 0.8
+
+
+def main():
+    vertices = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    tmp = tempfile.TemporaryDirectory()
+    path = Path(tmp.name) / "lattice.geojson"
+    write_lattice(path, vertices, seed=7)
+    graph = PedestrianNetworkGraph()
+    assert graph.load_from_geojson(path), "load failed"
+
+    rng = random.Random(4)
+
+    def random_point():
+        v = rng.randrange(graph.node_count)
+        return graph.lat[v] + rng.uniform(-5e-5, 5e-5), graph.lng[v] + rng.uniform(-5e-5, 5e-5)
+
+    popular = [random_point() + random_point() for _ in range(POPULAR)]
+    workload = [rng.choice(popular) if rng.random() < POPULAR_SHARE else random_point() + random_point()
+                for _ in range(QUERIES)]
+
+    cold = warm = 0.0
+    cold_n = warm_n = 0
+    for query in workload:
+        hits = graph.route_cache.hits
+        t0 = time.perf_counter()
+        polyline, distance = graph.find_route(*query)
+        elapsed = time.perf_counter() - t0
+        if graph.route_cache.hits > hits:
+            warm += elapsed
+            warm_n += 1
+        else:
+            cold += elapsed
+            cold_n += 1
+
+    print(f"{graph.node_count} nodes, {QUERIES} queries, {POPULAR} popular pairs ({POPULAR_SHARE:.0%} of traffic)")
+    print(f"miss {cold / max(cold_n, 1) * 1e6:10.1f} us/query ({cold_n})")
+    print(f"hit  {warm / max(warm_n, 1) * 1e6:10.1f} us/query ({warm_n})")
+    print(f"cache {graph.route_cache.stats()}")
+
+    assert graph.load_from_geojson(path), "reload failed"
+    assert graph.route_cache.stats()["size"] == 0, "reload did not invalidate the cache"
+    print("reload: cache invalidated")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Contraction hierarchy benchmark and correctness check.
+
+Builds a CH over a jittered synthetic lattice, verifies on random node
+pairs that CH queries return valid paths with the same distance as A*,
+and compares query latency and nodes settled.
+
+Run from the backend directory:
+    python -m benchmarks.bench_pedestrian_ch [vertices]
+"""
+
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from routers.pedestrian_ch import ContractionHierarchy
+from routers.pedestrian_router import PedestrianNetworkGraph
+from benchmarks.bench_pedestrian_load import write_lattice
+
+PAIRS = 200
+
+
+def path_length(graph: PedestrianNetworkGraph, path) -> float:
+    total = 0.0
+    for a, b in zip(path, path[1:]):
+        total += min(graph.weights[k] for k in range(graph.offsets[a], graph.offsets[a + 1]) if graph.targets[k] == b)
+    return total
+
+
+def main():
+    vertices = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "lattice.geojson"
+        write_lattice(path, vertices, seed=7)
+        graph = PedestrianNetworkGraph()
+        assert graph.load_from_geojson(path), "load failed"
+
+    t0 = time.perf_counter()
+    ch = ContractionHierarchy.build(graph)
+    build_s = time.perf_counter() - t0
+    shortcuts = sum(1 for mid in ch.up_mid if mid >= 0)
+    print(f"{graph.node_count} nodes, {graph.edge_count // 2} edges")
+    print(f"CH build {build_s:.1f} s, {shortcuts} shortcuts")
+
+    rng = random.Random(3)
+    pairs = [(rng.randrange(graph.node_count), rng.randrange(graph.node_count)) for _ in range(PAIRS)]
+
+    astar_s = ch_s = 0.0
+    astar_settled = ch_settled = 0
+    for s, t in pairs:
+        t0 = time.perf_counter()
+        a_path, a_dist, settled = graph._a_star_ids(s, t)
+        astar_s += time.perf_counter() - t0
+        astar_settled += settled
+
+        t0 = time.perf_counter()
+        c_path, c_dist, settled = ch.query(s, t)
+        ch_s += time.perf_counter() - t0
+        ch_settled += settled
+
+        assert (a_path is None) == (c_path is None), (s, t)
+        if c_path is None:
+            continue
+        assert abs(a_dist - c_dist) < 1e-6, (s, t, a_dist, c_dist)
+        assert c_path[0] == s and c_path[-1] == t, (s, t)
+        assert abs(path_length(graph, c_path) - c_dist) < 1e-6, (s, t)
+
+    print(f"correctness: {PAIRS} pairs match A*")
+    print(f"A*  {astar_s / PAIRS * 1000:8.2f} ms/query, {astar_settled / PAIRS:.0f} nodes settled/query")
+    print(f"CH  {ch_s / PAIRS * 1000:8.2f} ms/query, {ch_settled / PAIRS:.0f} nodes settled/query")
+
+
+if __name__ == "__main__":
+    main()
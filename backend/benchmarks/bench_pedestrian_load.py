@@ -0,0 +1,99 @@
+"""
+Load-time benchmark for PedestrianNetworkGraph.load_from_geojson.
+
+Generates a synthetic street lattice over Kowloon (horizontal and vertical
+LineStrings that share their crossing vertices) and times loading it at
+increasing sizes, up to 500k vertices. Peak traced memory of the streaming
+load is reported next to what json.load alone needs for the same file.
+
+Run from the backend directory:
+    python -m benchmarks.bench_pedestrian_load
+"""
+
+import json
+import math
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from routers.pedestrian_router import PedestrianNetworkGraph
+
+ORIGIN_LAT = 22.29
+ORIGIN_LNG = 114.15
+SPACING_DEG = 0.0003  # ~33 m between lattice vertices
+
+
+def write_lattice(path: Path, target_vertices: int, seed: int = None) -> int:
+    """
+    Write a side x side street lattice and return the vertex count written.
+    With a seed, every crossing is displaced randomly (by up to 30% of the
+    spacing) so that path lengths are not all tied.
+    """
+    side = int(math.sqrt(target_vertices / 2))
+    rng = random.Random(seed)
+    jitter = 0.3 * SPACING_DEG if seed is not None else 0.0
+
+    def vertex(r, c):
+        return [ORIGIN_LNG + c * SPACING_DEG + offsets[r][c][1], ORIGIN_LAT + r * SPACING_DEG + offsets[r][c][0], 0.0]
+
+    offsets = [[(rng.uniform(-jitter, jitter), rng.uniform(-jitter, jitter)) for _ in range(side)] for _ in range(side)]
+    features = []
+    for r in range(side):
+        coords = [vertex(r, c) for c in range(side)]
+        features.append({"type": "Feature", "properties": {}, "geometry": {"type": "LineString", "coordinates": coords}})
+    for c in range(side):
+        coords = [vertex(r, c) for r in range(side)]
+        features.append({"type": "Feature", "properties": {}, "geometry": {"type": "LineString", "coordinates": coords}})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
+    return 2 * side * side
+
+
+def graph_bytes(graph: PedestrianNetworkGraph) -> int:
+    """Bytes held by the graph's coordinate and CSR arrays."""
+    arrays = (graph.lat, graph.lng, graph.offsets, graph.targets, graph.weights)
+    return sum(a.itemsize * len(a) for a in arrays)
+
+
+def peak_mb(fn) -> float:
+    """Peak memory traced while running fn(), in MB"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def json_load(path: Path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    print(f"{'vertices':>10} {'nodes':>10} {'load_s':>8} {'us/vertex':>10} {'bytes/node':>11} "
+          f"{'file_MB':>8} {'peak_MB':>8} {'json.load_MB':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for target in (50_000, 100_000, 250_000, 500_000):
+            path = Path(tmp) / f"lattice_{target}.geojson"
+            vertices = write_lattice(path, target)
+            graph = PedestrianNetworkGraph()
+            t0 = time.perf_counter()
+            ok = graph.load_from_geojson(path)
+            elapsed = time.perf_counter() - t0
+            assert ok, "load failed"
+            node_count = graph.node_count
+            bytes_per_node = graph_bytes(graph) / node_count
+            del graph
+            peak = peak_mb(lambda: PedestrianNetworkGraph().load_from_geojson(path))
+            baseline = peak_mb(lambda: json_load(path))
+            print(f"{vertices:>10} {node_count:>10} {elapsed:>8.2f} {elapsed / vertices * 1e6:>10.2f} "
+                  f"{bytes_per_node:>11.1f} {path.stat().st_size / 1e6:>8.1f} {peak:>8.1f} {baseline:>13.1f}")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Many-to-many walking matrix benchmark.
+
+Builds the matrix for random points on a jittered synthetic lattice with
+one-to-many Dijkstra and, after contraction, with CH buckets. Checks
+entries against A*, then solves a tour on the matrix with tsp.
+
+Run from the backend directory:
+    python -m benchmarks.bench_pedestrian_matrix [vertices] [points]
+"""
+
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from routers import tsp
+from routers.pedestrian_ch import ContractionHierarchy
+from routers.pedestrian_router import PedestrianNetworkGraph
+from benchmarks.bench_pedestrian_load import write_lattice
+
+CHECKED_PAIRS = 100
+
+
+def main():
+    vertices = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    points = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "lattice.geojson"
+        write_lattice(path, vertices, seed=7)
+        graph = PedestrianNetworkGraph()
+        assert graph.load_from_geojson(path), "load failed"
+
+    rng = random.Random(9)
+    node_ids = rng.sample(range(graph.node_count), points)
+    print(f"{graph.node_count} nodes, {points}x{points} matrix")
+
+    t0 = time.perf_counter()
+    dijkstra = graph.distance_matrix(node_ids)
+    print(f"one-to-many Dijkstra  {(time.perf_counter() - t0) * 1000:8.1f} ms")
+
+    for _ in range(CHECKED_PAIRS):
+        i, j = rng.randrange(points), rng.randrange(points)
+        _, dist, _ = graph._a_star_ids(node_ids[i], node_ids[j])
+        assert abs(dijkstra[i][j] - dist) < 1e-6, (i, j, dijkstra[i][j], dist)
+
+    graph.ch = ContractionHierarchy.build(graph)
+    t0 = time.perf_counter()
+    buckets = graph.distance_matrix(node_ids)
+    print(f"CH buckets            {(time.perf_counter() - t0) * 1000:8.1f} ms")
+    assert all(abs(a - b) < 1e-6 for ra, rb in zip(dijkstra, buckets) for a, b in zip(ra, rb)), "CH mismatch"
+    print(f"correctness: {CHECKED_PAIRS} entries match A*, CH matrix matches Dijkstra")
+
+    t0 = time.perf_counter()
+    order = tsp.solve_tsp_nearest_2opt(buckets, start=0)
+    print(f"tsp.solve_tsp_nearest_2opt {(time.perf_counter() - t0) * 1000:8.1f} ms, "
+          f"tour {tsp.tour_length(order, buckets):.0f} m")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Nearest-node lookup benchmark for PedestrianNetworkGraph.
+
+Loads a synthetic 500k-vertex street lattice, checks the grid index
+against a brute-force scan on a sample of points, then times nearest and
+k-nearest snapping on random query points.
+
+Run from the backend directory:
+    python -m benchmarks.bench_pedestrian_nearest
+"""
+
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from routers.pedestrian_router import PedestrianNetworkGraph
+from benchmarks.bench_pedestrian_load import ORIGIN_LAT, ORIGIN_LNG, write_lattice
+
+QUERIES = 10_000
+
+
+def brute_force_nearest(graph: PedestrianNetworkGraph, lat: float, lng: float, max_distance: float):
+    best = None
+    for node_id in range(graph.node_count):
+        d = graph.haversine(lat, lng, graph.lat[node_id], graph.lng[node_id])
+        if d <= max_distance and (best is None or d < best[0]):
+            best = (d, node_id)
+    return best
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "lattice.geojson"
+        write_lattice(path, 500_000)
+        graph = PedestrianNetworkGraph()
+        assert graph.load_from_geojson(path), "load failed"
+
+    rng = random.Random(42)
+    span = 0.3  # lattice covers ~0.21 deg; some queries fall outside it
+    points = [(ORIGIN_LAT - 0.05 + rng.random() * span, ORIGIN_LNG - 0.05 + rng.random() * span) for _ in range(QUERIES)]
+
+    for lat, lng in points[:20]:
+        expected = brute_force_nearest(graph, lat, lng, 500)
+        found = graph.index.nearest(lat, lng, 500)
+        assert (expected is None) == (found is None), (lat, lng)
+        if found:
+            assert abs(found[0] - expected[0]) < 1e-9, (lat, lng, found, expected)
+
+    print(f"{graph.node_count} nodes, {QUERIES} queries")
+    for label, fn in (
+        ("nearest (500 m)", lambda lat, lng: graph.find_nearest_node(lat, lng)),
+        ("k_nearest k=8 (500 m)", lambda lat, lng: graph.find_nearest_nodes(lat, lng, k=8)),
+        ("nearest (50 m)", lambda lat, lng: graph.find_nearest_node(lat, lng, max_distance=50)),
+    ):
+        t0 = time.perf_counter()
+        for lat, lng in points:
+            fn(lat, lng)
+        elapsed = time.perf_counter() - t0
+        print(f"{label:<24} {elapsed / QUERIES * 1e6:8.1f} us/query")
+
+
+if __name__ == "__main__":
+    main()
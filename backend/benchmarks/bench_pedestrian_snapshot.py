@@ -0,0 +1,53 @@
+"""
+Cold-start benchmark: GeoJSON parsing vs. memory-mapped binary snapshot.
+
+Compiles a synthetic 500k-vertex lattice into a snapshot, then compares
+load times and checks that both graphs answer a route identically.
+
+Run from the backend directory:
+    python -m benchmarks.bench_pedestrian_snapshot
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+from routers.pedestrian_router import PedestrianNetworkGraph, build_snapshot
+from benchmarks.bench_pedestrian_load import ORIGIN_LAT, ORIGIN_LNG, write_lattice
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        geojson = Path(tmp) / "lattice.geojson"
+        write_lattice(geojson, 500_000)
+
+        snapshot, build_s = timed(lambda: build_snapshot(str(geojson)))
+        print(f"build snapshot   {build_s:8.3f} s  ({snapshot.stat().st_size / 1e6:.1f} MB)")
+
+        from_json = PedestrianNetworkGraph()
+        _, json_s = timed(lambda: from_json.load_from_geojson(geojson))
+        print(f"load GeoJSON     {json_s:8.3f} s")
+
+        from_snapshot = PedestrianNetworkGraph()
+        ok, snap_s = timed(lambda: from_snapshot.load_from_snapshot(snapshot))
+        assert ok, "snapshot load failed"
+        print(f"load snapshot    {snap_s * 1000:8.3f} ms")
+
+        query = (ORIGIN_LAT + 0.01, ORIGIN_LNG + 0.01, ORIGIN_LAT + 0.05, ORIGIN_LNG + 0.04)
+        route_json = from_json.find_route(*query)
+        route_snap = from_snapshot.find_route(*query)
+        assert route_json == route_snap, "snapshot graph routes differently"
+        print(f"route check      ok ({route_snap[1]:.0f} m)")
+
+        # Release the mapping before the temporary directory is removed
+        del from_snapshot, route_snap
+
+
+if __name__ == "__main__":
+    main()
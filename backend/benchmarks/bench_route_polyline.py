@@ -0,0 +1,102 @@
+"""
+Route polyline payload benchmark.
+
+Builds a long OSRM-like route (a winding line with a vertex every 5-25 m)
+in the [[lat, lng, style], ...] shape produced by osrm_polyline, then
+compares the JSON payload size and the time to produce it (formatting
+plus serialization) for the default output against encoded and
+simplified output at a few zoom levels. With FastAPI installed, the time
+includes jsonable_encoder, as in a real response. Checks that encoding
+round-trips to 1e-5 degrees and that simplification stays within its
+tolerance.
+
+Run from the backend directory:
+    python -m benchmarks.bench_route_polyline [vertices]
+"""
+
+import json
+import math
+import random
+import sys
+import time
+
+from routers.polyline import decode, encode, format_polyline, simplify, tolerance_for_zoom
+
+try:
+    from fastapi.encoders import jsonable_encoder
+except ImportError:
+    jsonable_encoder = None
+
+REPEAT = 20
+
+
+def synthetic_route(vertices: int, seed: int = 2):
+    rng = random.Random(seed)
+    lat, lng = 22.3350, 114.1750
+    heading = math.radians(200)
+    route = []
+    for _ in range(vertices):
+        heading += rng.gauss(0, 0.08)
+        step = rng.uniform(4.5e-5, 2.25e-4)
+        lat += step * math.cos(heading)
+        lng += step * math.sin(heading)
+        route.append([lat, lng, "dotted"])
+    return route
+
+
+def max_deviation_m(points, kept) -> float:
+    """Largest distance from an original point to the simplified line between its kept neighbours"""
+    kx = 111320.0 * math.cos(math.radians(points[0][0]))
+    index = {id(p): i for i, p in enumerate(points)}
+    worst = 0.0
+    for a, b in zip(kept, kept[1:]):
+        ia, ib = index[id(a)], index[id(b)]
+        ax, ay, bx, by = a[1] * kx, a[0] * 111320.0, b[1] * kx, b[0] * 111320.0
+        dx, dy = bx - ax, by - ay
+        seg_sq = dx * dx + dy * dy
+        for p in points[ia + 1:ib]:
+            px, py = p[1] * kx - ax, p[0] * 111320.0 - ay
+            t = max(0.0, min(1.0, (px * dx + py * dy) / seg_sq)) if seg_sq else 0.0
+            worst = max(worst, math.hypot(px - t * dx, py - t * dy))
+    return worst
+
+
+def measure(route, fmt, zoom):
+    t0 = time.perf_counter()
+    for _ in range(REPEAT):
+        body = {"polyline": format_polyline(route, fmt, zoom)}
+        if jsonable_encoder is not None:
+            body = jsonable_encoder(body)
+        payload = json.dumps(body)
+    return len(payload), (time.perf_counter() - t0) / REPEAT
+
+
+def main():
+    vertices = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    route = synthetic_route(vertices)
+
+    decoded = decode(encode(route))
+    assert len(decoded) == len(route)
+    assert all(abs(a[0] - b[0]) <= 1e-5 and abs(a[1] - b[1]) <= 1e-5 for a, b in zip(decoded, route)), "round trip"
+
+    # An out-and-back spur must survive simplification
+    spur = [[22.30 + i * 1e-4, 114.17] for i in range(50)] + [[22.30 + i * 1e-4, 114.17] for i in range(48, -1, -1)]
+    assert len(simplify(spur, 1.0)) == 3, "spur collapsed"
+
+    print(f"{vertices} vertices, {'jsonable_encoder + ' if jsonable_encoder else ''}json.dumps")
+    print(f"{'format':<10} {'zoom':>5} {'points':>7} {'bytes':>9} {'ms':>7} {'size x':>7} {'time x':>7}")
+    base_bytes, base_s = measure(route, "array", None)
+    for fmt, zoom in (("array", None), ("encoded", None), ("array", 16), ("encoded", 16),
+                      ("encoded", 14), ("encoded", 12)):
+        size, seconds = measure(route, fmt, zoom)
+        points = len(format_polyline(route, "array", zoom))
+        if zoom is not None:
+            kept = format_polyline(route, "array", zoom)
+            tolerance = tolerance_for_zoom(zoom, route[0][0])
+            assert max_deviation_m(route, kept) <= tolerance + 1e-6, f"zoom {zoom} exceeds tolerance"
+        print(f"{fmt:<10} {zoom if zoom is not None else '-':>5} {points:>7} {size:>9} {seconds * 1000:>7.2f} "
+              f"{base_bytes / size:>7.1f} {base_s / seconds:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Routes-at-a-stop benchmark: get_bus_routes_for_stop's former per-call
+work (parse the whole /route-stop download, filter it row by row and
+dedupe with a list membership test) vs. a lookup in RouteStopIndex.
+
+Uses a synthetic table shaped like KMB's (about 700 routes, both bounds,
+some special service types, ~40 stops each, stops shared between routes)
+and reports:
+
+- the JSON size, and the time to parse and index it once
+- ms per lookup for both; the former time excludes the download itself
+- a check that both give the same routes for every sampled stop, and that
+  stops_for_route returns each variant's stops in seq order
+
+Run from the backend directory:
+    python -m benchmarks.bench_route_stops
+"""
+
+import json
+import random
+import time
+
+from routers.route_stops import RouteStopIndex
+
+ROUTES = 700
+STOPS = 6000
+LOOKUPS = 50
+
+
+def synthetic_table(rng: random.Random):
+    stop_ids = [f"{rng.getrandbits(64):016X}" for _ in range(STOPS)]
+    rows = []
+    variants = []
+    for r in range(ROUTES):
+        route = f"{r + 1}{rng.choice(['', '', '', 'A', 'M', 'X'])}"
+        path = rng.sample(stop_ids, rng.randint(20, 60))
+        for bound, stops in (("O", path), ("I", path[::-1])):
+            for service_type in ["1"] + (["2"] if rng.random() < 0.3 else []):
+                variants.append(((route, bound, service_type), stops))
+                rows += [{"co": "KMB", "route": route, "bound": bound, "service_type": service_type,
+                          "seq": str(seq), "stop": stop, "data_timestamp": "2024-01-01T05:00:00+08:00"}
+                         for seq, stop in enumerate(stops, 1)]
+    return json.dumps({"type": "RouteStopList", "version": "1.0", "data": rows}).encode(), variants, stop_ids
+
+
+def scan(payload: bytes, stop_id: str) -> list:
+    """The former get_bus_routes_for_stop, minus the download"""
+    data = json.loads(payload)
+    routes = []
+    for item in data.get("data", []):
+        if item.get("stop") == stop_id:
+            route_info = {
+                "route": item.get("route"),
+                "bound": item.get("bound"),
+                "service_type": item.get("service_type"),
+                "seq": item.get("seq")
+            }
+            if route_info not in routes:
+                routes.append(route_info)
+    return routes
+
+
+def main():
+    rng = random.Random(23)
+    payload, variants, stop_ids = synthetic_table(rng)
+    t0 = time.perf_counter()
+    index = RouteStopIndex(json.loads(payload)["data"])
+    build_ms = (time.perf_counter() - t0) * 1000
+    print(f"{len(index)} rows, {len(index.variants)} route variants, {len(payload) / 1e6:.1f} MB of JSON; "
+          f"parsed and indexed once in {build_ms:.0f} ms")
+
+    sample = rng.sample(stop_ids, LOOKUPS)
+    t0 = time.perf_counter()
+    scanned = [scan(payload, stop) for stop in sample]
+    scan_ms = (time.perf_counter() - t0) * 1000 / LOOKUPS
+    t0 = time.perf_counter()
+    for _ in range(100):
+        looked_up = [index.routes_for_stop(stop) for stop in sample]
+    index_ms = (time.perf_counter() - t0) * 1000 / (100 * LOOKUPS)
+    print(f"routes at a stop: scan {scan_ms:.1f} ms per lookup (plus the download), "
+          f"index {index_ms * 1000:.2f} us per lookup ({scan_ms / index_ms:,.0f}x)")
+
+    assert looked_up == scanned, "index and scan disagree"
+    print(f"same routes for all {LOOKUPS} sampled stops "
+          f"({sum(map(len, looked_up)) / LOOKUPS:.1f} route variants per stop on average)")
+    for variant, stops in variants:
+        assert index.stops_for_route(*variant) == stops, variant
+    print(f"stops_for_route matches seq order for all {len(variants)} variants")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Stop-name lookup benchmark: get_stop_id_by_name's former scan (a
+substring test against every KMB stop's name_en, after downloading the
+whole /stop list) vs. the NameIndex built from the nearby stop store.
+
+Uses a synthetic KMB-style stop list (upper-case "PLACE (STREET)" names
+over a vocabulary of a few thousand words, some names shared by several
+stops) and reports:
+
+- time to build the index
+- ms per lookup for exact names, prefixes and misspellings; the scan's
+  time excludes the download it also needed on every call
+- the stops each kind of query resolves to, so ranking can be checked
+  by eye
+
+Exact names must resolve to a stop with that name.
+
+Run from the backend directory:
+    python -m benchmarks.bench_stop_names
+"""
+
+import asyncio
+import random
+import time
+
+from routers.name_index import NameIndex
+from routers.nearby_utils import _cache, search_stops
+from routers.stop_store import StopStore
+
+SYLLABLES = ["SHEK", "WAI", "TSUEN", "LUNG", "FUNG", "KWAI", "HING", "TAI", "SHUI", "CHUNG", "YAU", "ON",
+             "LOK", "FU", "WO", "CHE", "KAM", "PING", "SHAN", "TIN", "HANG", "MEI", "KING", "LEI", "YUET"]
+PLACES = ["MONG KOK", "TSIM SHA TSUI", "SHAM SHUI PO", "KOWLOON TONG", "SHA TIN", "TAI WAI", "YUEN LONG",
+          "TUEN MUN", "KWUN TONG", "LAI CHI KOK", "WONG TAI SIN", "TSEUNG KWAN O", "HUNG HOM", "TO KWA WAN",
+          "CHEUNG SHA WAN", "TSUEN WAN", "KWAI CHUNG", "DIAMOND HILL", "PRINCE EDWARD", "YAU MA TEI"]
+STREETS = ["NATHAN ROAD", "PRINCE EDWARD ROAD WEST", "ARGYLE STREET", "CASTLE PEAK ROAD", "WATERLOO ROAD",
+           "LUNG CHEUNG ROAD", "TAI PO ROAD", "CHATHAM ROAD NORTH", "CANTON ROAD", "TUEN MUN ROAD"]
+SUFFIXES = ["", " BUS TERMINUS", " STATION", " POLICE STATION", " MARKET", " ESTATE", " PUBLIC LIBRARY",
+            " INTERCHANGE", " SPORTS CENTRE", " HOSPITAL"]
+QUERIES = 500
+
+
+def synthetic_stops(seed: int = 20):
+    rng = random.Random(seed)
+    # Estates, villages and buildings named from common syllables, so the
+    # vocabulary is about as large as KMB's
+    places = PLACES + [" ".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))) for _ in range(1500)]
+    streets = STREETS + [f"{rng.choice(SYLLABLES)} {rng.choice(SYLLABLES)} {rng.choice(['ROAD', 'STREET'])}"
+                         for _ in range(300)]
+    stops = []
+    for i in range(6000):
+        name = f"{rng.choice(places)}{rng.choice(SUFFIXES)} ({rng.choice(streets)})"
+        stops.append({"name": name, "type": "Bus Stop", "stop_id": f"{i:016X}",
+                      "lat": rng.uniform(22.20, 22.50), "lng": rng.uniform(113.95, 114.30)})
+    for place in PLACES:
+        stops.append({"name": f"{place.title()} Station", "type": "MTR", "stop_id": place[:3],
+                      "lat": rng.uniform(22.20, 22.50), "lng": rng.uniform(113.95, 114.30)})
+    return stops
+
+
+def scan(stops, stop_name):
+    """The former get_stop_id_by_name loop"""
+    for stop in stops:
+        if stop_name.upper() in stop.get("name_en", "").upper():
+            return stop.get("stop")
+    return None
+
+
+def per_query_ms(run, queries) -> float:
+    t0 = time.perf_counter()
+    for q in queries:
+        run(q)
+    return (time.perf_counter() - t0) / len(queries) * 1000
+
+
+def main():
+    stops = synthetic_stops()
+    kmb = [{"stop": p["stop_id"], "name_en": p["name"]} for p in stops if p["type"] == "Bus Stop"]
+    store = StopStore.build(stops)
+    t0 = time.perf_counter()
+    names = NameIndex(store)
+    build_ms = (time.perf_counter() - t0) * 1000
+    _cache.update(store=store, names=names, fetched=True)
+    bus = store.type_codes_for(["Bus Stop"])
+
+    rng = random.Random(1)
+    sample = [rng.choice(kmb)["name_en"] for _ in range(QUERIES)]
+    kinds = {
+        "exact name": sample,
+        "place only": [name.split(" (")[0] for name in sample],
+        "prefix": [name[:9] for name in sample],
+        "misspelt": [name.split(" (")[0].replace("A", "E", 1) for name in sample],
+    }
+
+    for query in sample[:50]:
+        row, score = names.search(query, bus, limit=1)[0]
+        assert store.name(row) == query and score == 1.0, (query, store.name(row), score)
+
+    print(f"{len(store)} stops, {len(names)} index tokens, built in {build_ms:.1f} ms")
+    print(f"{'query':<12} {'scan ms':>8} {'index ms':>9}  example")
+    for kind, queries in kinds.items():
+        scan_ms = per_query_ms(lambda q: scan(kmb, q), queries)
+        index_ms = per_query_ms(lambda q: names.search(q, bus, limit=1), queries)
+        hits = names.search(queries[0], bus, limit=1)
+        found = f"{store.name(hits[0][0])} ({hits[0][1]:.2f})" if hits else "-"
+        print(f"{kind:<12} {scan_ms:>8.3f} {index_ms:>9.3f}  {queries[0]!r} -> {found}")
+
+    loop = asyncio.new_event_loop()
+    near = (22.3193, 114.1694)
+    t0 = time.perf_counter()
+    for query in kinds["place only"]:
+        loop.run_until_complete(search_stops(query, types=["Bus Stop"], limit=1, near=near))
+    print(f"search_stops with near, place only: {(time.perf_counter() - t0) / QUERIES * 1000:.3f} ms")
+    print("'mongkok stn' ->", [(s["name"], s["score"]) for s in loop.run_until_complete(search_stops("mongkok stn", limit=3))])
+    print("'tsim sha tsiu', MTR ->", [(s["name"], s["stop_id"], s["score"])
+                                       for s in loop.run_until_complete(search_stops("tsim sha tsiu", types=["MTR"], limit=3))])
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
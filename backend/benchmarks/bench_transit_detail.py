@@ -0,0 +1,123 @@
+"""
+transit_detail latency: its lookups as a task graph vs. the sum of them
+one after another (as the endpoint used to run them).
+
+Calls the endpoint function directly on a small synthetic stop store
+around Jordan and Mong Kok, with every lookup slowed down to stand in
+for a remote call:
+
+- OSRM (a mock transport) answers after OSRM_DELAY
+- the nearby queries, the stop name lookup and each routes-at-a-stop
+  lookup take LOOKUP_DELAY
+
+and reports the end-to-end time next to the sum of the lookups' times
+(what running them in sequence costs) and the longest dependency chain.
+Then checks the deadline: with OSRM slower than TRANSIT_DETAIL_DEADLINE
+the answer comes back at the deadline, without the walk distance but
+with every other option.
+
+Run from the backend directory:
+    python -m benchmarks.bench_transit_detail
+"""
+
+import asyncio
+import importlib
+import time
+
+import httpx
+
+from routers import route_stops
+from routers.name_index import NameIndex
+from routers.nearby_utils import _swap_store
+from routers.stop_store import StopStore
+
+# The module; routers re-exports its APIRouter under the same name
+route_planner = importlib.import_module("routers.route_planner")
+
+OSRM_DELAY = 0.2
+LOOKUP_DELAY = 0.05
+RUNS = 5
+
+STOPS = [
+    {"name": "JORDAN ROAD", "type": "Bus Stop", "stop_id": "J1", "lat": 22.3050, "lng": 114.1720},
+    {"name": "AUSTIN ROAD BUS TERMINUS", "type": "Bus Stop", "stop_id": "J2", "lat": 22.3040, "lng": 114.1700},
+    {"name": "Jordan Station", "type": "MTR", "stop_id": "JOR", "lat": 22.3047, "lng": 114.1719},
+    {"name": "Mong Kok Station", "type": "MTR", "stop_id": "MOK", "lat": 22.3193, "lng": 114.1694},
+    {"name": "NATHAN ROAD MONG KOK", "type": "Bus Stop", "stop_id": "M1", "lat": 22.3190, "lng": 114.1700},
+    {"name": "ARGYLE STREET", "type": "Bus Stop", "stop_id": "M2", "lat": 22.3200, "lng": 114.1690},
+    {"name": "SAI YEUNG CHOI STREET", "type": "Bus Stop", "stop_id": "M3", "lat": 22.3185, "lng": 114.1705},
+]
+ROUTE_STOPS = [
+    {"route": route, "bound": "O", "service_type": "1", "seq": str(seq), "stop": stop}
+    for route, stops in (("2", ["J1", "M1"]), ("6", ["J2", "M2"]), ("9", ["J2", "M3"]), ("13X", ["J1", "M2"]))
+    for seq, stop in enumerate(stops, 1)
+]
+REQUEST = route_planner.TransitDetailRequest(
+    start_lat=22.3030, start_lng=114.1710, end_lat=22.3195, end_lng=114.1698,
+    stop_name="JORDAN ROAD", stop_type="Bus", stop_lat=22.3050, stop_lng=114.1720)
+
+calls = []
+
+
+def slowed(fn, delay: float):
+    """fn, but taking delay seconds longer; records each call's duration"""
+    async def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        await asyncio.sleep(delay)
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            calls.append((fn.__name__, time.perf_counter() - t0))
+    return wrapper
+
+
+def osrm_client(delay: float) -> httpx.AsyncClient:
+    async def handler(request):
+        await asyncio.sleep(delay)
+        return httpx.Response(200, json={"code": "Ok", "routes": [
+            {"distance": 420.0, "duration": 300.0, "geometry": {"type": "LineString", "coordinates": []}, "legs": []}]})
+    return httpx.AsyncClient(base_url="http://osrm", transport=httpx.MockTransport(handler))
+
+
+async def timed(client) -> tuple:
+    calls.clear()
+    t0 = time.perf_counter()
+    body = await route_planner.transit_detail(REQUEST, osrm_client=client)
+    return (time.perf_counter() - t0) * 1000, body
+
+
+async def run():
+    store = StopStore.build(STOPS)
+    _swap_store(store, NameIndex(store))
+    route_stops._swap_index(route_stops.RouteStopIndex(ROUTE_STOPS))
+    for name in ("query_nearby_batch", "query_nearby", "get_stop_id_by_name", "get_bus_routes_for_stop"):
+        setattr(route_planner, name, slowed(getattr(route_planner, name), LOOKUP_DELAY))
+
+    # Longest chain: nearby stops -> stops around the end station -> their routes
+    chain_ms = max(OSRM_DELAY, 3 * LOOKUP_DELAY) * 1000
+    async with osrm_client(OSRM_DELAY) as client:
+        await timed(client)  # warm up
+        runs = [await timed(client) for _ in range(RUNS)]
+    elapsed = min(ms for ms, _ in runs)
+    body = runs[-1][1]
+    serial_ms = sum(seconds for _, seconds in calls) * 1000 + OSRM_DELAY * 1000
+    print(f"{len(calls) + 1} lookups ({LOOKUP_DELAY * 1000:g} ms each, OSRM {OSRM_DELAY * 1000:g} ms): "
+          f"one after another {serial_ms:.0f} ms, longest chain {chain_ms:.0f} ms, "
+          f"transit_detail {elapsed:.0f} ms")
+    options = [option["option_name"] for option in body["route_options"]]
+    print("options:", ", ".join(options))
+    assert elapsed < chain_ms * 1.5, elapsed
+    assert len(options) == 4 and body["route_options"][0]["steps"][0]["distance_m"] == 420, body
+
+    deadline = route_planner.TRANSIT_DETAIL_DEADLINE = 0.5
+    async with osrm_client(deadline * 4) as client:
+        elapsed, body = await timed(client)
+    options = [option["option_name"] for option in body["route_options"]]
+    walk = body["route_options"][0]["steps"][0]["distance_m"]
+    print(f"OSRM taking {deadline * 4:g} s, deadline {deadline:g} s: answered in {elapsed:.0f} ms, "
+          f"walk distance {walk}, {len(options)} options")
+    assert elapsed < deadline * 1000 * 1.2 and walk == 0 and len(options) == 4, (elapsed, body)
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
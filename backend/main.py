@@ -1,3 +1,7 @@
+import asyncio
+import contextlib
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from routers import itinerary_ai 
 from fastapi.middleware.cors import CORSMiddleware
@@ -15,8 +19,32 @@ from routers import (
     nearby,
     pois
 )
+from routers.http_clients import pool as http_pool
+from routers.nearby_utils import load_snapshot, refresh_loop
+from routers.route_stops import refresh_loop as refresh_route_stops
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve /api/nearby from the last snapshot right away (if there is one);
+    # the refresher loads or revalidates the index in the background
+    load_snapshot()
+    refreshers = [asyncio.create_task(refresh_loop()),
+                  # The KMB route-stop table, for the routes calling at a stop
+                  asyncio.create_task(refresh_route_stops())]
+    try:
+        yield
+    finally:
+        for refresher in refreshers:
+            refresher.cancel()
+        for refresher in refreshers:
+            with contextlib.suppress(asyncio.CancelledError):
+                await refresher
+        # Close the pooled upstream connections
+        await http_pool.aclose()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 
 
@@ -1,13 +1,14 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 import httpx
 
+from .http_clients import upstream
+
 router = APIRouter()
 
 @router.get("/shape/{route}")
-async def get_bus_route(route: str):
+async def get_bus_route(route: str, client: httpx.AsyncClient = Depends(upstream("kmb"))):
     url = f"https://data.etabus.gov.hk/gtfs/route_shape/{route}.json"
-    async with httpx.AsyncClient() as client:
-        r = await client.get(url)
+    r = await client.get(url)
     data = r.json()
 
     shape = [{"lat": p["shape_pt_lat"], "lng": p["shape_pt_lon"]} for p in data]
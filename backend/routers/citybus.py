@@ -1,14 +1,15 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 import httpx
 
+from .http_clients import upstream
+
 router = APIRouter()
 
 @router.get("/eta/{company}/{stop_id}/{route}")
-async def citybus_eta(company: str, stop_id: str, route: str):
+async def citybus_eta(company: str, stop_id: str, route: str, client: httpx.AsyncClient = Depends(upstream("gov"))):
     url = f"https://rt.data.gov.hk/v1/transport/citybus-nwfb/eta/{company}/{stop_id}/{route}"
 
-    async with httpx.AsyncClient() as client:
-        res = await client.get(url)
+    res = await client.get(url)
     raw = res.json().get("data", [])
 
     eta = []
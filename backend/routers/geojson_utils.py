@@ -0,0 +1,105 @@
+"""
+Streaming reader for large GeoJSON FeatureCollections.
+
+json.load materialises the whole document as Python objects, which for the
+territory-wide pedestrian network costs many times the file size. This
+reader walks the top-level object with json.JSONDecoder.raw_decode over a
+sliding text buffer and yields one feature at a time, so memory use is
+bounded by the largest single feature (plus one read chunk).
+"""
+
+import json
+from pathlib import Path
+from typing import Iterator
+
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = " \t\n\r"
+
+
+class _Buffer:
+    """Text buffer over a file that is refilled on demand and compacted as it is consumed"""
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Read another chunk, dropping consumed text; False at end of file"""
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character (without consuming it), or '' at end of file"""
+        while True:
+            text, pos = self.text, self.pos
+            while pos < len(text) and text[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(text):
+                return text[pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos} of buffered GeoJSON")
+        self.pos += 1
+
+    def decode(self, decoder: json.JSONDecoder):
+        """Decode the next JSON value, reading more input while it is incomplete"""
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may still continue
+            if end == len(self.text) and not self.eof and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_features(geojson_file: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """
+    Yield the features of a GeoJSON FeatureCollection one by one.
+    Other top-level members (type, crs, bbox, ...) are parsed and discarded.
+    """
+    decoder = json.JSONDecoder()
+    with open(geojson_file, 'r', encoding='utf-8') as f:
+        buf = _Buffer(f, chunk_size)
+        buf.expect("{")
+        if buf.peek() == "}":
+            return
+        while True:
+            key = buf.decode(decoder)
+            buf.expect(":")
+            if key != "features":
+                buf.decode(decoder)
+            else:
+                buf.expect("[")
+                if buf.peek() == "]":
+                    buf.pos += 1
+                else:
+                    while True:
+                        yield buf.decode(decoder)
+                        if buf.peek() == "]":
+                            buf.pos += 1
+                            break
+                        buf.expect(",")
+            if buf.peek() == "}":
+                return
+            buf.expect(",")
@@ -0,0 +1,103 @@
+"""
+Pooled HTTP clients for the upstream APIs.
+
+Each upstream host gets one long-lived httpx.AsyncClient with its own
+connection limits, so requests reuse kept-alive connections (multiplexed
+over HTTP/2 where the host and the optional h2 package allow it) instead
+of paying a TCP and TLS handshake, and a fresh SSL context, per call.
+
+Routers take a client as a dependency, Depends(upstream("kmb")); code
+outside a request (the nearby index refresh) calls client("kmb"). The
+app's lifespan closes every client on shutdown.
+"""
+
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:  # optional (see requirements.txt); HTTP/1.1 keep-alive only
+    HTTP2_AVAILABLE = False
+
+
+@dataclass(frozen=True)
+class Upstream:
+    """Connection settings for one upstream host"""
+    base_url: str
+    # Default per-request timeout; a call can pass its own
+    timeout: float = 5.0
+    max_connections: int = 20
+    max_keepalive: int = 10
+    # Seconds an idle connection is kept open for reuse
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+
+
+UPSTREAMS: Dict[str, Upstream] = {
+    # KMB stops, routes and ETAs
+    "kmb": Upstream("https://data.etabus.gov.hk", http2=True),
+    # Citybus ETAs and the MTR station list
+    "gov": Upstream("https://rt.data.gov.hk", http2=True),
+    # The public demo server by default; point OSRM_URL at a self-hosted one
+    "osrm": Upstream(os.getenv("OSRM_URL", "http://router.project-osrm.org"), timeout=10.0),
+}
+
+
+def _make_client(upstream: Upstream) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=upstream.base_url,
+        timeout=upstream.timeout,
+        limits=httpx.Limits(max_connections=upstream.max_connections,
+                            max_keepalive_connections=upstream.max_keepalive,
+                            keepalive_expiry=upstream.keepalive_expiry),
+        http2=upstream.http2 and HTTP2_AVAILABLE,
+    )
+
+
+class ClientPool:
+    """One lazily created client per upstream, for the running event loop"""
+
+    def __init__(self, upstreams: Optional[Dict[str, Upstream]] = None):
+        self.upstreams = UPSTREAMS if upstreams is None else upstreams
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """The client for an upstream in UPSTREAMS; raises KeyError for unknown names"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Connections belong to the loop that opened them; a new loop
+            # (a test, a script calling asyncio.run) starts a new set
+            self._clients = {}
+            self._loop = loop
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = _make_client(self.upstreams[name])
+        return client
+
+    async def aclose(self):
+        clients, self._clients = self._clients, {}
+        await asyncio.gather(*(c.aclose() for c in clients.values()), return_exceptions=True)
+
+
+pool = ClientPool()
+
+
+def client(name: str) -> httpx.AsyncClient:
+    """The shared client for an upstream (call from within the event loop)"""
+    return pool.get(name)
+
+
+def upstream(name: str) -> Callable[[], Awaitable[httpx.AsyncClient]]:
+    """FastAPI dependency yielding the shared client for an upstream"""
+    if name not in pool.upstreams:
+        raise KeyError(name)
+
+    async def dependency() -> httpx.AsyncClient:
+        return pool.get(name)
+    return dependency
@@ -0,0 +1,239 @@
+"""
+MTR network graph with every station-to-station journey precomputed.
+
+Each line is a set of station sequences (a branch, like East Rail's to
+Lok Ma Chau, is a sequence of its own starting at its junction) with
+the run time of each segment. Stations on several lines are
+interchanges, where changing lines costs a walk between platforms, and
+a few stations are linked by a walk outside the paid area. The graph
+has a node per platform of each service a line runs: a branch's trains
+run through to the start of the line, so the trunk is shared but going
+from one branch to another means changing trains at the junction.
+Dijkstra from every station gives the fastest journey to every other
+station, fewest changes among equally fast ones, so a lookup is a
+dictionary read.
+
+Run and interchange times are typical weekday minutes, not a timetable.
+"""
+
+import heapq
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Station sequences per line, as (station, minutes from the previous station)
+MTR_LINES: Dict[str, List[List[Tuple[str, float]]]] = {
+    "Tsuen Wan Line": [[
+        ("Central", 0), ("Admiralty", 2), ("Tsim Sha Tsui", 3), ("Jordan", 2), ("Yau Ma Tei", 2),
+        ("Mong Kok", 2), ("Prince Edward", 1), ("Sham Shui Po", 2), ("Cheung Sha Wan", 2), ("Lai Chi Kok", 2),
+        ("Mei Foo", 2), ("Lai King", 3), ("Kwai Fong", 2), ("Kwai Hing", 2), ("Tai Wo Hau", 2), ("Tsuen Wan", 2),
+    ]],
+    "Island Line": [[
+        ("Kennedy Town", 0), ("HKU", 2), ("Sai Ying Pun", 2), ("Sheung Wan", 2), ("Central", 2), ("Admiralty", 2),
+        ("Wan Chai", 2), ("Causeway Bay", 2), ("Tin Hau", 2), ("Fortress Hill", 1), ("North Point", 2),
+        ("Quarry Bay", 2), ("Tai Koo", 2), ("Sai Wan Ho", 2), ("Shau Kei Wan", 2), ("Heng Fa Chuen", 3),
+        ("Chai Wan", 2),
+    ]],
+    "Kwun Tong Line": [[
+        ("Whampoa", 0), ("Ho Man Tin", 2), ("Yau Ma Tei", 3), ("Mong Kok", 2), ("Prince Edward", 1),
+        ("Shek Kip Mei", 2), ("Kowloon Tong", 2), ("Lok Fu", 2), ("Wong Tai Sin", 2), ("Diamond Hill", 2),
+        ("Choi Hung", 2), ("Kowloon Bay", 2), ("Ngau Tau Kok", 2), ("Kwun Tong", 2), ("Lam Tin", 2),
+        ("Yau Tong", 2), ("Tiu Keng Leng", 3),
+    ]],
+    "Tuen Mun Line": [[
+        ("Tuen Mun", 0), ("Siu Hong", 2), ("Tin Shui Wai", 4), ("Long Ping", 3), ("Yuen Long", 2),
+        ("Kam Sheung Road", 4), ("Tsuen Wan West", 8), ("Mei Foo", 4), ("Nam Cheong", 3), ("Austin", 3),
+        ("East Tsim Sha Tsui", 2), ("Hung Hom", 3),
+    ]],
+    "Tung Chung Line": [[
+        ("Hong Kong", 0), ("Kowloon", 3), ("Olympic", 2), ("Nam Cheong", 2), ("Lai King", 4), ("Tsing Yi", 3),
+        ("Sunny Bay", 6), ("Tung Chung", 5),
+    ]],
+    "East Rail Line": [[
+        ("Admiralty", 0), ("Exhibition Centre", 2), ("Hung Hom", 4), ("Mong Kok East", 3), ("Kowloon Tong", 3),
+        ("Tai Wai", 5), ("Sha Tin", 2), ("Fo Tan", 2), ("Racecourse", 2), ("University", 2),
+        ("Tai Po Market", 6), ("Tai Wo", 2), ("Fanling", 4), ("Sheung Shui", 2), ("Lo Wu", 5),
+    ], [
+        ("Sheung Shui", 0), ("Lok Ma Chau", 7),
+    ]],
+}
+
+# Minutes to change lines within a station (platform to platform, including
+# the wait for the next train); same-level cross-platform changes are quick
+INTERCHANGE_MINUTES: Dict[str, float] = {
+    "Admiralty": 3, "Central": 4, "Yau Ma Tei": 1, "Mong Kok": 1, "Prince Edward": 1, "Lai King": 1,
+    "Mei Foo": 5, "Nam Cheong": 2, "Hung Hom": 4, "Kowloon Tong": 5,
+}
+DEFAULT_INTERCHANGE_MINUTES = 3
+
+# Stations linked by a walk (minutes), for changes between them
+WALK_LINKS: Dict[Tuple[str, str], float] = {
+    ("Central", "Hong Kong"): 8,
+    ("Tsim Sha Tsui", "East Tsim Sha Tsui"): 6,
+}
+
+
+class MTRNetwork:
+    """Platform graph of the MTR lines, with the fastest journey between every pair of stations"""
+
+    def __init__(self, lines: Dict[str, List[List[Tuple[str, float]]]] = MTR_LINES,
+                 interchange_minutes: Dict[str, float] = INTERCHANGE_MINUTES,
+                 walk_links: Dict[Tuple[str, str], float] = WALK_LINKS,
+                 default_interchange: float = DEFAULT_INTERCHANGE_MINUTES):
+        # Nodes are (station, line, service) platforms; a line's services
+        # are numbered after the branch they serve
+        self.platforms: List[Tuple[str, str, int]] = []
+        platform_ids: Dict[Tuple[str, str, int], int] = {}
+        # node -> [(node, minutes, changes)]
+        self._edges: List[List[Tuple[int, float, int]]] = []
+
+        def node(station: str, line: str, service: int) -> int:
+            key = (station, line, service)
+            if key not in platform_ids:
+                platform_ids[key] = len(self.platforms)
+                self.platforms.append(key)
+                self._edges.append([])
+            return platform_ids[key]
+
+        def link(a: int, b: int, minutes: float, changes: int):
+            self._edges[a].append((b, minutes, changes))
+            self._edges[b].append((a, minutes, changes))
+
+        for line, branches in lines.items():
+            for service, stops in enumerate(self._services(branches)):
+                previous = None
+                for station, minutes in stops:
+                    current = node(station, line, service)
+                    if previous is not None:
+                        link(previous, current, minutes, 0)
+                    previous = current
+
+        self.stations: List[str] = sorted({station for station, _, _ in self.platforms})
+        self._station_ids = {station.casefold(): i for i, station in enumerate(self.stations)}
+        self._station_platforms: List[List[int]] = [[] for _ in self.stations]
+        # Platforms of different services of a line are linked like any
+        # other pair at the station, so a change of branch costs a change
+        for p, (station, _, _) in enumerate(self.platforms):
+            self._station_platforms[self._station_ids[station.casefold()]].append(p)
+
+        for i, station in enumerate(self.stations):
+            ps = self._station_platforms[i]
+            change = interchange_minutes.get(station, default_interchange)
+            for x in range(len(ps)):
+                for y in range(x + 1, len(ps)):
+                    link(ps[x], ps[y], change, 1)
+        for (a, b), minutes in walk_links.items():
+            for pa in self._station_platforms[self._station_ids[a.casefold()]]:
+                for pb in self._station_platforms[self._station_ids[b.casefold()]]:
+                    link(pa, pb, minutes, 1)
+
+        # (origin, destination) station ids -> journey
+        self._journeys: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        for origin in range(len(self.stations)):
+            self._journeys_from(origin)
+
+    def __len__(self) -> int:
+        return len(self.stations)
+
+    @staticmethod
+    def _services(branches: List[List[Tuple[str, float]]]) -> List[List[Tuple[str, float]]]:
+        """
+        The station sequence each branch's trains run: the first branch as
+        it is, and every other one after the stations of the service it
+        branches off, up to its junction
+        """
+        services: List[List[Tuple[str, float]]] = []
+        for branch in branches:
+            junction = branch[0][0]
+            trunk = next((stops for stops in services if any(s == junction for s, _ in stops)), None)
+            if trunk is None:
+                services.append(list(branch))
+            else:
+                end = next(k for k, (s, _) in enumerate(trunk) if s == junction)
+                services.append(trunk[:end + 1] + branch[1:])
+        return services
+
+    def _journeys_from(self, origin: int):
+        """Dijkstra from all of origin's platforms, ranking (minutes, changes)"""
+        best: Dict[int, Tuple[float, int]] = {}
+        # Platform -> the one before it on the way there (-1 at the origin)
+        previous: Dict[int, int] = {}
+        heap = [(0.0, 0, p, -1) for p in self._station_platforms[origin]]
+        heapq.heapify(heap)
+        while heap:
+            minutes, changes, p, before = heapq.heappop(heap)
+            if p in best:
+                continue
+            best[p] = (minutes, changes)
+            previous[p] = before
+            for q, step, step_changes in self._edges[p]:
+                if q not in best:
+                    heapq.heappush(heap, (minutes + step, changes + step_changes, q, p))
+
+        for destination, platforms in enumerate(self._station_platforms):
+            reached = [p for p in platforms if p in best]
+            if not reached:
+                continue
+            end = min(reached, key=best.__getitem__)
+            path = [end]
+            while previous[path[-1]] >= 0:
+                path.append(previous[path[-1]])
+            path.reverse()
+            self._journeys[origin, destination] = self._journey(path, [best[p][0] for p in path])
+
+    def _journey(self, path: Sequence[int], times: Sequence[float]) -> Dict[str, Any]:
+        """
+        Describe a platform path (with the minutes at which each platform is
+        reached) as rides and walks, in find_mtr_connection's shape
+        """
+        platforms = self.platforms
+        legs: List[Dict[str, Any]] = []
+        transfers: List[str] = []
+        # Index in path where the current ride boarded
+        boarded = 0
+        for k in range(1, len(path) + 1):
+            if k < len(path) and platforms[path[k]][1:] == platforms[path[k - 1]][1:]:
+                continue  # still on the same train
+            if k - 1 > boarded:
+                if legs and not legs[-1].get("walk"):
+                    transfers.append(legs[-1]["to"])
+                elif len(legs) > 1:
+                    transfers.append(legs[-2]["to"])
+                legs.append({"line": platforms[path[boarded]][1], "from": platforms[path[boarded]][0],
+                             "to": platforms[path[k - 1]][0], "stops": k - 1 - boarded,
+                             "minutes": times[k - 1] - times[boarded]})
+            if k < len(path) and platforms[path[k]][0] != platforms[path[k - 1]][0]:
+                legs.append({"walk": True, "from": platforms[path[k - 1]][0], "to": platforms[path[k]][0],
+                             "minutes": times[k] - times[k - 1]})
+            boarded = k
+        rides = [leg for leg in legs if not leg.get("walk")]
+        direct = len(rides) == 1 and len(legs) == 1
+        return {
+            "direct": direct,
+            "line": rides[0]["line"] if direct else None,
+            "start_line": rides[0]["line"] if rides else None,
+            "end_line": rides[-1]["line"] if rides else None,
+            "transfer_at": transfers[0] if transfers else None,
+            "transfers": transfers,
+            "legs": legs,
+            "duration_min": times[-1],
+        }
+
+    def journey(self, start: str, end: str) -> Optional[Dict[str, Any]]:
+        """
+        The fastest journey between two stations: the line for a direct
+        ride, else the first and last lines and every change (transfer_at
+        is the first), its legs (rides and walks between stations) and its
+        duration in minutes. None for an unknown station.
+        """
+        i = self._station_ids.get(start.strip().casefold())
+        j = self._station_ids.get(end.strip().casefold())
+        if i is None or j is None:
+            return None
+        if i == j:
+            line = self.platforms[self._station_platforms[i][0]][1]
+            return {"direct": True, "line": line, "start_line": line, "end_line": line, "transfer_at": None,
+                    "transfers": [], "legs": [], "duration_min": 0}
+        journey = self._journeys.get((i, j))
+        return None if journey is None else dict(journey)
+
+
+network = MTRNetwork()
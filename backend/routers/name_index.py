@@ -0,0 +1,210 @@
+"""
+Inverted index over the stop names in a StopStore.
+
+Names are case-folded and split into word tokens. Each distinct token,
+and each pair of adjacent tokens run together ("mongkok"), has a posting
+list of the names containing it. The sorted vocabulary answers prefix
+lookups ("tsim sh" for type-ahead) with a binary search, and a trigram
+index over the vocabulary answers misspellings ("prince edwrd").
+
+Scoring works on distinct names (KMB repeats a name for the stops on
+either side of a road), starting from the names holding the query's
+rarest word and checking the commoner words against those few with a
+binary search in their posting lists, so a lookup never walks the
+postings of words like "road".
+"""
+
+import heapq
+import math
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import chain
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .stop_store import StopStore
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Scores for how a query token matched a name token; a name's score is the
+# mean over the query tokens of its best match (0 for an unmatched token)
+_EXACT = 1.0
+_PREFIX = 0.9
+_FUZZY = 0.8
+# Least trigram similarity (Dice coefficient) for a fuzzy token match
+_MIN_SIMILARITY = 0.5
+# At most this many vocabulary tokens stand in for one short prefix or
+# misspelling (the closest ones); "s" alone would otherwise match half
+# of the names
+_MAX_EXPANSIONS = 64
+# Checking a few names against a long posting list by binary search beats
+# hashing the whole list once the list is this many times longer
+_BISECT_RATIO = 16
+# Names scoring below this are not returned
+_MIN_SCORE = 0.5
+
+
+def tokenize(text: str) -> List[str]:
+    """Case-folded word tokens of a name or query"""
+    return _TOKEN_RE.findall(text.casefold())
+
+
+def _trigrams(token: str) -> set:
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Token and trigram postings over one StopStore's distinct names"""
+
+    def __init__(self, store: StopStore):
+        self.store = store
+        entries: Dict[str, int] = {}
+        entry_of_row = array('i')
+        for row in range(len(store)):
+            entry_of_row.append(entries.setdefault(store.name(row) or "", len(entries)))
+
+        # Rows of each distinct name, as ranges of entry_row_ids
+        self.entry_row_ids = array('i', sorted(range(len(store)), key=entry_of_row.__getitem__))
+        self.entry_offsets = array('i', [0] * (len(entries) + 1))
+        for entry in entry_of_row:
+            self.entry_offsets[entry + 1] += 1
+        for entry in range(len(entries)):
+            self.entry_offsets[entry + 1] += self.entry_offsets[entry]
+
+        postings: Dict[str, List[int]] = {}
+        self.entry_words = array('H')
+        for name, entry in entries.items():
+            words = tokenize(name)
+            # Place names are often typed without their spaces
+            tokens = set(words) | {a + b for a, b in zip(words, words[1:])}
+            self.entry_words.append(min(len(set(words)), 0xFFFF))
+            for token in tokens:
+                postings.setdefault(token, []).append(entry)
+
+        self.vocab: List[str] = sorted(postings)
+        self._token_ids = {token: i for i, token in enumerate(self.vocab)}
+        # Entries are visited in order, so every posting list is sorted
+        self.postings: List[array] = [array('i', postings[token]) for token in self.vocab]
+
+        trigrams: Dict[str, List[int]] = {}
+        for i, token in enumerate(self.vocab):
+            for gram in _trigrams(token):
+                trigrams.setdefault(gram, []).append(i)
+        self.trigrams: Dict[str, array] = {gram: array('i', ids) for gram, ids in trigrams.items()}
+        self._trigram_counts = array('H', [len(_trigrams(token)) for token in self.vocab])
+
+    def __len__(self) -> int:
+        return len(self.vocab)
+
+    def _matches(self, token: str) -> Dict[int, float]:
+        """
+        Vocabulary token ids standing in for one query token, with their
+        match scores: the token itself if it is a known word, else the
+        words it is a prefix of, else the words it is a misspelling of.
+        """
+        exact = self._token_ids.get(token)
+        if exact is not None:
+            return {exact: _EXACT}
+
+        lo = bisect_left(self.vocab, token)
+        hi = bisect_left(self.vocab, token + "\U0010ffff", lo)
+        if lo < hi:
+            prefixed = range(lo, hi)
+            if len(prefixed) > _MAX_EXPANSIONS:
+                prefixed = sorted(prefixed, key=lambda i: len(self.vocab[i]))[:_MAX_EXPANSIONS]
+            return dict.fromkeys(prefixed, _PREFIX)
+
+        if len(token) < 3:
+            return {}
+        grams = _trigrams(token)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.trigrams.get(gram, ()))
+        similar = []
+        for i, count in shared.items():
+            similarity = 2.0 * count / (len(grams) + self._trigram_counts[i])
+            if similarity >= _MIN_SIMILARITY:
+                similar.append((similarity, i))
+        similar.sort(reverse=True)
+        return {i: _FUZZY * similarity for similarity, i in similar[:_MAX_EXPANSIONS]}
+
+    def _best(self, matches: Dict[int, float]) -> Dict[int, float]:
+        """Entry -> its best score for one query token"""
+        best: Dict[int, float] = {}
+        # Lower scores first, so better ones overwrite them
+        for i, score in sorted(matches.items(), key=lambda item: item[1]):
+            best.update(dict.fromkeys(self.postings[i], score))
+        return best
+
+    def _score_in(self, matches: Dict[int, float], entry: int) -> float:
+        """Best score of one entry for one query token (0 if no match holds it)"""
+        best = 0.0
+        for i, score in matches.items():
+            posting = self.postings[i]
+            j = bisect_left(posting, entry)
+            if score > best and j < len(posting) and posting[j] == entry:
+                best = score
+        return best
+
+    def search(self, text: str, codes: Optional[Sequence[int]] = None, limit: Optional[int] = 10,
+               tie_break: Optional[Callable[[int], Any]] = None) -> List[Tuple[int, float]]:
+        """
+        Rows whose names best match text, as (row, score in (0, 1]) best
+        first, optionally restricted to type codes. A name containing every
+        query word scores 1. Equal scores go to the shorter name (fewest
+        words), then to the lower tie_break(row) (the row id if None).
+        """
+        tokens = list(dict.fromkeys(tokenize(text)))
+        if not tokens or (codes is not None and not codes):
+            return []
+        matches = [self._matches(token) for token in tokens]
+        sizes = [sum(len(self.postings[i]) for i in match) for match in matches]
+        n = len(tokens)
+        if not any(sizes):
+            return []
+
+        # Names matching every query word first, rarest word first
+        order = sorted(range(n), key=sizes.__getitem__)
+        totals = self._best(matches[order[0]])
+        for t in order[1:]:
+            if not totals:
+                break
+            match = matches[t]
+            if sizes[t] < _BISECT_RATIO * len(totals) * len(match):
+                best = self._best(match)
+                totals = {entry: total + best[entry] for entry, total in totals.items() if entry in best}
+            else:
+                totals = {entry: total + score for entry, total in totals.items()
+                          for score in (self._score_in(match, entry),) if score}
+        scored = [(entry, total / n) for entry, total in totals.items()]
+        # A name missing m words scores at most (n - m) / n, so the others
+        # only need scoring when these can't fill the limit with better scores
+        if n > 1 and (limit is None or sum(score > (n - 1) / n for _, score in scored) < limit):
+            bests = [self._best(match) for match in matches]
+            counts = Counter(chain.from_iterable(bests))
+            needed = math.ceil(_MIN_SCORE * n - 1e-9)
+            scored += [(entry, sum(best.get(entry, 0.0) for best in bests) / n)
+                       for entry, count in counts.items() if needed <= count < n]
+        # Best (score, fewest words) first, popped only as far as needed
+        heap = [(-score, self.entry_words[entry], entry) for entry, score in scored if score >= _MIN_SCORE]
+        heapq.heapify(heap)
+
+        # Rows of one type are contiguous in the store
+        starts = self.store.type_starts
+        ranges = [(starts[code], starts[code + 1]) for code in (codes or ())]
+        row_offsets, row_ids = self.entry_offsets, self.entry_row_ids
+        hits = []
+        while heap:
+            neg, words, entry = heapq.heappop(heap)
+            for row in row_ids[row_offsets[entry]:row_offsets[entry + 1]]:
+                if not ranges or any(start <= row < end for start, end in ranges):
+                    hits.append((neg, words, row))
+            # Once there are enough rows, stop at the next change of (score,
+            # words): later names can't rank ahead of the rows taken so far
+            if limit is not None and len(hits) >= limit and (not heap or heap[0][:2] != (neg, words)):
+                break
+        key = tie_break or (lambda row: row)
+        hits.sort(key=lambda hit: (hit[0], hit[1], key(hit[2])))
+        return [(row, -neg) for neg, _, row in hits[:limit]]
@@ -1,17 +1,61 @@
 from fastapi import APIRouter, Query
+from pydantic import BaseModel, Field
 from typing import List, Optional
-from .nearby_utils import query_nearby
+from .nearby_utils import query_nearby, query_nearby_batch, search_stops
 
 router = APIRouter(tags=["nearby"])
 
+# Most points accepted by one /batch request
+MAX_BATCH_POINTS = 200
+
 
 @router.get("/")
-async def get_nearby(lat: float = Query(...), lng: float = Query(...), radius: int = Query(800), types: Optional[List[str]] = Query(None), limit: int = Query(50)):
-    """Return nearby transport stops and POIs. Supports optional `types` filter (repeatable), `radius` in meters, and `limit`."""
+async def get_nearby(lat: float = Query(...), lng: float = Query(...), radius: Optional[int] = Query(None), types: Optional[List[str]] = Query(None), limit: int = Query(50), k: Optional[int] = Query(None, ge=1, le=500)):
+    """Return nearby transport stops and POIs. Supports optional `types` filter (repeatable), `radius` in meters (default 800), and `limit`.
+    With `k`, returns the k nearest stops instead, however far away (`radius`, if given, still caps the search)."""
     try:
         # types can be provided multiple times: ?types=Bus Stop&types=MTR
         # query_nearby expects list of types or None
-        results = await query_nearby(lat, lng, radius_m=radius, types=types, limit=limit)
+        results = await query_nearby(lat, lng, radius_m=radius, types=types, limit=limit, k=k)
+        return {"results": results}
+    except Exception as e:
+        return {"results": [], "error": str(e)}
+
+
+@router.get("/search")
+async def search_nearby(q: str = Query(..., min_length=1), types: Optional[List[str]] = Query(None), limit: int = Query(10, ge=1, le=100), lat: Optional[float] = Query(None), lng: Optional[float] = Query(None)):
+    """Stops by name: ranked matches for `q`, tolerant of prefixes and misspellings. Supports the `types` filter;
+    with `lat` and `lng`, equally good matches come nearest first."""
+    try:
+        near = (lat, lng) if lat is not None and lng is not None else None
+        results = await search_stops(q, types=types, limit=limit, near=near)
         return {"results": results}
     except Exception as e:
         return {"results": [], "error": str(e)}
+
+
+class NearbyPoint(BaseModel):
+    lat: float
+    lng: float
+    radius: Optional[int] = None
+    types: Optional[List[str]] = None
+    limit: int = 50
+    k: Optional[int] = Field(None, ge=1, le=500)
+
+
+class NearbyBatchRequest(BaseModel):
+    points: List[NearbyPoint] = Field(..., max_length=MAX_BATCH_POINTS)
+
+
+@router.post("/batch")
+async def get_nearby_batch(req: NearbyBatchRequest):
+    """Nearby stops for many points in one request. Each point takes the same options as GET /;
+    `results` holds one list per point, in order."""
+    try:
+        results = await query_nearby_batch([
+            {"lat": p.lat, "lng": p.lng, "radius_m": p.radius, "types": p.types, "limit": p.limit, "k": p.k}
+            for p in req.points
+        ])
+        return {"results": results}
+    except Exception as e:
+        return {"results": [[] for _ in req.points], "error": str(e)}
@@ -1,11 +1,15 @@
 import asyncio
-import math
 import os
 import json
+import logging
+import math
 import time
-from typing import List, Dict, Any, Tuple
-import httpx
-from geopy.distance import geodesic
+from typing import List, Dict, Any, Optional, Tuple
+
+from . import http_clients
+from .name_index import NameIndex
+from .snapshot_utils import SnapshotError
+from .stop_store import BASE_CELL_DEG, StopStore, StopType, meters_per_degree
 
 BUS_URL = "https://data.etabus.gov.hk/v1/transport/kmb/stop"
 MTR_URL = "https://rt.data.gov.hk/v1/transport/mtr/station_lat_lng.json"
@@ -59,11 +63,32 @@ MTR_STATIONS = {
     "austin": {"name": "Austin Station", "lat": 22.3044, "lng": 114.1707},
 }
 
+# Seconds between background refreshes of the stop index (0 disables them)
+REFRESH_TTL = float(os.getenv("NEARBY_REFRESH_TTL", "21600"))
+
+# A refresh that returns fewer rows than this fraction of the current index
+# (e.g. the KMB download failed and only the samples came back) is discarded
+_MIN_REFRESH_RATIO = 0.5
+
+# Seconds to wait after a failed or discarded load, or one without the KMB
+# stops, before trying again
+_RETRY_DELAY = 60.0
+
+logger = logging.getLogger(__name__)
+
+# "store" is only ever replaced as a whole, so readers always see either
+# the previous or the next complete index
 _cache: Dict[str, Any] = {
     "fetched": False,
-    "points": [],
-    "grid": {},
-    "cell_size_deg": 0.005,
+    "store": None,
+    # NameIndex over the names in "store", swapped in together with it
+    "names": None,
+    "cell_size_deg": BASE_CELL_DEG,
+    "refreshed_at": None,
+    # Whether "store" has the KMB stops; one without them is never saved
+    "complete": False,
+    # In-flight _build_store task shared by concurrent loaders
+    "loading": None,
 }
 
 
@@ -82,6 +107,10 @@ def _mtr_json_path() -> str:
     return os.path.join(_data_dir(), "mtr_stations.json")
 
 
+def _snapshot_path() -> str:
+    return os.path.join(_data_dir(), "nearby_stops.bin")
+
+
 def _normalize_bus(item: Dict[str, Any]) -> Dict[str, Any]:
     lat = item.get("lat")
     lng = item.get("long") or item.get("lng") or item.get("lon")
@@ -89,9 +118,10 @@ def _normalize_bus(item: Dict[str, Any]) -> Dict[str, Any]:
         return None
     return {
         "name": item.get("name_en" ) or item.get("name" ) or item.get("name_tc" , ""),
-        "type": "Bus Stop",
+        "type": StopType.BUS.value,
         "lat": float(lat),
         "lng": float(lng),
+        "stop_id": item.get("stop"),
     }
 
 
@@ -104,7 +134,7 @@ def _normalize_minibus(route_item: Dict[str, Any]) -> List[Dict[str, Any]]:
             continue
         out.append({
             "name": stop.get("name_en" , stop.get("name") ),
-            "type": "Minibus",
+            "type": StopType.MINIBUS.value,
             "lat": float(lat),
             "lng": float(lng),
         })
@@ -118,7 +148,7 @@ def _normalize_ferry(item: Dict[str, Any]) -> Dict[str, Any]:
         return None
     return {
         "name": item.get("name_en") or item.get("name"),
-        "type": "Ferry Pier",
+        "type": StopType.FERRY.value,
         "lat": float(lat),
         "lng": float(lng),
     }
@@ -132,7 +162,7 @@ def _normalize_taxi(feature: Dict[str, Any]) -> Dict[str, Any]:
         return None
     return {
         "name": props.get("stand_name_en") or props.get("stand_name") or props.get("standname"),
-        "type": "Taxi Stand",
+        "type": StopType.TAXI.value,
         "lat": float(lat),
         "lng": float(lng),
     }
@@ -145,28 +175,33 @@ def _normalize_mtr(code: str, station: Dict[str, Any]) -> Dict[str, Any]:
         return None
     return {
         "name": station.get("name_en") or station.get("name"),
-        "type": "MTR",
+        "type": StopType.MTR.value,
         "lat": float(lat),
         "lng": float(lng),
+        "stop_id": code,
     }
 
 
-async def _fetch_all_sources() -> List[Dict[str, Any]]:
+async def _fetch_all_sources() -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Every stop from every source, and whether the KMB bus stops are among
+    them (False when their download failed and only the samples and MTR
+    stations came back)
+    """
     points: List[Dict[str, Any]] = []
 
     # BUS - fetch from API
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            res = await client.get(BUS_URL)
-            if res.status_code == 200:
-                data = res.json()
-                for b in data.get("data", []):
-                    try:
-                        normalized = _normalize_bus(b)
-                        if normalized:
-                            points.append(normalized)
-                    except Exception:
-                        continue
+        res = await http_clients.client("kmb").get(BUS_URL, timeout=10.0)
+        if res.status_code == 200:
+            data = res.json()
+            for b in data.get("data", []):
+                try:
+                    normalized = _normalize_bus(b)
+                    if normalized:
+                        points.append(normalized)
+                except Exception:
+                    continue
     except Exception:
         pass
 
@@ -174,7 +209,7 @@ async def _fetch_all_sources() -> List[Dict[str, Any]]:
     for item in SAMPLE_MINIBUS:
         points.append({
             "name": item["name"],
-            "type": "Minibus",
+            "type": StopType.MINIBUS.value,
             "lat": item["lat"],
             "lng": item["lng"],
         })
@@ -183,7 +218,7 @@ async def _fetch_all_sources() -> List[Dict[str, Any]]:
     for item in SAMPLE_FERRY:
         points.append({
             "name": item["name"],
-            "type": "Ferry Pier",
+            "type": StopType.FERRY.value,
             "lat": item["lat"],
             "lng": item["lng"],
         })
@@ -192,7 +227,7 @@ async def _fetch_all_sources() -> List[Dict[str, Any]]:
     for item in SAMPLE_TAXI:
         points.append({
             "name": item["name"],
-            "type": "Taxi Stand",
+            "type": StopType.TAXI.value,
             "lat": item["lat"],
             "lng": item["lng"],
         })
@@ -205,7 +240,7 @@ async def _fetch_all_sources() -> List[Dict[str, Any]]:
         for station_data in MTR_STATIONS.values():
             points.append({
                 "name": station_data["name"],
-                "type": "MTR",
+                "type": StopType.MTR.value,
                 "lat": station_data["lat"],
                 "lng": station_data["lng"],
             })
@@ -220,86 +255,225 @@ async def _fetch_all_sources() -> List[Dict[str, Any]]:
         seen.add(key)
         dedup.append(p)
 
-    return dedup
+    complete = any(p["type"] == StopType.BUS.value for p in dedup)
+    return dedup, complete
 
 
-def _grid_key(lat: float, lng: float, cell_size_deg: float) -> Tuple[int, int]:
-    ix = int(math.floor(lat / cell_size_deg))
-    iy = int(math.floor(lng / cell_size_deg))
-    return ix, iy
+def _pack(points: List[Dict[str, Any]], cell_size: float) -> Tuple[StopStore, NameIndex]:
+    store = StopStore.build(points, cell_size)
+    return store, NameIndex(store)
 
 
-def _build_grid(points: List[Dict[str, Any]], cell_size_deg: float) -> Dict[Tuple[int, int], List[Dict[str, Any]]]:
-    grid: Dict[Tuple[int, int], List[Dict[str, Any]]] = {}
-    for p in points:
-        key = _grid_key(p["lat"], p["lng"], cell_size_deg)
-        grid.setdefault(key, []).append(p)
-    return grid
+async def _build_store() -> Tuple[StopStore, NameIndex, bool]:
+    """
+    Fetch every source and pack a new index and its name index, off to the
+    side of the live ones; also returns whether it has the KMB stops
+    """
+    points, complete = await _fetch_all_sources()
+    cell_size = _cache.get("cell_size_deg", BASE_CELL_DEG)
+    # Sorting, packing and tokenizing is CPU work; keep it off the event loop
+    store, names = await asyncio.to_thread(_pack, points, cell_size)
+    return store, names, complete
+
+
+async def _build_store_once() -> Tuple[StopStore, NameIndex, bool]:
+    """
+    Single-flight _build_store: callers that arrive while a build is in
+    flight await that build instead of starting their own, and all of them
+    get its result or its exception. A failed build is not remembered, so
+    the next caller starts afresh.
+    """
+    task: Optional[asyncio.Task] = _cache.get("loading")
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        task = asyncio.ensure_future(_build_store())
+        _cache["loading"] = task
+
+        def _done(t: asyncio.Task):
+            if _cache.get("loading") is t:
+                _cache["loading"] = None
+        task.add_done_callback(_done)
+    # A cancelled caller (e.g. a dropped request) must not cancel the shared build
+    return await asyncio.shield(task)
+
+
+def _swap_store(store: StopStore, names: NameIndex, refreshed_at: Optional[float] = None, complete: bool = True):
+    _cache["store"] = store
+    _cache["names"] = names
+    # An index without the KMB stops doesn't count as a refresh
+    if complete:
+        _cache["refreshed_at"] = refreshed_at or time.time()
+    _cache["complete"] = complete
+    _cache["fetched"] = True
+
+
+def _save_snapshot(store: StopStore, fetched_at: float):
+    try:
+        store.save(_snapshot_path(), meta={"fetched_at": fetched_at})
+    except (OSError, SnapshotError):
+        logger.exception("could not write the nearby stop snapshot")
 
 
-def _bbox_keys(lat: float, lng: float, radius_m: float, cell_size_deg: float) -> List[Tuple[int, int]]:
-    # Convert meters to degrees approximately
-    lat_deg = radius_m / 111320.0
-    lng_deg = radius_m / (111320.0 * max(math.cos(math.radians(lat)), 0.0001))
-    min_lat = lat - lat_deg
-    max_lat = lat + lat_deg
-    min_lng = lng - lng_deg
-    max_lng = lng + lng_deg
+async def _install(store: StopStore, names: NameIndex, complete: bool = True):
+    """
+    Swap in a freshly fetched store and its name index and, if it has the
+    KMB stops, persist it for the next start
+    """
+    _swap_store(store, names, complete=complete)
+    if complete:
+        await asyncio.to_thread(_save_snapshot, store, _cache["refreshed_at"])
 
-    ix_min = int(math.floor(min_lat / cell_size_deg))
-    ix_max = int(math.floor(max_lat / cell_size_deg))
-    iy_min = int(math.floor(min_lng / cell_size_deg))
-    iy_max = int(math.floor(max_lng / cell_size_deg))
 
-    keys = []
-    for ix in range(ix_min, ix_max + 1):
-        for iy in range(iy_min, iy_max + 1):
-            keys.append((ix, iy))
-    return keys
+def _has_bus_stops(store: StopStore) -> bool:
+    return any(store.type_starts[code + 1] > store.type_starts[code]
+               for code in store.type_codes_for([StopType.BUS.value]) or ())
+
+
+def load_snapshot() -> bool:
+    """
+    Install the index from the last snapshot, if there is a usable one.
+    Synchronous and network-free, for startup; refresh_loop revalidates it
+    once it is older than the refresh TTL (counted from when it was fetched).
+    """
+    try:
+        store, meta = StopStore.load(_snapshot_path())
+    except SnapshotError:
+        return False
+    if store.cell_size_deg != _cache.get("cell_size_deg", BASE_CELL_DEG):
+        return False
+    # Written without the KMB stops (e.g. offline); fetch them instead
+    if not _has_bus_stops(store):
+        return False
+    _swap_store(store, NameIndex(store), refreshed_at=meta.get("fetched_at"))
+    return True
 
 
 async def ensure_cache():
     if _cache["fetched"]:
         return
-    points = await _fetch_all_sources()
-    _cache["points"] = points
-    cell_size = _cache.get("cell_size_deg", 0.005)
-    _cache["grid"] = _build_grid(points, cell_size)
-    _cache["fetched"] = True
+    store, names, complete = await _build_store_once()
+    # Only the first waiter installs it; later ones may find a newer store
+    if not _cache["fetched"]:
+        await _install(store, names, complete)
 
 
-def _distance_m(a: Tuple[float, float], b: Tuple[float, float]) -> float:
-    return geodesic(a, b).meters
+async def refresh_cache(force: bool = False) -> bool:
+    """
+    Rebuild the index and swap it in. A rebuild without the KMB stops only
+    replaces another one without them, and unless forced, one that came
+    back much smaller than the live index is dropped. Returns whether the
+    new index was installed.
+    """
+    store, names, complete = await _build_store_once()
+    current: Optional[StopStore] = _cache.get("store")
+    if not complete and _cache.get("complete"):
+        logger.warning("nearby refresh came back without the KMB stops; keeping the current index")
+        return False
+    if not force and current is not None and len(store) < len(current) * _MIN_REFRESH_RATIO:
+        logger.warning("nearby refresh returned %d stops (had %d); keeping the current index",
+                       len(store), len(current))
+        return False
+    await _install(store, names, complete)
+    return True
+
+
+async def refresh_loop(ttl: float = REFRESH_TTL):
+    """
+    Warm the index, then rebuild it every ttl seconds (0 loads it just
+    once). A load that fails or comes back without the KMB stops, the
+    first one included, is retried after _RETRY_DELAY. Meant to run as a
+    background task for the app's lifetime; cancel it on shutdown.
+    """
+    while True:
+        complete = _cache.get("complete")
+        if complete and ttl <= 0:
+            return
+        due = (_cache.get("refreshed_at") or 0.0) + ttl if complete else 0.0
+        if time.time() < due:
+            await asyncio.sleep(due - time.time())
+            continue
+        try:
+            installed = await refresh_cache(force=not _cache["fetched"])
+        except Exception:
+            logger.exception("nearby index load failed")
+            installed = False
+        if not (installed and _cache.get("complete")):
+            await asyncio.sleep(_RETRY_DELAY)
 
 
-async def query_nearby(lat: float, lng: float, radius_m: float = 800, types: List[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
-    # Cache should already be preloaded at startup, just use it
+async def _current_store() -> Optional[StopStore]:
+    # Normally preloaded by refresh_loop at startup
     if not _cache.get("fetched"):
         await ensure_cache()
-    
-    points = _cache.get("points", [])
-    grid = _cache.get("grid", {})
-    cell_size = _cache.get("cell_size_deg", 0.005)
-
-    candidate_keys = _bbox_keys(lat, lng, radius_m, cell_size)
-    candidates = []
-    for k in candidate_keys:
-        for p in grid.get(k, []):
-            if types and p.get("type") not in types and (p.get("type") or "").lower() not in [t.lower() for t in types]:
-                continue
-            try:
-                d = _distance_m((lat, lng), (p["lat"], p["lng"]))
-            except Exception:
-                continue
-            if d <= radius_m:
-                item = p.copy()
-                item["distance"] = round(d)
-                item["walk_min"] = round(d / 70)
-                candidates.append(item)
+    # Take one reference; a concurrent refresh swaps in a new store object
+    return _cache.get("store")
 
-    # sort by distance and return top `limit`
-    candidates.sort(key=lambda x: x["distance"])
-    return candidates[:limit]
+
+async def query_nearby(lat: float, lng: float, radius_m: Optional[float] = 800, types: List[str] = None, limit: int = 50,
+                       k: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Stops within radius_m (800 m if None), nearest first, at most limit.
+    With k, the k nearest stops instead, however far away; radius_m, if
+    not None, still caps the search.
+    """
+    return (await query_nearby_batch([{
+        "lat": lat, "lng": lng, "radius_m": radius_m, "types": types, "limit": limit, "k": k,
+    }]))[0]
+
+
+async def query_nearby_batch(queries: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    Answer several query_nearby calls at once. Each query is a dict of
+    query_nearby's arguments (lat and lng required); results come back in
+    the same order, all from one store. Radius queries are answered
+    together by StopStore.within_many, in one distance pass for the batch.
+    """
+    store = await _current_store()
+    if store is None:
+        return [[] for _ in queries]
+
+    # Work on row ids and distances; only the returned rows become dicts
+    hits: List[Optional[List[Tuple[int, float]]]] = [None] * len(queries)
+    radius_queries, radius_slots = [], []
+    for i, q in enumerate(queries):
+        codes = store.type_codes_for(q.get("types"))
+        radius_m = q.get("radius_m")
+        if q.get("k") is not None:
+            hits[i] = store.nearest(q["lat"], q["lng"], q["k"], codes, max_radius_m=radius_m)
+        else:
+            radius_queries.append((q["lat"], q["lng"], 800 if radius_m is None else radius_m,
+                                   codes, max(q.get("limit", 50), 0)))
+            radius_slots.append(i)
+    for i, found in zip(radius_slots, store.within_many(radius_queries)):
+        hits[i] = found
+    return [[store.row(row, d) for row, d in found] for found in hits]
+
+
+async def search_stops(text: str, types: List[str] = None, limit: int = 10,
+                       near: Optional[Tuple[float, float]] = None) -> List[Dict[str, Any]]:
+    """
+    Stops whose names best match text, best first, each with its match
+    "score" (1 for every word matching in full). Prefixes and misspelt
+    words match with lower scores. With near=(lat, lng), equally good
+    matches are ordered by distance from it, and carry "distance" and
+    "walk_min" like query_nearby results.
+    """
+    if await _current_store() is None:
+        return []
+    # The store and its name index are swapped in together; take them as a pair
+    names: NameIndex = _cache["names"]
+    store = names.store
+
+    distance = None
+    if near is not None:
+        ky, kx = meters_per_degree(near[0])
+
+        def distance(row: int) -> float:
+            return math.hypot((store.lat[row] - near[0]) * ky, (store.lng[row] - near[1]) * kx)
+
+    return [
+        {**store.row(row, distance(row) if distance else None), "score": round(score, 3)}
+        for row, score in names.search(text, store.type_codes_for(types), limit, tie_break=distance)
+    ]
 
 
 async def load_mtr_stations(stale_days: int = 14) -> List[Dict[str, Any]]:
@@ -341,9 +515,10 @@ async def load_mtr_stations(stale_days: int = 14) -> List[Dict[str, Any]]:
                     continue
                 points.append({
                     "name": name,
-                    "type": "MTR",
+                    "type": StopType.MTR.value,
                     "lat": float(lat),
                     "lng": float(lng),
+                    "stop_id": s.get("code"),
                 })
             except Exception:
                 continue
@@ -353,20 +528,19 @@ async def load_mtr_stations(stale_days: int = 14) -> List[Dict[str, Any]]:
     fetched_points: List[Dict[str, Any]] = []
     fetch_error: Exception | None = None
     try:
-        async with httpx.AsyncClient(timeout=15.0, headers={
+        res = await http_clients.client("gov").get(MTR_URL, timeout=15.0, headers={
             "User-Agent": "HK Smart Transport/1.0 (+https://github.com/mirzausamaikram/hk-smart-transport)",
             "Accept": "application/json"
-        }) as client:
-            res = await client.get(MTR_URL)
-            if res.status_code == 200:
-                data = res.json()
-                mtr_data = data.get("data", {})
-                for code, station_info in mtr_data.items():
-                    normalized = _normalize_mtr(code, station_info)
-                    if normalized:
-                        fetched_points.append(normalized)
-            else:
-                fetch_error = Exception(f"HTTP {res.status_code}")
+        })
+        if res.status_code == 200:
+            data = res.json()
+            mtr_data = data.get("data", {})
+            for code, station_info in mtr_data.items():
+                normalized = _normalize_mtr(code, station_info)
+                if normalized:
+                    fetched_points.append(normalized)
+        else:
+            fetch_error = Exception(f"HTTP {res.status_code}")
     except Exception as e:
         fetch_error = e
 
@@ -377,6 +551,7 @@ async def load_mtr_stations(stale_days: int = 14) -> List[Dict[str, Any]]:
                 "updated_at": int(time.time()),
                 "stations": [{
                     "name_en": p.get("name"),
+                    "code": p.get("stop_id"),
                     "lat": p.get("lat"),
                     "lng": p.get("lng")
                 } for p in fetched_points]
@@ -399,9 +574,10 @@ async def load_mtr_stations(stale_days: int = 14) -> List[Dict[str, Any]]:
                     continue
                 points.append({
                     "name": name,
-                    "type": "MTR",
+                    "type": StopType.MTR.value,
                     "lat": float(lat),
                     "lng": float(lng),
+                    "stop_id": s.get("code"),
                 })
             except Exception:
                 continue
@@ -412,7 +588,7 @@ async def load_mtr_stations(stale_days: int = 14) -> List[Dict[str, Any]]:
     for station_data in MTR_STATIONS.values():
         fallback.append({
             "name": station_data["name"],
-            "type": "MTR",
+            "type": StopType.MTR.value,
             "lat": station_data["lat"],
             "lng": station_data["lng"],
         })
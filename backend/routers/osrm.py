@@ -0,0 +1,98 @@
+"""
+Async client for the OSRM route and table services.
+
+Requests go through the pooled "osrm" client from http_clients, so a
+slow OSRM response only suspends the request waiting on it; the event
+loop keeps serving everything else. Every failure is raised as an
+OSRMError subclass saying what went wrong (timeout, service unreachable
+or failing, no route between the points), for the endpoints to turn
+into their error responses.
+
+Points are (lat, lng) pairs, as everywhere else in the backend; OSRM's
+lng,lat order stays inside this module.
+"""
+
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import httpx
+
+from . import http_clients
+
+Point = Tuple[float, float]
+
+# OSRM response codes meaning the points can't be connected (rather than a bad request)
+_NO_ROUTE_CODES = {"NoRoute", "NoSegment", "NoMatch", "NoTrips"}
+
+
+class OSRMError(Exception):
+    """An OSRM request failed. code is OSRM's response code, if it sent one."""
+
+    def __init__(self, message: str, code: Optional[str] = None):
+        super().__init__(message)
+        self.code = code
+
+
+class OSRMTimeout(OSRMError):
+    """OSRM did not answer within the timeout"""
+
+
+class OSRMUnavailable(OSRMError):
+    """OSRM could not be reached, or answered with a server error"""
+
+
+class OSRMNoRoute(OSRMError):
+    """OSRM found no route (or table) between the points"""
+
+
+def _coords(points: Sequence[Point]) -> str:
+    return ";".join(f"{lng},{lat}" for lat, lng in points)
+
+
+async def _get(path: str, params: Dict[str, str], client: Optional[httpx.AsyncClient],
+               timeout: Optional[float]) -> Dict[str, Any]:
+    client = client or http_clients.client("osrm")
+    kwargs = {} if timeout is None else {"timeout": timeout}
+    try:
+        res = await client.get(path, params=params, **kwargs)
+    except httpx.TimeoutException as e:
+        raise OSRMTimeout(f"OSRM timed out: {e!r}") from e
+    except httpx.TransportError as e:
+        raise OSRMUnavailable(f"cannot connect to OSRM: {e!r}") from e
+    if res.status_code >= 500:
+        raise OSRMUnavailable(f"OSRM answered HTTP {res.status_code}")
+    try:
+        body = res.json()
+    except ValueError as e:
+        raise OSRMError(f"OSRM answered HTTP {res.status_code} with invalid JSON") from e
+    code = body.get("code") if isinstance(body, dict) else None
+    if code != "Ok":
+        message = body.get("message") if isinstance(body, dict) else None
+        error = OSRMNoRoute if code in _NO_ROUTE_CODES else OSRMError
+        raise error(message or f"OSRM answered HTTP {res.status_code} ({code})", code)
+    return body
+
+
+async def route(points: Sequence[Point], profile: str = "driving", steps: bool = False,
+                client: Optional[httpx.AsyncClient] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    The best OSRM route through points, in order: the first entry of the
+    response's routes, with distance (m), duration (s), a GeoJSON geometry
+    and legs (with turn-by-turn steps if asked for). Raises OSRMError.
+    """
+    body = await _get(f"/route/v1/{profile}/{_coords(points)}",
+                      {"overview": "full", "geometries": "geojson", **({"steps": "true"} if steps else {})},
+                      client, timeout)
+    if not body.get("routes"):
+        raise OSRMNoRoute("OSRM returned no routes", body.get("code"))
+    return body["routes"][0]
+
+
+async def table(points: Sequence[Point], profile: str = "driving",
+                client: Optional[httpx.AsyncClient] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    OSRM's many-to-many table between points: the response with its
+    "durations" (s) and "distances" (m) matrices. Raises OSRMError.
+    """
+    return await _get(f"/table/v1/{profile}/{_coords(points)}", {"annotations": "distance,duration"},
+                      client, timeout)
+
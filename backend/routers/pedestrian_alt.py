@@ -0,0 +1,149 @@
+"""
+Landmark (ALT) lower bounds for pedestrian A*.
+
+For a landmark L and any nodes v, t, the triangle inequality gives
+d(v, t) >= |d(L, t) - d(L, v)|. Walking edges are undirected, so a single
+Dijkstra per landmark covers both directions. On networks where paths
+have to detour via footbridges, tunnels and harbour crossings, these
+bounds are much tighter than straight-line distance, so A* settles far
+fewer nodes.
+
+Landmarks are picked by farthest-point selection, optionally seeded with
+fixed locations. Build offline with
+`python -m routers.pedestrian_router --landmarks 8`.
+"""
+
+import heapq
+import math
+from array import array
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from .snapshot_utils import SnapshotError, read_snapshot, write_snapshot
+
+SNAPSHOT_KIND = "pedestrian-alt"
+SNAPSHOT_VERSION = 1
+
+DEFAULT_LANDMARKS = 8
+
+# Landmarks consulted per query, chosen as the ones that bound d(source, target) best
+ACTIVE_LANDMARKS = 4
+
+
+def dijkstra_all(graph, source: int) -> array:
+    """Distances from source to every node of the graph (inf if unreachable)"""
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    dist = array('d', [math.inf]) * graph.node_count
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for k in range(offsets[u], offsets[u + 1]):
+            x = targets[k]
+            nd = d + weights[k]
+            if nd < dist[x]:
+                dist[x] = nd
+                heapq.heappush(heap, (nd, x))
+    return dist
+
+
+class Landmarks:
+    """Landmark node ids and their distance tables, flattened as distances[i * n + v]"""
+
+    def __init__(self, nodes, distances, node_count: int):
+        self.nodes = nodes
+        self.distances = distances
+        self.node_count = node_count
+
+    @classmethod
+    def select(cls, graph, count: int = DEFAULT_LANDMARKS, seeds: Iterable[int] = ()) -> "Landmarks":
+        """
+        Farthest-point selection: each new landmark is the node whose
+        distance to the nearest landmark chosen so far is largest.
+        """
+        n = graph.node_count
+        nodes = array('i')
+        distances = array('d')
+        nearest = array('d', [math.inf]) * n
+
+        def add(node_id: int):
+            dist = dijkstra_all(graph, node_id)
+            nodes.append(node_id)
+            distances.extend(dist)
+            for v in range(n):
+                if dist[v] < nearest[v]:
+                    nearest[v] = dist[v]
+
+        for node_id in seeds:
+            if len(nodes) < count:
+                add(node_id)
+
+        if not nodes and n:
+            # Start from the node farthest away from an arbitrary one
+            dist = dijkstra_all(graph, 0)
+            add(max(range(n), key=lambda v: dist[v] if dist[v] < math.inf else -1.0))
+
+        while len(nodes) < min(count, n):
+            # Unreached nodes (other components) are not useful landmarks here
+            candidate = max(range(n), key=lambda v: nearest[v] if nearest[v] < math.inf else -1.0)
+            if nearest[candidate] <= 0.0:
+                break
+            add(candidate)
+
+        return cls(nodes, distances, n)
+
+    def lower_bound(self, target: int, source: Optional[int] = None,
+                    active: int = ACTIVE_LANDMARKS) -> Callable[[int], float]:
+        """
+        Return h(v), a lower bound on d(v, target). With a source, only the
+        `active` landmarks that bound d(source, target) best are consulted.
+        """
+        n = self.node_count
+        dist = self.distances
+        pairs = []
+        for i in range(len(self.nodes)):
+            base = i * n
+            dt = dist[base + target]
+            if dt == math.inf:
+                continue
+            if source is not None:
+                ds = dist[base + source]
+                if ds == math.inf:
+                    continue
+                pairs.append((abs(dt - ds), base, dt))
+            else:
+                pairs.append((0.0, base, dt))
+        if source is not None:
+            pairs.sort(reverse=True)
+            pairs = pairs[:active]
+        pairs = [(base, dt) for _, base, dt in pairs]
+
+        def bound(v: int) -> float:
+            best = 0.0
+            for base, dt in pairs:
+                dv = dist[base + v]
+                b = dt - dv if dt > dv else dv - dt
+                if b > best:
+                    best = b
+            return best
+
+        return bound
+
+    def save(self, alt_file: Path, graph):
+        write_snapshot(alt_file, SNAPSHOT_KIND, SNAPSHOT_VERSION, {
+            "nodes": self.nodes,
+            "distances": self.distances,
+        }, meta={"node_count": graph.node_count, "edge_count": graph.edge_count})
+
+    @classmethod
+    def load(cls, alt_file: Path, graph) -> Optional["Landmarks"]:
+        """Memory-map saved landmarks; None if missing or built for another graph"""
+        try:
+            arrays, meta = read_snapshot(alt_file, SNAPSHOT_KIND, SNAPSHOT_VERSION)
+        except SnapshotError:
+            return None
+        if meta.get("node_count") != graph.node_count or meta.get("edge_count") != graph.edge_count:
+            return None
+        return cls(arrays["nodes"], arrays["distances"], graph.node_count)
@@ -0,0 +1,327 @@
+"""
+Contraction hierarchy (CH) for the pedestrian network.
+
+Preprocessing contracts nodes one at a time in order of importance (edge
+difference, contracted neighbours and hierarchy depth, with lazy updates).
+Whenever a node's removal would lengthen a shortest path between two
+neighbours, it adds a shortcut edge between them. Only "upward" edges, from each node to
+neighbours contracted after it, are kept in CSR form. Each shortcut
+remembers the node it bypasses, so paths can be unpacked.
+
+A query is a bidirectional Dijkstra over the upward graph. Walking edges
+are undirected, so the backward search uses the same upward edges. It
+settles a few hundred nodes instead of most of the network, and returns
+the same distance as A* over the original graph.
+
+Build offline with `python -m routers.pedestrian_router --ch`.
+"""
+
+import heapq
+import math
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .snapshot_utils import SnapshotError, read_snapshot, write_snapshot
+
+SNAPSHOT_KIND = "pedestrian-ch"
+SNAPSHOT_VERSION = 1
+
+# Witness searches give up after settling this many nodes; a missed witness
+# only costs an unnecessary shortcut, never a wrong answer.
+WITNESS_SETTLE_LIMIT = 60
+
+
+class ContractionHierarchy:
+    """Upward CSR graph produced by contraction, plus node ranks"""
+
+    def __init__(self, rank, up_offsets, up_targets, up_weights, up_mid):
+        self.rank = rank
+        self.up_offsets = up_offsets
+        self.up_targets = up_targets
+        self.up_weights = up_weights
+        self.up_mid = up_mid
+
+    @property
+    def node_count(self) -> int:
+        return len(self.rank)
+
+    # ------------------------------------------------------------------
+    # Preprocessing
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, graph, witness_settle_limit: int = WITNESS_SETTLE_LIMIT) -> "ContractionHierarchy":
+        """Contract every node of a PedestrianNetworkGraph"""
+        n = graph.node_count
+        offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+
+        # Remaining (uncontracted) graph: adj[u][v] = (weight, bypassed node or -1)
+        adj: List[Dict[int, Tuple[float, int]]] = [{} for _ in range(n)]
+        for u in range(n):
+            nbrs = adj[u]
+            for k in range(offsets[u], offsets[u + 1]):
+                v = targets[k]
+                w = weights[k]
+                if v != u and (v not in nbrs or w < nbrs[v][0]):
+                    nbrs[v] = (w, -1)
+
+        deleted_neighbors = array('i', bytes(4 * n))
+        level = array('i', bytes(4 * n))
+        rank = array('i', bytes(4 * n))
+        up_edges: List[Optional[List[Tuple[int, float, int]]]] = [None] * n
+
+        def shortcuts_for(v: int) -> List[Tuple[int, int, float]]:
+            """Shortcuts (u, x, weight) needed if v were contracted now"""
+            nbrs = list(adj[v].items())
+            needed = []
+            for i, (u, (wu, _)) in enumerate(nbrs):
+                via = {x: wu + wx for x, (wx, _) in nbrs[i + 1:]}
+                if not via:
+                    continue
+                witness = cls._witness_search(adj, u, v, max(via.values()), witness_settle_limit)
+                for x, d in via.items():
+                    if witness.get(x, math.inf) > d:
+                        needed.append((u, x, d))
+            return needed
+
+        def priority(v: int, shortcut_count: int) -> int:
+            # Edge difference, plus terms that spread contraction evenly
+            # over the network and keep the hierarchy shallow
+            edge_difference = shortcut_count - len(adj[v])
+            return 2 * edge_difference + deleted_neighbors[v] + level[v]
+
+        heap = [(priority(v, len(shortcuts_for(v))), v) for v in range(n)]
+        heapq.heapify(heap)
+        next_rank = 0
+        while heap:
+            _, v = heapq.heappop(heap)
+            # Lazy update: re-queue if v is no longer the cheapest node
+            shortcuts = shortcuts_for(v)
+            p = priority(v, len(shortcuts))
+            if heap and p > heap[0][0]:
+                heapq.heappush(heap, (p, v))
+                continue
+
+            up_edges[v] = [(x, w, mid) for x, (w, mid) in adj[v].items()]
+            for x in adj[v]:
+                del adj[x][v]
+                deleted_neighbors[x] += 1
+                level[x] = max(level[x], level[v] + 1)
+            for u, x, w in shortcuts:
+                if x not in adj[u] or w < adj[u][x][0]:
+                    adj[u][x] = (w, v)
+                    adj[x][u] = (w, v)
+            adj[v] = {}
+
+            rank[v] = next_rank
+            next_rank += 1
+
+        up_offsets = array('i', [0])
+        up_targets = array('i')
+        up_weights = array('d')
+        up_mid = array('i')
+        for v in range(n):
+            for x, w, mid in up_edges[v]:
+                up_targets.append(x)
+                up_weights.append(w)
+                up_mid.append(mid)
+            up_offsets.append(len(up_targets))
+        return cls(rank, up_offsets, up_targets, up_weights, up_mid)
+
+    @staticmethod
+    def _witness_search(adj, source: int, skip: int, max_dist: float, settle_limit: int) -> Dict[int, float]:
+        """Bounded Dijkstra in the remaining graph that avoids `skip`"""
+        dist = {source: 0.0}
+        heap = [(0.0, source)]
+        settled = 0
+        while heap and settled < settle_limit:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            if d > max_dist:
+                break
+            settled += 1
+            for x, (w, _) in adj[u].items():
+                if x == skip:
+                    continue
+                nd = d + w
+                if nd < dist.get(x, math.inf):
+                    dist[x] = nd
+                    heapq.heappush(heap, (nd, x))
+        return dist
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def query(self, source: int, target: int) -> Tuple[Optional[List[int]], float, int]:
+        """
+        Bidirectional upward Dijkstra.
+        Returns: (path as node ids, distance in meters, nodes settled) or (None, 0, settled)
+        """
+        if source == target:
+            return [source], 0.0, 0
+
+        up_offsets, up_targets, up_weights = self.up_offsets, self.up_targets, self.up_weights
+        dist = ({source: 0.0}, {target: 0.0})
+        parent: Tuple[Dict[int, Tuple[int, int]], Dict[int, Tuple[int, int]]] = ({}, {})
+        heaps = ([(0.0, source)], [(0.0, target)])
+        settled = (set(), set())
+        best = math.inf
+        meet = -1
+
+        while True:
+            fwd_top = heaps[0][0][0] if heaps[0] else math.inf
+            bwd_top = heaps[1][0][0] if heaps[1] else math.inf
+            if min(fwd_top, bwd_top) >= best:
+                break
+            side = 0 if fwd_top <= bwd_top else 1
+
+            d, u = heapq.heappop(heaps[side])
+            if u in settled[side] or d > dist[side][u]:
+                continue
+            settled[side].add(u)
+
+            other = dist[1 - side].get(u)
+            if other is not None and d + other < best:
+                best = d + other
+                meet = u
+
+            side_dist, side_parent, side_heap = dist[side], parent[side], heaps[side]
+            edges = range(up_offsets[u], up_offsets[u + 1])
+
+            # Stall on demand: if a higher node already reached reaches u more
+            # cheaply (edges are undirected), u is not on a shortest up-down path.
+            if any(side_dist.get(up_targets[k], math.inf) + up_weights[k] < d for k in edges):
+                continue
+
+            for k in edges:
+                x = up_targets[k]
+                nd = d + up_weights[k]
+                if nd < side_dist.get(x, math.inf):
+                    side_dist[x] = nd
+                    side_parent[x] = (u, k)
+                    heapq.heappush(side_heap, (nd, x))
+
+        settled_count = len(settled[0]) + len(settled[1])
+        if meet < 0:
+            return None, 0, settled_count
+
+        # source -> meet, as upward edges walked from the source side
+        fwd_edges = []
+        node = meet
+        while node in parent[0]:
+            prev, k = parent[0][node]
+            fwd_edges.append((prev, node, k))
+            node = prev
+        fwd_edges.reverse()
+
+        # meet -> target, walking the backward search's edges in reverse
+        bwd_edges = []
+        node = meet
+        while node in parent[1]:
+            prev, k = parent[1][node]
+            bwd_edges.append((node, prev, k))
+            node = prev
+
+        path = [source]
+        for a, b, k in fwd_edges + bwd_edges:
+            self._unpack_edge(a, b, k, path)
+        return path, best, settled_count
+
+    def upward_search(self, source: int) -> Dict[int, float]:
+        """
+        Exhaustive upward Dijkstra from source with stall-on-demand.
+        Returns: {node id: distance} for every node that was not stalled
+        """
+        up_offsets, up_targets, up_weights = self.up_offsets, self.up_targets, self.up_weights
+        dist = {source: 0.0}
+        reached = {}
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in reached or d > dist[u]:
+                continue
+            edges = range(up_offsets[u], up_offsets[u + 1])
+            if any(dist.get(up_targets[k], math.inf) + up_weights[k] < d for k in edges):
+                continue
+            reached[u] = d
+            for k in edges:
+                x = up_targets[k]
+                nd = d + up_weights[k]
+                if nd < dist.get(x, math.inf):
+                    dist[x] = nd
+                    heapq.heappush(heap, (nd, x))
+        return reached
+
+    def many_to_many(self, sources: List[int], targets: List[int]) -> List[List[float]]:
+        """
+        Bucket-based distance table: one upward search per target fills
+        buckets at the nodes it reaches, then one upward search per source
+        scans those buckets. Returns matrix[i][j] = d(sources[i], targets[j]),
+        inf where unreachable.
+        """
+        buckets: Dict[int, List[Tuple[int, float]]] = {}
+        spaces: Dict[int, Dict[int, float]] = {}
+        for j, t in enumerate(targets):
+            if t not in spaces:
+                spaces[t] = self.upward_search(t)
+            for u, d in spaces[t].items():
+                buckets.setdefault(u, []).append((j, d))
+
+        matrix = []
+        for s in sources:
+            if s not in spaces:
+                spaces[s] = self.upward_search(s)
+            row = [math.inf] * len(targets)
+            for u, d in spaces[s].items():
+                for j, dt in buckets.get(u, ()):
+                    if d + dt < row[j]:
+                        row[j] = d + dt
+            matrix.append(row)
+        return matrix
+
+    def _edge_index(self, u: int, x: int) -> int:
+        for k in range(self.up_offsets[u], self.up_offsets[u + 1]):
+            if self.up_targets[k] == x:
+                return k
+        raise KeyError((u, x))
+
+    def _unpack_edge(self, a: int, b: int, k: int, out: List[int]):
+        """Append the original nodes after `a` along (possibly shortcut) edge k to `out`"""
+        stack = [(a, b, k)]
+        while stack:
+            a, b, k = stack.pop()
+            mid = self.up_mid[k]
+            if mid < 0:
+                out.append(b)
+                continue
+            # The bypassed node was contracted first, so both halves are stored at it
+            stack.append((mid, b, self._edge_index(mid, b)))
+            stack.append((a, mid, self._edge_index(mid, a)))
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, ch_file: Path, graph):
+        write_snapshot(ch_file, SNAPSHOT_KIND, SNAPSHOT_VERSION, {
+            "rank": self.rank,
+            "up_offsets": self.up_offsets,
+            "up_targets": self.up_targets,
+            "up_weights": self.up_weights,
+            "up_mid": self.up_mid,
+        }, meta={"node_count": graph.node_count, "edge_count": graph.edge_count})
+
+    @classmethod
+    def load(cls, ch_file: Path, graph) -> Optional["ContractionHierarchy"]:
+        """Memory-map a saved hierarchy; None if missing or built for another graph"""
+        try:
+            arrays, meta = read_snapshot(ch_file, SNAPSHOT_KIND, SNAPSHOT_VERSION)
+        except SnapshotError:
+            return None
+        if meta.get("node_count") != graph.node_count or meta.get("edge_count") != graph.edge_count:
+            return None
+        return cls(arrays["rank"], arrays["up_offsets"], arrays["up_targets"],
+                   arrays["up_weights"], arrays["up_mid"])
@@ -1,19 +1,60 @@
 """
 Graph-based pedestrian network router using HK's 3D Pedestrian Network.
 Builds a routable graph from GeoJSON and provides A* pathfinding.
+
+The graph is stored in compressed sparse row (CSR) form: nodes are
+contiguous ints with their coordinates in flat arrays, and the neighbours
+of node u are targets[offsets[u]:offsets[u + 1]] with matching weights.
 """
 
-import json
 import heapq
 import math
+import os
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Tuple, Dict, Optional
+from typing import Callable, List, Tuple, Dict, Optional
 from dataclasses import dataclass
 
+from .geojson_utils import iter_features
+from .pedestrian_alt import DEFAULT_LANDMARKS, Landmarks
+from .pedestrian_ch import ContractionHierarchy
+from .snapshot_utils import SnapshotError, read_snapshot, write_snapshot
+
+# Vertices closer than this (in degrees, per axis) are merged into one node
+SNAP_TOLERANCE_DEG = 0.0001
+
+# Cell size of the nearest-node grid (~110 m of latitude)
+INDEX_CELL_SIZE_DEG = 0.001
+
+# Offsets packing (ix, iy) grid cells into one sortable int key
+_CELL_BIAS = 1 << 20
+_CELL_STRIDE = 1 << 21
+
+# Snap cells are much finer (~1.1M columns at HK longitudes), so their keys
+# pack as cx * _SNAP_STRIDE + cy instead
+_SNAP_STRIDE = 1 << 32
+
+METERS_PER_DEG_LAT = 111320.0
+
+# Search strategies for route_ids. "auto" picks the contraction hierarchy if
+# one is loaded, then A* with landmark (ALT) bounds if landmarks are loaded,
+# else plain A*.
+SEARCH_MODES = ("auto", "astar", "alt", "bidirectional", "ch")
+
+# Walking routes remembered per (start node, end node) pair
+ROUTE_CACHE_SIZE = int(os.getenv("PEDESTRIAN_ROUTE_CACHE", "4096"))
+
+# Binary snapshot produced by `python -m routers.pedestrian_router`; bump the
+# version whenever the arrays written by save_snapshot change.
+SNAPSHOT_KIND = "pedestrian-graph"
+SNAPSHOT_VERSION = 1
+
 @dataclass
 class Node:
-    """A node in the pedestrian network"""
-    id: str
+    """A node in the pedestrian network (a view onto the graph arrays)"""
+    id: int
     lat: float
     lng: float
     
@@ -23,24 +64,67 @@ class Node:
     def __eq__(self, other):
         return self.id == other.id
 
-@dataclass
-class Edge:
-    """An edge between two nodes"""
-    from_node: Node
-    to_node: Node
-    distance: float
+class RouteCache:
+    """Bounded LRU of find_route results keyed on snapped (start id, end id)"""
+    
+    def __init__(self, maxsize: int = ROUTE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[int, int], tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
     
-    def __lt__(self, other):
-        return self.distance < other.distance
+    def get(self, key: Tuple[int, int]) -> Optional[tuple]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+    
+    def put(self, key: Tuple[int, int], entry: tuple):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def clear(self):
+        self._entries.clear()
+    
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
 
 class PedestrianNetworkGraph:
     """Graph representation of the pedestrian network"""
     
     def __init__(self):
-        self.nodes: Dict[str, Node] = {}
-        self.edges: Dict[str, List[Edge]] = {}
+        self.lat = array('d')
+        self.lng = array('d')
+        self.offsets = array('i', [0])
+        self.targets = array('i')
+        self.weights = array('d')
+        self._snap_grid: Dict[int, int] = {}
+        self.index: Optional[NodeGridIndex] = None
+        self.ch: Optional[ContractionHierarchy] = None
+        self.landmarks: Optional[Landmarks] = None
+        self.search_mode = "auto"
+        self.route_cache = RouteCache()
         self.loaded = False
     
+    @property
+    def node_count(self) -> int:
+        return len(self.lat)
+    
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+    
+    def node(self, node_id: int) -> Node:
+        return Node(id=node_id, lat=self.lat[node_id], lng=self.lng[node_id])
+    
     @staticmethod
     def haversine(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
         """Calculate distance in meters between two lat/lng points"""
@@ -55,18 +139,19 @@ class PedestrianNetworkGraph:
         return R * c
     
     def load_from_geojson(self, geojson_file: Path) -> bool:
-        """Load the pedestrian network from a GeoJSON file"""
+        """
+        Load the pedestrian network from a GeoJSON file in a single streaming
+        pass, so peak memory follows the graph rather than the parsed JSON.
+        """
         try:
-            with open(geojson_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Handle different GeoJSON structures
-            features = data.get('features', [])
+            # Undirected edge list, compiled into CSR once all features are read
+            edge_src = array('i')
+            edge_dst = array('i')
+            edge_len = array('d')
             
-            node_counter = 0
-            
-            # First pass: extract all nodes from line features
-            for feature in features:
+            # Stream features one at a time, snapping vertices onto shared
+            # nodes and creating edges along linestrings
+            for feature in iter_features(geojson_file):
                 if feature.get('type') != 'Feature':
                     continue
                 
@@ -74,40 +159,27 @@ class PedestrianNetworkGraph:
                 geom_type = geometry.get('type')
                 coords = geometry.get('coordinates', [])
                 
-                if geom_type == 'LineString' and coords:
-                    # Create nodes at each vertex of the linestring
-                    for i, (lng, lat) in enumerate(coords):
-                        node_id = f"node_{node_counter}_{i}"
-                        if node_id not in self.nodes:
-                            self.nodes[node_id] = Node(id=node_id, lat=lat, lng=lng)
-                            self.edges[node_id] = []
-                        node_counter += 1
-            
-            # Second pass: create edges along linestrings
-            for feature in features:
-                geometry = feature.get('geometry', {})
-                geom_type = geometry.get('type')
-                coords = geometry.get('coordinates', [])
-                
                 if geom_type == 'LineString' and len(coords) > 1:
-                    # Connect consecutive vertices
-                    for i in range(len(coords) - 1):
-                        lng1, lat1 = coords[i]
-                        lng2, lat2 = coords[i + 1]
-                        
-                        # Find or create nodes
-                        node1_id = self._find_or_create_node(lat1, lng1)
+                    # Connect consecutive vertices (3D coordinates carry a trailing z)
+                    lng1, lat1 = coords[0][0], coords[0][1]
+                    node1_id = self._find_or_create_node(lat1, lng1)
+                    for i in range(1, len(coords)):
+                        lng2, lat2 = coords[i][0], coords[i][1]
                         node2_id = self._find_or_create_node(lat2, lng2)
                         
-                        if node1_id and node2_id:
-                            node1 = self.nodes[node1_id]
-                            node2 = self.nodes[node2_id]
-                            distance = self.haversine(lat1, lng1, lat2, lng2)
-                            
-                            # Add bidirectional edges (pedestrians can walk both ways)
-                            self.edges[node1_id].append(Edge(node1, node2, distance))
-                            self.edges[node2_id].append(Edge(node2, node1, distance))
+                        if node1_id != node2_id:
+                            edge_src.append(node1_id)
+                            edge_dst.append(node2_id)
+                            edge_len.append(self.haversine(lat1, lng1, lat2, lng2))
+                        
+                        lng1, lat1, node1_id = lng2, lat2, node2_id
             
+            # The snapping grid is only needed while loading
+            self._snap_grid = {}
+            self._renumber_by_cell(edge_src, edge_dst)
+            self._build_csr(edge_src, edge_dst, edge_len)
+            self.index = NodeGridIndex.build(self.lat, self.lng)
+            self.route_cache.clear()
             self.loaded = True
             return True
         
@@ -116,29 +188,126 @@ class PedestrianNetworkGraph:
         except Exception:
             return False
     
-    def _find_or_create_node(self, lat: float, lng: float, tolerance: float = 0.0001) -> Optional[str]:
-        """Find existing node within tolerance or create new one"""
-        for node_id, node in self.nodes.items():
-            if abs(node.lat - lat) < tolerance and abs(node.lng - lng) < tolerance:
-                return node_id
+    def _find_or_create_node(self, lat: float, lng: float, tolerance: float = SNAP_TOLERANCE_DEG) -> int:
+        """
+        Find existing node within tolerance or create new one.
+        Nodes are bucketed in a hash grid with cells one tolerance wide, so a
+        match can only live in the 3x3 block of cells around the vertex. Any
+        two points in one cell are within tolerance of each other, so a cell
+        never holds more than one node and the grid maps a packed cell key
+        straight to a node id.
+        """
+        cx = math.floor(lat / tolerance)
+        cy = math.floor(lng / tolerance)
+        snap_grid = self._snap_grid
+        
+        best_id = None
+        for ix in (cx - 1, cx, cx + 1):
+            row = ix * _SNAP_STRIDE
+            for iy in (cy - 1, cy, cy + 1):
+                node_id = snap_grid.get(row + iy)
+                if node_id is not None and abs(self.lat[node_id] - lat) < tolerance and abs(self.lng[node_id] - lng) < tolerance:
+                    # Keep the earliest-created match, as a linear scan would
+                    if best_id is None or node_id < best_id:
+                        best_id = node_id
+        if best_id is not None:
+            return best_id
         
-        node_id = f"node_{len(self.nodes)}"
-        self.nodes[node_id] = Node(id=node_id, lat=lat, lng=lng)
-        self.edges[node_id] = []
+        node_id = len(self.lat)
+        self.lat.append(lat)
+        self.lng.append(lng)
+        snap_grid[cx * _SNAP_STRIDE + cy] = node_id
         return node_id
     
-    def find_nearest_node(self, lat: float, lng: float, max_distance: float = 500) -> Optional[Node]:
-        """Find the nearest node within max_distance meters"""
-        nearest = None
-        min_dist = max_distance
+    def _renumber_by_cell(self, edge_src: array, edge_dst: array):
+        """Renumber nodes in grid-cell order (in place) so NodeGridIndex cells are id ranges"""
+        order = NodeGridIndex.node_order(self.lat, self.lng)
+        new_id = array('i', bytes(4 * len(order)))
+        for new, old in enumerate(order):
+            new_id[old] = new
+        self.lat = array('d', (self.lat[old] for old in order))
+        self.lng = array('d', (self.lng[old] for old in order))
+        for k in range(len(edge_src)):
+            edge_src[k] = new_id[edge_src[k]]
+            edge_dst[k] = new_id[edge_dst[k]]
+    
+    def _build_csr(self, edge_src: array, edge_dst: array, edge_len: array):
+        """Compile an undirected edge list into CSR arrays (both directions)"""
+        n = len(self.lat)
+        degree = array('i', bytes(4 * (n + 1)))
+        for u in edge_src:
+            degree[u + 1] += 1
+        for v in edge_dst:
+            degree[v + 1] += 1
+        
+        offsets = degree
+        for u in range(n):
+            offsets[u + 1] += offsets[u]
         
-        for node in self.nodes.values():
-            dist = self.haversine(lat, lng, node.lat, node.lng)
-            if dist < min_dist:
-                nearest = node
-                min_dist = dist
+        m = offsets[n]
+        targets = array('i', bytes(4 * m))
+        weights = array('d', bytes(8 * m))
+        fill = array('i', offsets[:n])
+        for u, v, w in zip(edge_src, edge_dst, edge_len):
+            k = fill[u]
+            targets[k] = v
+            weights[k] = w
+            fill[u] = k + 1
+            k = fill[v]
+            targets[k] = u
+            weights[k] = w
+            fill[v] = k + 1
+        
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+    
+    def save_snapshot(self, snapshot_file: Path):
+        """Write the compiled graph and its node index as a binary snapshot"""
+        write_snapshot(snapshot_file, SNAPSHOT_KIND, SNAPSHOT_VERSION, {
+            "lat": self.lat,
+            "lng": self.lng,
+            "offsets": self.offsets,
+            "targets": self.targets,
+            "weights": self.weights,
+            "cell_keys": self.index.cell_keys,
+            "cell_starts": self.index.cell_starts,
+        }, meta={"cell_size_deg": self.index.cell_size_deg})
+    
+    def load_from_snapshot(self, snapshot_file: Path) -> bool:
+        """
+        Memory-map a snapshot written by save_snapshot. Nothing is parsed or
+        copied, so this takes milliseconds and workers share the pages.
+        """
+        try:
+            arrays, meta = read_snapshot(snapshot_file, SNAPSHOT_KIND, SNAPSHOT_VERSION)
+        except SnapshotError:
+            return False
         
-        return nearest
+        self.lat = arrays["lat"]
+        self.lng = arrays["lng"]
+        self.offsets = arrays["offsets"]
+        self.targets = arrays["targets"]
+        self.weights = arrays["weights"]
+        self.index = NodeGridIndex(self.lat, self.lng, meta["cell_size_deg"],
+                                   arrays["cell_keys"], arrays["cell_starts"])
+        self.route_cache.clear()
+        self.loaded = True
+        return True
+    
+    def find_nearest_node(self, lat: float, lng: float, max_distance: float = 500) -> Optional[Node]:
+        """Find the nearest node within max_distance meters"""
+        if self.index is None:
+            return None
+        found = self.index.nearest(lat, lng, max_distance)
+        return self.node(found[1]) if found else None
+    
+    def find_nearest_nodes(self, lat: float, lng: float, k: int = 5,
+                           max_distance: float = 500) -> List[Tuple[Node, float]]:
+        """Find up to k nearest nodes within max_distance meters, nearest first"""
+        if self.index is None:
+            return []
+        return [(self.node(node_id), d) for d, node_id in self.index.k_nearest(lat, lng, k, max_distance)]
     
     def a_star(self, start: Node, end: Node) -> Tuple[Optional[List[Node]], float]:
         """
@@ -148,32 +317,47 @@ class PedestrianNetworkGraph:
         if not self.loaded:
             return None, 0
         
-        # Find start node ID
-        start_id = None
-        end_id = None
-        for nid, node in self.nodes.items():
-            if node == start:
-                start_id = nid
-            if node == end:
-                end_id = nid
-        
-        if not start_id or not end_id:
+        path, distance, _ = self._a_star_ids(start.id, end.id)
+        if path is None:
             return None, 0
+        return [self.node(node_id) for node_id in path], distance
+    
+    def _potential(self, target_id: int, source_id: Optional[int] = None,
+                   use_landmarks: bool = True) -> Callable[[int], float]:
+        """
+        Lower bound on the walking distance from a node to target_id:
+        straight-line distance, tightened by landmark bounds when available.
+        """
+        lat, lng = self.lat, self.lng
+        haversine = self.haversine
+        target_lat, target_lng = lat[target_id], lng[target_id]
         
-        # A* algorithm
-        open_set = []
-        heapq.heappush(open_set, (0, start_id))
+        if not use_landmarks or self.landmarks is None:
+            return lambda v: haversine(lat[v], lng[v], target_lat, target_lng)
         
-        came_from = {}
-        g_score = {node_id: float('inf') for node_id in self.nodes}
-        g_score[start_id] = 0
+        landmark_bound = self.landmarks.lower_bound(target_id, source_id)
         
-        f_score = {node_id: float('inf') for node_id in self.nodes}
-        f_score[start_id] = self.haversine(
-            self.nodes[start_id].lat, self.nodes[start_id].lng,
-            self.nodes[end_id].lat, self.nodes[end_id].lng
-        )
+        def potential(v: int) -> float:
+            straight = haversine(lat[v], lng[v], target_lat, target_lng)
+            alt = landmark_bound(v)
+            return alt if alt > straight else straight
         
+        return potential
+    
+    def _a_star_ids(self, start_id: int, end_id: int,
+                    use_landmarks: bool = False) -> Tuple[Optional[List[int]], float, int]:
+        """
+        A* over the CSR arrays. Per-query state (g scores, parents, closed
+        set) is allocated lazily, so cost scales with the nodes explored
+        rather than the size of the graph.
+        Returns: (path as node ids, distance in meters, nodes settled)
+        """
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+        heuristic = self._potential(end_id, start_id, use_landmarks)
+        
+        open_set = [(heuristic(start_id), start_id)]
+        came_from: Dict[int, int] = {}
+        g_score: Dict[int, float] = {start_id: 0.0}
         closed_set = set()
         
         while open_set:
@@ -184,45 +368,133 @@ class PedestrianNetworkGraph:
             
             if current_id == end_id:
                 # Reconstruct path
-                path = []
+                path = [end_id]
                 node_id = end_id
                 while node_id in came_from:
-                    path.append(self.nodes[node_id])
                     node_id = came_from[node_id]
-                path.append(self.nodes[start_id])
+                    path.append(node_id)
                 path.reverse()
-                return path, g_score[end_id]
+                return path, g_score[end_id], len(closed_set) + 1
             
             closed_set.add(current_id)
+            current_g = g_score[current_id]
             
-            for edge in self.edges.get(current_id, []):
-                neighbor_id = None
-                for nid, node in self.nodes.items():
-                    if node == edge.to_node:
-                        neighbor_id = nid
-                        break
-                
-                if not neighbor_id or neighbor_id in closed_set:
+            for k in range(offsets[current_id], offsets[current_id + 1]):
+                neighbor_id = targets[k]
+                if neighbor_id in closed_set:
                     continue
                 
-                tentative_g = g_score[current_id] + edge.distance
+                tentative_g = current_g + weights[k]
                 
-                if tentative_g < g_score[neighbor_id]:
+                if tentative_g < g_score.get(neighbor_id, math.inf):
                     came_from[neighbor_id] = current_id
                     g_score[neighbor_id] = tentative_g
-                    h_score = self.haversine(
-                        self.nodes[neighbor_id].lat, self.nodes[neighbor_id].lng,
-                        self.nodes[end_id].lat, self.nodes[end_id].lng
-                    )
-                    f_score[neighbor_id] = tentative_g + h_score
-                    heapq.heappush(open_set, (f_score[neighbor_id], neighbor_id))
+                    heapq.heappush(open_set, (tentative_g + heuristic(neighbor_id), neighbor_id))
         
-        return None, 0
+        return None, 0, len(closed_set)
+    
+    def _bidirectional_a_star_ids(self, start_id: int, end_id: int,
+                                  use_landmarks: bool = True) -> Tuple[Optional[List[int]], float, int]:
+        """
+        Bidirectional A* with averaged potentials p(v) = (h_end(v) - h_start(v)) / 2
+        (forward keys d + p, backward keys d - p), which keeps both searches
+        consistent so they can stop once the two queue tops sum to the best
+        meeting distance found.
+        Returns: (path as node ids, distance in meters, nodes settled)
+        """
+        if start_id == end_id:
+            return [start_id], 0.0, 0
+        
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+        to_end = self._potential(end_id, start_id, use_landmarks)
+        to_start = self._potential(start_id, end_id, use_landmarks)
+        
+        def potential(v: int) -> float:
+            return 0.5 * (to_end(v) - to_start(v))
+        
+        sign = (1.0, -1.0)
+        dist: Tuple[Dict[int, float], Dict[int, float]] = ({start_id: 0.0}, {end_id: 0.0})
+        parent: Tuple[Dict[int, int], Dict[int, int]] = ({}, {})
+        heaps = ([(potential(start_id), start_id)], [(-potential(end_id), end_id)])
+        settled = (set(), set())
+        best = math.inf
+        meet = -1
+        
+        while heaps[0] and heaps[1]:
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            other = 1 - side
+            
+            _, u = heapq.heappop(heaps[side])
+            if u in settled[side]:
+                continue
+            settled[side].add(u)
+            
+            side_dist, other_dist = dist[side], dist[other]
+            d = side_dist[u]
+            for k in range(offsets[u], offsets[u + 1]):
+                x = targets[k]
+                if x in settled[side]:
+                    continue
+                nd = d + weights[k]
+                if nd < side_dist.get(x, math.inf):
+                    side_dist[x] = nd
+                    parent[side][x] = u
+                    heapq.heappush(heaps[side], (nd + sign[side] * potential(x), x))
+                    if x in other_dist and nd + other_dist[x] < best:
+                        best = nd + other_dist[x]
+                        meet = x
+            
+            if u in other_dist and d + other_dist[u] < best:
+                best = d + other_dist[u]
+                meet = u
+        
+        settled_count = len(settled[0]) + len(settled[1])
+        if meet < 0:
+            return None, 0, settled_count
+        
+        path = [meet]
+        node_id = meet
+        while node_id in parent[0]:
+            node_id = parent[0][node_id]
+            path.append(node_id)
+        path.reverse()
+        node_id = meet
+        while node_id in parent[1]:
+            node_id = parent[1][node_id]
+            path.append(node_id)
+        return path, best, settled_count
+    
+    def route_ids(self, start_id: int, end_id: int,
+                  mode: Optional[str] = None) -> Tuple[Optional[List[int]], float, int]:
+        """
+        Shortest walk between two node ids using the given search mode
+        (defaults to self.search_mode; see SEARCH_MODES).
+        Returns: (path as node ids, distance in meters, nodes settled)
+        """
+        mode = mode or self.search_mode
+        if mode == "auto":
+            if self.ch is not None:
+                mode = "ch"
+            elif self.landmarks is not None:
+                mode = "alt"
+            else:
+                mode = "astar"
+        
+        if mode == "ch" and self.ch is not None:
+            return self.ch.query(start_id, end_id)
+        if mode == "bidirectional":
+            return self._bidirectional_a_star_ids(start_id, end_id)
+        if mode == "alt":
+            return self._a_star_ids(start_id, end_id, use_landmarks=True)
+        return self._a_star_ids(start_id, end_id)
     
-    def find_route(self, start_lat: float, start_lng: float, 
+    def find_route(self, start_lat: float, start_lng: float,
                    end_lat: float, end_lng: float) -> Tuple[Optional[List[Tuple[float, float]]], float]:
         """
         Find walking route between two points using the pedestrian network.
+        Results are cached per snapped (start, end) node pair in route_cache.
         Returns: (polyline as [(lat, lng), ...], distance in meters) or (None, 0)
         """
         if not self.loaded:
@@ -235,31 +507,320 @@ class PedestrianNetworkGraph:
         if not start_node or not end_node:
             return None, 0
         
-        # Run A*
-        path, distance = self.a_star(start_node, end_node)
+        key = (start_node.id, end_node.id)
+        cached = self.route_cache.get(key)
+        if cached is None:
+            path, distance, _ = self.route_ids(start_node.id, end_node.id)
+            polyline = tuple((self.lat[node_id], self.lng[node_id]) for node_id in path) if path else None
+            cached = (polyline, distance)
+            self.route_cache.put(key, cached)
         
-        if path:
-            polyline = [(node.lat, node.lng) for node in path]
-            return polyline, distance
+        polyline, distance = cached
+        if polyline:
+            return list(polyline), distance
         
         return None, 0
+    
+    def distances_from(self, source_id: int, target_ids) -> Dict[int, float]:
+        """
+        One-to-many Dijkstra that stops once every target is settled.
+        Returns: {target id: distance in meters} for the reachable targets
+        """
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+        remaining = set(target_ids)
+        found: Dict[int, float] = {}
+        # A flat array beats a dict here: these searches touch much of the graph
+        dist = array('d', [math.inf]) * self.node_count
+        dist[source_id] = 0.0
+        heap = [(0.0, source_id)]
+        heappush, heappop = heapq.heappush, heapq.heappop
+        
+        while heap and remaining:
+            d, u = heappop(heap)
+            if d > dist[u]:
+                continue
+            if u in remaining:
+                remaining.discard(u)
+                found[u] = d
+            for k in range(offsets[u], offsets[u + 1]):
+                x = targets[k]
+                nd = d + weights[k]
+                if nd < dist[x]:
+                    dist[x] = nd
+                    heappush(heap, (nd, x))
+        
+        return found
+    
+    def matrix_uses_ch(self) -> bool:
+        """Whether distance_matrix is answered from the contraction hierarchy"""
+        return self.ch is not None and self.search_mode in ("auto", "ch")
+    
+    def distance_matrix(self, node_ids: List[int]) -> List[List[float]]:
+        """
+        Walking distances between every pair of node ids (inf where
+        unreachable). Uses contraction hierarchy buckets when a CH is loaded,
+        otherwise one Dijkstra per distinct node; walking edges are
+        undirected, so each run only needs the nodes after it.
+        """
+        if self.matrix_uses_ch():
+            return self.ch.many_to_many(node_ids, node_ids)
+        
+        unique = list(dict.fromkeys(node_ids))
+        between: Dict[Tuple[int, int], float] = {}
+        for i, u in enumerate(unique):
+            for v, d in self.distances_from(u, unique[i:]).items():
+                between[u, v] = between[v, u] = d
+        return [[between.get((u, v), math.inf) for v in node_ids] for u in node_ids]
+
+
+class NodeGridIndex:
+    """
+    Uniform grid over graph nodes for nearest / k-nearest lookups.
+    Node ids are assigned in cell order, so every cell is a contiguous id
+    range: the index is just the sorted keys of non-empty cells and the id
+    where each cell starts (plus a sentinel).
+    """
+    
+    def __init__(self, lat, lng, cell_size_deg: float, cell_keys, cell_starts):
+        self.lat = lat
+        self.lng = lng
+        self.cell_size_deg = cell_size_deg
+        self.cell_keys = cell_keys
+        self.cell_starts = cell_starts
+        self._cell_bounds: Optional[Tuple[int, int, int, int]] = None
+    
+    @staticmethod
+    def cell_key(lat: float, lng: float, cell_size_deg: float) -> int:
+        ix = math.floor(lat / cell_size_deg)
+        iy = math.floor(lng / cell_size_deg)
+        return (ix + _CELL_BIAS) * _CELL_STRIDE + (iy + _CELL_BIAS)
+    
+    @classmethod
+    def node_order(cls, lat, lng, cell_size_deg: float = INDEX_CELL_SIZE_DEG) -> array:
+        """Old node ids sorted by grid cell, i.e. the renumbering the index expects"""
+        keys = [cls.cell_key(lat[i], lng[i], cell_size_deg) for i in range(len(lat))]
+        return array('i', sorted(range(len(keys)), key=keys.__getitem__))
+    
+    @classmethod
+    def build(cls, lat, lng, cell_size_deg: float = INDEX_CELL_SIZE_DEG) -> "NodeGridIndex":
+        """Build the index over nodes that are already numbered in cell order"""
+        cell_keys = array('q')
+        cell_starts = array('i')
+        prev = None
+        for node_id in range(len(lat)):
+            key = cls.cell_key(lat[node_id], lng[node_id], cell_size_deg)
+            if key != prev:
+                cell_keys.append(key)
+                cell_starts.append(node_id)
+                prev = key
+        cell_starts.append(len(lat))
+        return cls(lat, lng, cell_size_deg, cell_keys, cell_starts)
+    
+    def _cell_range(self, ix: int, iy: int) -> range:
+        key = (ix + _CELL_BIAS) * _CELL_STRIDE + (iy + _CELL_BIAS)
+        j = bisect_left(self.cell_keys, key)
+        if j < len(self.cell_keys) and self.cell_keys[j] == key:
+            return range(self.cell_starts[j], self.cell_starts[j + 1])
+        return range(0)
+    
+    def cell_bounds(self) -> Tuple[int, int, int, int]:
+        """(min ix, max ix, min iy, max iy) over the non-empty cells"""
+        if self._cell_bounds is None:
+            iys = [key % _CELL_STRIDE - _CELL_BIAS for key in self.cell_keys]
+            self._cell_bounds = (self.cell_keys[0] // _CELL_STRIDE - _CELL_BIAS,
+                                 self.cell_keys[-1] // _CELL_STRIDE - _CELL_BIAS, min(iys), max(iys))
+        return self._cell_bounds
+    
+    @staticmethod
+    def _ring(cx: int, cy: int, r: int, bounds: Tuple[int, int, int, int]):
+        """Cells at Chebyshev distance exactly r from (cx, cy), within bounds"""
+        min_x, max_x, min_y, max_y = bounds
+        if r == 0:
+            if min_x <= cx <= max_x and min_y <= cy <= max_y:
+                yield cx, cy
+            return
+        for ix in (cx - r, cx + r):
+            if min_x <= ix <= max_x:
+                for iy in range(max(cy - r, min_y), min(cy + r, max_y) + 1):
+                    yield ix, iy
+        for iy in (cy - r, cy + r):
+            if min_y <= iy <= max_y:
+                for ix in range(max(cx - r + 1, min_x), min(cx + r - 1, max_x) + 1):
+                    yield ix, iy
+    
+    def k_nearest(self, lat: float, lng: float, k: int = 1, max_distance: float = 500) -> List[Tuple[float, int]]:
+        """
+        Up to k (distance_m, node_id) pairs within max_distance, nearest first.
+        Searches outward ring by ring and stops once no unvisited ring can
+        hold anything closer than the current k-th candidate, or once the
+        searched square covers every non-empty cell.
+        """
+        if k <= 0 or not self.cell_keys:
+            return []
+        
+        size = self.cell_size_deg
+        cx = math.floor(lat / size)
+        cy = math.floor(lng / size)
+        
+        # Metres per cell along each axis, and the gap from the query point
+        # to the edge of its own cell: ring r lies at least
+        # edge_gap + (r - 1) * cell_m away.
+        lat_cell_m = size * METERS_PER_DEG_LAT
+        lng_cell_m = lat_cell_m * max(math.cos(math.radians(lat)), 0.0001)
+        cell_m = min(lat_cell_m, lng_cell_m)
+        fx = lat / size - cx
+        fy = lng / size - cy
+        edge_gap = min(fx * lat_cell_m, (1 - fx) * lat_cell_m, fy * lng_cell_m, (1 - fy) * lng_cell_m)
+        
+        bounds = min_x, max_x, min_y, max_y = self.cell_bounds()
+        node_lat, node_lng = self.lat, self.lng
+        haversine = PedestrianNetworkGraph.haversine
+        best: List[Tuple[float, int]] = []  # max-heap of (-distance, node_id)
+        
+        # Rings closer in than the populated cells are empty
+        r = max(0, min_x - cx, cx - max_x, min_y - cy, cy - max_y)
+        if r > 0 and edge_gap + (r - 1) * cell_m > max_distance:
+            return []
+        while True:
+            for ix, iy in self._ring(cx, cy, r, bounds):
+                for node_id in self._cell_range(ix, iy):
+                    d = haversine(lat, lng, node_lat[node_id], node_lng[node_id])
+                    if d > max_distance:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, node_id))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, node_id))
+            
+            next_bound = edge_gap + r * cell_m
+            if next_bound > max_distance:
+                break
+            if len(best) == k and -best[0][0] <= next_bound:
+                break
+            # Past the populated cells there is nothing left to find
+            if cx - r <= min_x and cx + r >= max_x and cy - r <= min_y and cy + r >= max_y:
+                break
+            r += 1
+        
+        return sorted((-neg_d, node_id) for neg_d, node_id in best)
+    
+    def nearest(self, lat: float, lng: float, max_distance: float = 500) -> Optional[Tuple[float, int]]:
+        found = self.k_nearest(lat, lng, 1, max_distance)
+        return found[0] if found else None
 
 
 # Global instance
 _network = None
 
-def load_pedestrian_network(geojson_file: str = "data/hk_pedestrian_network.geojson") -> bool:
-    """Initialize the global pedestrian network"""
+def _snapshot_path(geojson_file: Path) -> Path:
+    return geojson_file.with_suffix(".bin")
+
+def _ch_path(snapshot_file: Path) -> Path:
+    return snapshot_file.with_suffix(".ch.bin")
+
+def _alt_path(snapshot_file: Path) -> Path:
+    return snapshot_file.with_suffix(".alt.bin")
+
+def _is_fresh(artifact: Path, source: Path) -> bool:
+    """True if artifact exists and is not older than source (when source exists)"""
+    if not artifact.is_file():
+        return False
+    return not source.is_file() or artifact.stat().st_mtime >= source.stat().st_mtime
+
+def load_pedestrian_network(geojson_file: str = "data/hk_pedestrian_network.geojson",
+                            search_mode: str = None) -> bool:
+    """
+    Initialize the global pedestrian network.
+    Prefers the compiled snapshot next to the GeoJSON (unless the GeoJSON
+    is newer) and falls back to parsing the GeoJSON itself. A contraction
+    hierarchy and landmarks built for the same graph are attached when
+    present. search_mode defaults to $PEDESTRIAN_SEARCH, then "auto".
+    """
     global _network
     _network = PedestrianNetworkGraph()
+    mode = search_mode or os.getenv("PEDESTRIAN_SEARCH", "auto")
+    if mode in SEARCH_MODES:
+        _network.search_mode = mode
+    geojson_path = Path(geojson_file)
+    snapshot_path = _snapshot_path(geojson_path)
     try:
-        return _network.load_from_geojson(Path(geojson_file))
+        loaded = _is_fresh(snapshot_path, geojson_path) and _network.load_from_snapshot(snapshot_path)
+        if not loaded:
+            loaded = _network.load_from_geojson(geojson_path)
+        if loaded and _is_fresh(_ch_path(snapshot_path), geojson_path):
+            _network.ch = ContractionHierarchy.load(_ch_path(snapshot_path), _network)
+        if loaded and _is_fresh(_alt_path(snapshot_path), geojson_path):
+            _network.landmarks = Landmarks.load(_alt_path(snapshot_path), _network)
+        return loaded
     except Exception:
         return False
 
-def route_walking(start_lat: float, start_lng: float, 
+def route_walking(start_lat: float, start_lng: float,
                   end_lat: float, end_lng: float) -> Tuple[Optional[List[Tuple[float, float]]], float]:
     """Get walking route using pedestrian network"""
     if not _network or not _network.loaded:
         return None, 0
     return _network.find_route(start_lat, start_lng, end_lat, end_lng)
+
+
+def route_cache_stats() -> dict:
+    """Size and hit/miss counters of the walking route cache"""
+    if not _network:
+        return {}
+    return _network.route_cache.stats()
+
+
+def walking_matrix(points: List[Tuple[float, float]], ch_only: bool = False) -> Optional[List[List[float]]]:
+    """
+    Walking distance matrix in meters between (lat, lng) points, snapped
+    to their nearest network nodes. Unreachable pairs are inf; returns None
+    if the network is not loaded or a point is too far from it. With
+    ch_only, also None unless a contraction hierarchy answers it (without
+    one every point costs a Dijkstra over the whole network).
+    """
+    if not _network or not _network.loaded:
+        return None
+    if ch_only and not _network.matrix_uses_ch():
+        return None
+    node_ids = []
+    for lat, lng in points:
+        node = _network.find_nearest_node(lat, lng)
+        if node is None:
+            return None
+        node_ids.append(node.id)
+    return _network.distance_matrix(node_ids)
+
+
+def build_snapshot(geojson_file: str = "data/hk_pedestrian_network.geojson", snapshot_file: str = None,
+                   contract: bool = False, landmarks: int = 0) -> Path:
+    """
+    Compile the GeoJSON network into the binary snapshot read at startup,
+    optionally with a contraction hierarchy and/or landmark distance
+    tables alongside it (slow, offline).
+    """
+    geojson_path = Path(geojson_file)
+    snapshot_path = Path(snapshot_file) if snapshot_file else _snapshot_path(geojson_path)
+    graph = PedestrianNetworkGraph()
+    if not graph.load_from_geojson(geojson_path):
+        raise SystemExit(f"Could not load {geojson_path}")
+    graph.save_snapshot(snapshot_path)
+    if contract:
+        ContractionHierarchy.build(graph).save(_ch_path(snapshot_path), graph)
+    if landmarks:
+        Landmarks.select(graph, landmarks).save(_alt_path(snapshot_path), graph)
+    return snapshot_path
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Compile the pedestrian network GeoJSON into a binary snapshot")
+    parser.add_argument("geojson", nargs="?", default="data/hk_pedestrian_network.geojson")
+    parser.add_argument("-o", "--output", help="snapshot path (default: GeoJSON path with .bin suffix)")
+    parser.add_argument("--ch", action="store_true", help="also build a contraction hierarchy (.ch.bin)")
+    parser.add_argument("--landmarks", type=int, nargs="?", const=DEFAULT_LANDMARKS, default=0,
+                        help=f"also precompute ALT landmark distances (.alt.bin), default {DEFAULT_LANDMARKS} landmarks")
+    args = parser.parse_args()
+    
+    out = build_snapshot(args.geojson, args.output, contract=args.ch, landmarks=args.landmarks)
+    print(f"Wrote {out}")
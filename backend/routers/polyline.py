@@ -0,0 +1,149 @@
+"""
+Compact polyline output for route responses.
+
+Routes are returned as [[lat, lng, style], ...] by default. Clients that
+opt in can instead get a Google encoded polyline string (1e-5 degree
+precision, a few bytes per vertex), and any client can pass the map zoom
+to have the line simplified with Douglas-Peucker to about one screen
+pixel first.
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence
+
+# Web Mercator ground resolution at zoom 0, in meters per pixel at the equator
+_METERS_PER_PIXEL_Z0 = 156543.03392
+_METERS_PER_DEG = 111320.0
+
+# Web map zoom levels; others are clamped to this range
+MIN_ZOOM = 0
+MAX_ZOOM = 22
+
+
+def tolerance_for_zoom(zoom: float, lat: float = 22.3) -> float:
+    """Simplification tolerance in meters: one pixel at this zoom and latitude"""
+    zoom = min(max(zoom, MIN_ZOOM), MAX_ZOOM)
+    return _METERS_PER_PIXEL_Z0 * math.cos(math.radians(lat)) / (2 ** zoom)
+
+
+def simplify(points: Sequence[Sequence[float]], tolerance_m: float) -> list:
+    """
+    Douglas-Peucker simplification of [lat, lng, ...] points (extra fields
+    such as the style are carried along). No dropped point ends up farther
+    than tolerance_m from the result. Distances are measured on a local
+    equirectangular projection, which is accurate at route scale.
+    """
+    n = len(points)
+    if n < 3 or tolerance_m <= 0:
+        return list(points)
+
+    kx = _METERS_PER_DEG * math.cos(math.radians(points[0][0]))
+    xs = [p[1] * kx for p in points]
+    ys = [p[0] * _METERS_PER_DEG for p in points]
+    keep = bytearray(n)
+    keep[0] = keep[n - 1] = 1
+    tol_sq = tolerance_m * tolerance_m
+
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        ax, ay, bx, by = xs[first], ys[first], xs[last], ys[last]
+        dx, dy = bx - ax, by - ay
+        seg_sq = dx * dx + dy * dy
+        span_x, span_y = xs[first + 1:last], ys[first + 1:last]
+
+        # Distance to the chord (scaled by its squared length) is cheap and
+        # picks the split point. It underestimates for points projecting past
+        # either end, so check those exactly before dropping the span.
+        if seg_sq > 0:
+            dist = [((x - ax) * dy - (y - ay) * dx) ** 2 for x, y in zip(span_x, span_y)]
+            limit = tol_sq * seg_sq
+        else:
+            dist = [(x - ax) ** 2 + (y - ay) ** 2 for x, y in zip(span_x, span_y)]
+            limit = tol_sq
+        worst = max(dist)
+        if worst <= limit and seg_sq > 0:
+            dist = [0.0 if 0 <= dot <= seg_sq else (x - ax) ** 2 + (y - ay) ** 2 if dot < 0 else (x - bx) ** 2 + (y - by) ** 2
+                    for x, y in zip(span_x, span_y) for dot in ((x - ax) * dx + (y - ay) * dy,)]
+            worst = max(dist)
+            limit = tol_sq
+        if worst > limit:
+            split = first + 1 + dist.index(worst)
+            keep[split] = 1
+            stack.append((first, split))
+            stack.append((split, last))
+
+    return [p for p, k in zip(points, keep) if k]
+
+
+# Encoded chunks of common coordinate deltas
+_chunk_cache: Dict[int, str] = {}
+_CHUNK_CACHE_SIZE = 1 << 16
+
+
+def _encode_value(value: int) -> str:
+    chunk = _chunk_cache.get(value)
+    if chunk is not None:
+        return chunk
+    v = ~(value << 1) if value < 0 else value << 1
+    out = []
+    while v >= 0x20:
+        out.append(chr((0x20 | (v & 0x1F)) + 63))
+        v >>= 5
+    out.append(chr(v + 63))
+    chunk = "".join(out)
+    if len(_chunk_cache) < _CHUNK_CACHE_SIZE:
+        _chunk_cache[value] = chunk
+    return chunk
+
+
+def encode(points: Sequence[Sequence[float]], precision: int = 5) -> str:
+    """Google encoded polyline of [lat, lng, ...] points"""
+    if not points:
+        return ""
+    factor = 10 ** precision
+    lats = [round(p[0] * factor) for p in points]
+    lngs = [round(p[1] * factor) for p in points]
+    deltas = [lats[0], lngs[0]]
+    for i in range(1, len(lats)):
+        deltas.append(lats[i] - lats[i - 1])
+        deltas.append(lngs[i] - lngs[i - 1])
+    get = _chunk_cache.get
+    return "".join([get(d) or _encode_value(d) for d in deltas])
+
+
+def decode(encoded: str, precision: int = 5) -> List[List[float]]:
+    """Inverse of encode: [[lat, lng], ...]"""
+    factor = 10 ** precision
+    points = []
+    index = lat = lng = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                b = ord(encoded[index]) - 63
+                index += 1
+                result |= (b & 0x1F) << shift
+                shift += 5
+                if b < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append([lat / factor, lng / factor])
+    return points
+
+
+def format_polyline(points: Sequence[Sequence[float]], fmt: str = "array", zoom: Optional[float] = None):
+    """
+    Shape a route polyline for a response: simplified for the given zoom
+    (if any), then either returned as a point list or encoded to a string.
+    """
+    if zoom is not None and points:
+        points = simplify(points, tolerance_for_zoom(zoom, points[0][0]))
+    if fmt == "encoded":
+        return encode(points)
+    return list(points)
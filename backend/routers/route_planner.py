@@ -1,36 +1,29 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-import requests
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
 import httpx
 import re
 import asyncio
 import math
-from . import tsp
-from .nearby_utils import query_nearby
-from .pedestrian_router import route_walking, load_pedestrian_network
+from . import mtr_network, osrm, route_stops, tsp
+from .http_clients import upstream
+from .polyline import MAX_ZOOM, MIN_ZOOM, format_polyline
+from .nearby_utils import query_nearby, query_nearby_batch, search_stops
+from .pedestrian_router import route_walking, load_pedestrian_network, route_cache_stats, walking_matrix
 
 router = APIRouter()
 
 try:
-    load_pedestrian_network()
-    PEDESTRIAN_NETWORK_LOADED = True
+    PEDESTRIAN_NETWORK_LOADED = load_pedestrian_network()
 except Exception:
     PEDESTRIAN_NETWORK_LOADED = False
 
-OSRM_URL = "http://router.project-osrm.org/route/v1/driving/"
-OSRM_WALK_URL = "http://router.project-osrm.org/route/v1/foot/"
-KMB_API_BASE = "https://data.etabus.gov.hk/v1/transport/kmb"
 WALKING_SPEED_M_PER_MIN = 83.3
-API_TIMEOUT = 5.0
-
-MTR_LINES = {
-    "Tsuen Wan Line": ["Central", "Admiralty", "Tsim Sha Tsui", "Jordan", "Yau Ma Tei", "Mong Kok", "Prince Edward", "Sham Shui Po", "Cheung Sha Wan", "Lai Chi Kok", "Mei Foo", "Lai King", "Kwai Fong", "Kwai Hing", "Tai Wo Hau", "Tsuen Wan"],
-    "Island Line": ["Kennedy Town", "HKU", "Sai Ying Pun", "Sheung Wan", "Central", "Admiralty", "Wan Chai", "Causeway Bay", "Tin Hau", "Fortress Hill", "North Point", "Quarry Bay", "Tai Koo", "Sai Wan Ho", "Shau Kei Wan", "Heng Fa Chuen", "Chai Wan"],
-    "Kwun Tong Line": ["Whampoa", "Ho Man Tin", "Yau Ma Tei", "Mong Kok", "Prince Edward", "Shek Kip Mei", "Kowloon Tong", "Lok Fu", "Wong Tai Sin", "Diamond Hill", "Choi Hung", "Kowloon Bay", "Ngau Tau Kok", "Kwun Tong", "Lam Tin", "Yau Tong", "Tiu Keng Leng"],
-    "Tuen Mun Line": ["Tuen Mun", "Siu Hong", "Tin Shui Wai", "Long Ping", "Yuen Long", "Kam Sheung Road", "Tsuen Wan West", "Mei Foo", "Nam Cheong", "Austin", "East Tsim Sha Tsui", "Hung Hom"],
-    "Tung Chung Line": ["Hong Kong", "Kowloon", "Olympic", "Nam Cheong", "Lai King", "Tsing Yi", "Sunny Bay", "Tung Chung"],
-    "East Rail Line": ["Admiralty", "Exhibition Centre", "Hung Hom", "Mong Kok East", "Kowloon Tong", "Tai Wai", "Sha Tin", "Fo Tan", "Racecourse", "University", "Tai Po Market", "Tai Wo", "Fanling", "Sheung Shui", "Lo Wu", "Lok Ma Chau"],
-}
+# Seconds transit_detail waits on its lookups; whatever hasn't finished by
+# then is cancelled and its part of the answer falls back to defaults
+TRANSIT_DETAIL_DEADLINE = 8.0
+# Most points accepted by /walking-matrix, as OSRM's table service caps them
+MAX_MATRIX_POINTS = 100
 
 COMMON_HK_BUS_ROUTES = ["2", "6", "9", "13X", "41A", "68E"]
 
@@ -47,90 +40,60 @@ def calculate_walk_time(distance_m: int) -> int:
 
 
 async def get_bus_routes_for_stop(stop_id: str) -> list:
-    """Get all bus routes serving a specific stop from KMB API"""
+    """Get all bus routes serving a specific stop from the KMB route-stop table"""
     try:
-        async with httpx.AsyncClient(timeout=API_TIMEOUT) as client:
-            response = await client.get(f"{KMB_API_BASE}/route-stop")
-            if response.status_code == 200:
-                data = response.json()
-                routes = []
-                for item in data.get("data", []):
-                    if item.get("stop") == stop_id:
-                        route_info = {
-                            "route": item.get("route"),
-                            "bound": item.get("bound"),
-                            "service_type": item.get("service_type"),
-                            "seq": item.get("seq")
-                        }
-                        if route_info not in routes:
-                            routes.append(route_info)
-                return routes
+        index = await route_stops.get_index()
     except Exception:
-        pass  # Silently fail and use fallback routes
-    return []
+        index = None
+    # No table yet: the caller falls back to common routes
+    return index.routes_for_stop(stop_id) if index else []
 
-async def get_stop_id_by_name(stop_name: str) -> str:
-    """Get stop ID from stop name"""
+async def get_stop_id_by_name(stop_name: str, lat: Optional[float] = None, lng: Optional[float] = None) -> str:
+    """Get the KMB stop ID of the best match for a stop name (the nearest one to lat/lng, if given)"""
+    near = (lat, lng) if lat is not None and lng is not None else None
     try:
-        async with httpx.AsyncClient(timeout=API_TIMEOUT) as client:
-            response = await client.get(f"{KMB_API_BASE}/stop")
-            if response.status_code == 200:
-                data = response.json()
-                for stop in data.get("data", []):
-                    if stop_name.upper() in stop.get("name_en", "").upper():
-                        return stop.get("stop")
+        matches = await search_stops(stop_name, types=["Bus Stop"], limit=1, near=near)
     except Exception:
-        pass
-    return None
+        return None
+    return matches[0]["stop_id"] if matches else None
 
 def find_mtr_connection(start_station: str, end_station: str) -> dict:
-    """Find MTR route between two stations with transfers"""
-    # Find which lines contain each station
-    start_lines = []
-    end_lines = []
-    
-    for line_name, stations in MTR_LINES.items():
-        if start_station in stations:
-            start_lines.append((line_name, stations.index(start_station)))
-        if end_station in stations:
-            end_lines.append((line_name, stations.index(end_station)))
-    
-    # Check for direct line
-    for start_line, start_idx in start_lines:
-        for end_line, end_idx in end_lines:
-            if start_line == end_line:
-                return {
-                    "direct": True,
-                    "line": start_line,
-                    "transfer_at": None
-                }
-    
-    # Find transfer station
-    for start_line, start_idx in start_lines:
-        for end_line, end_idx in end_lines:
-            # Find common stations between lines
-            start_stations = set(MTR_LINES[start_line])
-            end_stations = set(MTR_LINES[end_line])
-            common = start_stations & end_stations
-            
-            if common:
-                # Find the best transfer point
-                transfer_station = list(common)[0]
-                return {
-                    "direct": False,
-                    "start_line": start_line,
-                    "end_line": end_line,
-                    "transfer_at": transfer_station
-                }
-    
-    return {"direct": False, "transfer_at": "Central"}  # Default fallback
+    """Find the fastest MTR journey between two stations, with any transfers"""
+    journey = mtr_network.network.journey(start_station, end_station)
+    # Unknown station: no line or transfer to suggest
+    return journey or {"direct": False, "transfer_at": None}
+
+
+def mtr_journey_instruction(connection: dict) -> str:
+    """'Take <line> to <station>, then change to <line> to <station>...' for a journey's legs"""
+    parts = []
+    # Line of the last ride, None before boarding
+    riding = None
+    for leg in connection.get("legs", []):
+        if leg.get("walk"):
+            parts.append(f"walk to {leg['to']} station")
+        elif riding == leg["line"]:
+            # Between branches of the same line
+            parts.append(f"change trains to {leg['to']}")
+        else:
+            parts.append(f"{'change to' if riding else 'take'} {leg['line']} to {leg['to']}")
+            riding = leg["line"]
+    text = ", then ".join(parts)
+    return text[:1].upper() + text[1:]
 
 
 # ----------------------------------------------------------
 # MODELS
 # ----------------------------------------------------------
 
-class RouteRequest(BaseModel):
+class PolylineOptions(BaseModel):
+    # "encoded" returns a Google encoded polyline string instead of [[lat, lng, style], ...]
+    polyline_format: Literal["array", "encoded"] = "array"
+    # Map zoom level; when given, the line is simplified to about one pixel
+    zoom: Optional[float] = Field(None, ge=MIN_ZOOM, le=MAX_ZOOM)
+
+
+class RouteRequest(PolylineOptions):
     start_lat: float
     start_lng: float
     end_lat: float
@@ -138,18 +101,37 @@ class RouteRequest(BaseModel):
     walk_only: bool = False  # For direct walk-to-stop routes
 
 
-class MultiStopRequest(BaseModel):
+class MultiStopRequest(PolylineOptions):
     points: list[dict]
 
 
-class OptimizeRequest(BaseModel):
+class OptimizeRequest(PolylineOptions):
     points: list[dict]
 
 
+class WalkingMatrixRequest(BaseModel):
+    points: list[dict] = Field(..., max_length=MAX_MATRIX_POINTS)
+
+
 # ----------------------------------------------------------
 # HELPERS
 # ----------------------------------------------------------
 
+def local_walking_matrix(points: list[dict]):
+    """
+    Walking distance matrix from the pedestrian network's contraction
+    hierarchy, or None if there is none, there are more than
+    MAX_MATRIX_POINTS points, or any pair is unavailable (callers then
+    ask OSRM's table instead)
+    """
+    if not PEDESTRIAN_NETWORK_LOADED or len(points) > MAX_MATRIX_POINTS:
+        return None
+    matrix = walking_matrix([(p["lat"], p["lng"]) for p in points], ch_only=True)
+    if matrix is None or any(math.isinf(d) for row in matrix for d in row):
+        return None
+    return matrix
+
+
 def osrm_polyline(coords: list[list[float]], style: str = "dotted"):
     """Convert OSRM LNG,LAT → LAT,LNG polyline format with style"""
     return [[lat, lng, style] for lng, lat in coords]
@@ -157,14 +139,14 @@ def osrm_polyline(coords: list[list[float]], style: str = "dotted"):
 
 
 @router.post("/enhanced")
-async def enhanced_route(req: RouteRequest):
+async def enhanced_route(req: RouteRequest, osrm_client: httpx.AsyncClient = Depends(upstream("osrm"))):
     """Get detailed route with walking + transit instructions"""
     
-    # Find nearby transit stops at start (within 500m)
-    start_stops = await query_nearby(req.start_lat, req.start_lng, radius_m=500, limit=10)
-    
-    # Find nearby transit stops at end (within 500m)
-    end_stops = await query_nearby(req.end_lat, req.end_lng, radius_m=500, limit=10)
+    # Find nearby transit stops at start and end (within 500m)
+    start_stops, end_stops = await query_nearby_batch([
+        {"lat": req.start_lat, "lng": req.start_lng, "radius_m": 500, "limit": 10},
+        {"lat": req.end_lat, "lng": req.end_lng, "radius_m": 500, "limit": 10},
+    ])
     
     instructions = []
     total_distance = 0
@@ -187,12 +169,13 @@ async def enhanced_route(req: RouteRequest):
     
     # Fallback to OSRM if pedestrian network route not found
     if not polyline_out:
-        walk_coords = f"{req.start_lng},{req.start_lat};{req.end_lng},{req.end_lat}"
-        walk_url = f"{OSRM_WALK_URL}{walk_coords}?overview=full&geometries=geojson&steps=true"
-        walk_resp = requests.get(walk_url).json()
+        try:
+            route = await osrm.route([(req.start_lat, req.start_lng), (req.end_lat, req.end_lng)],
+                                     profile="foot", steps=True, client=osrm_client)
+        except osrm.OSRMError:
+            route = None
         
-        if walk_resp.get("routes"):
-            route = walk_resp["routes"][0]
+        if route:
             total_distance = route["distance"]
             total_duration = route["duration"]
             
@@ -274,7 +257,7 @@ async def enhanced_route(req: RouteRequest):
         "duration_s": round(total_duration),
         "walk_distance_m": round(total_distance),
         "walk_duration_min": round(total_duration / 60),
-        "polyline": polyline_out,
+        "polyline": format_polyline(polyline_out, req.polyline_format, req.zoom),
         "instructions": instructions,
         "transit_options": transit_options,
         "nearby_start_stops": start_stops[:5] if not req.walk_only else [],
@@ -296,31 +279,105 @@ class TransitDetailRequest(BaseModel):
     stop_lat: float
     stop_lng: float
 
+
+async def _after(*deps: asyncio.Task) -> list:
+    """
+    Results of the tasks a lookup depends on. Shielded: a dependent cut off
+    by the deadline must not cancel a dependency other lookups share.
+    """
+    return await asyncio.gather(*(asyncio.shield(dep) for dep in deps))
+
+
+async def _settle(tasks: dict, timeout: float) -> dict:
+    """
+    Wait up to timeout for a graph of lookup tasks and cancel whatever is
+    still running. Returns the results of the tasks that succeeded, by
+    name; failed and unfinished ones (and so everything depending on
+    them) are left out.
+    """
+    try:
+        done, _ = await asyncio.wait(tasks.values(), timeout=timeout)
+    finally:
+        # Also when the request itself is cancelled; finished tasks ignore it
+        for task in tasks.values():
+            task.cancel()
+    return {name: task.result() for name, task in tasks.items()
+            if task in done and not task.cancelled() and task.exception() is None}
+
+
 @router.post("/transit-detail")
-async def transit_detail(req: TransitDetailRequest):
+async def transit_detail(req: TransitDetailRequest, osrm_client: httpx.AsyncClient = Depends(upstream("osrm"))):
     """Get detailed multi-modal journey options with real bus routes and MTR data"""
     
     route_options = []
     
-    end_stops = await query_nearby(req.end_lat, req.end_lng, radius_m=800, limit=20)
+    # The lookups run as a task graph: each starts as soon as what it needs
+    # is known, so the answer takes as long as the longest chain of them
+    # (nearby stops -> feeder stops -> their routes), not their sum.
+    # Stops around the destination and around the chosen stop, in one pass
+    nearby = asyncio.ensure_future(query_nearby_batch([
+        {"lat": req.end_lat, "lng": req.end_lng, "radius_m": 800, "limit": 20},
+        {"lat": req.stop_lat, "lng": req.stop_lng, "radius_m": 1500, "limit": 15, "types": ["Bus Stop"]},
+        {"lat": req.stop_lat, "lng": req.stop_lng, "radius_m": 1500, "limit": 5, "types": ["MTR"]},
+    ]))
+
+    async def walk_to_stop() -> int:
+        route = await osrm.route([(req.start_lat, req.start_lng), (req.stop_lat, req.stop_lng)],
+                                 profile="foot", client=osrm_client)
+        return round(route["distance"])
+
+    async def boarding_routes() -> list:
+        stop_id_match = re.search(r'\(([A-Z0-9-]+)\)', req.stop_name)
+        if stop_id_match:
+            stop_id = stop_id_match.group(1)
+        else:
+            stop_id = await get_stop_id_by_name(req.stop_name, req.stop_lat, req.stop_lng)
+        return await get_bus_routes_for_stop(stop_id) if stop_id else []
+
+    async def transfer() -> tuple:
+        """The interchange near the chosen stop, and the routes calling there"""
+        (end_stops, nearby_major_stops, _), = await _after(nearby)
+        interchange_stops = [s for s in nearby_major_stops if "INTERCHANGE" in s["name"].upper() or "TERMINUS" in s["name"].upper()]
+        if not interchange_stops or not any(s["type"] == "Bus Stop" for s in end_stops):
+            return None, []
+        transfer_stop = interchange_stops[0]
+        transfer_stop_match = re.search(r'\(([A-Z0-9-]+)\)', transfer_stop["name"])
+        transfer_stop_id = transfer_stop_match.group(1) if transfer_stop_match else transfer_stop.get("stop_id")
+        return transfer_stop, (await get_bus_routes_for_stop(transfer_stop_id) if transfer_stop_id else [])
+
+    async def feeder() -> list:
+        """Routes from the bus stops around the MTR station nearest the destination"""
+        (end_stops, _, nearby_mtr), = await _after(nearby)
+        mtr_stops_at_end = [s for s in end_stops if s["type"] == "MTR"]
+        if not (nearby_mtr and mtr_stops_at_end and any(s["type"] == "Bus Stop" for s in end_stops)):
+            return []
+        end_mtr = mtr_stops_at_end[0]
+        end_mtr_bus_stops = await query_nearby(end_mtr["lat"], end_mtr["lng"], radius_m=300, limit=5, types=["Bus Stop"])
+        feeder_stop_ids = []
+        for stop in end_mtr_bus_stops:
+            stop_match = re.search(r'\(([A-Z0-9-]+)\)', stop["name"])
+            feeder_stop_id = stop_match.group(1) if stop_match else stop.get("stop_id")
+            if feeder_stop_id:
+                feeder_stop_ids.append(feeder_stop_id)
+        per_stop = await asyncio.gather(*(get_bus_routes_for_stop(stop_id) for stop_id in feeder_stop_ids))
+        return [r["route"] for stop_routes in per_stop for r in stop_routes]
+
+    tasks = {"nearby": nearby, "walk": asyncio.ensure_future(walk_to_stop()),
+             "feeder": asyncio.ensure_future(feeder())}
+    if req.stop_type == "Bus":
+        tasks["boarding"] = asyncio.ensure_future(boarding_routes())
+        tasks["transfer"] = asyncio.ensure_future(transfer())
+    results = await _settle(tasks, TRANSIT_DETAIL_DEADLINE)
+
+    end_stops, nearby_major_stops, nearby_mtr = results.get("nearby", ([], [], []))
     bus_stops_at_end = [s for s in end_stops if s["type"] == "Bus Stop"]
     mtr_stops_at_end = [s for s in end_stops if s["type"] == "MTR"]
     
-    walk_to_stop_coords = f"{req.start_lng},{req.start_lat};{req.stop_lng},{req.stop_lat}"
-    walk_to_url = f"{OSRM_WALK_URL}{walk_to_stop_coords}?overview=full&geometries=geojson"
-    walk_to_resp = requests.get(walk_to_url).json()
-    initial_walk_dist = round(walk_to_resp["routes"][0]["distance"]) if walk_to_resp.get("routes") else 0
-    initial_walk_time = max(1, round(initial_walk_dist / 83.3)) if initial_walk_dist > 0 else 0
-    initial_walk_display = f"{initial_walk_dist / 1000:.1f} km" if initial_walk_dist >= 1000 else f"{initial_walk_dist}m"
+    initial_walk_dist = results.get("walk", 0)
     initial_walk_time = calculate_walk_time(initial_walk_dist) if initial_walk_dist > 0 else 0
     initial_walk_display = format_distance(initial_walk_dist)
     
-    real_bus_routes = []
-    if req.stop_type == "Bus":
-        stop_id_match = re.search(r'\(([A-Z0-9-]+)\)', req.stop_name)
-        if stop_id_match:
-            stop_id = stop_id_match.group(1)
-            real_bus_routes = await get_bus_routes_for_stop(stop_id)
+    real_bus_routes = results.get("boarding", [])
     
     unique_routes = list(set([r["route"] for r in real_bus_routes[:10]])) if real_bus_routes else []
     
@@ -366,19 +423,9 @@ async def transit_detail(req: TransitDetailRequest):
         route_options.append(direct_bus_option)
     
     if req.stop_type == "Bus" and bus_stops_at_end:
-        nearby_major_stops = await query_nearby(req.stop_lat, req.stop_lng, radius_m=1500, limit=15, types=["Bus Stop"])
+        transfer_stop, transfer_routes = results.get("transfer", (None, []))
         
-        interchange_stops = [s for s in nearby_major_stops if "INTERCHANGE" in s["name"].upper() or "TERMINUS" in s["name"].upper()]
-        
-        if interchange_stops:
-            transfer_stop = interchange_stops[0]
-            
-            transfer_stop_match = re.search(r'\(([A-Z0-9-]+)\)', transfer_stop["name"])
-            transfer_routes = []
-            if transfer_stop_match:
-                transfer_stop_id = transfer_stop_match.group(1)
-                transfer_routes = await get_bus_routes_for_stop(transfer_stop_id)
-            
+        if transfer_stop:
             second_leg_routes = list(set([r["route"] for r in transfer_routes[:8]])) if transfer_routes else []
             second_bus_str = ", ".join(second_leg_routes[:4]) if second_leg_routes else "connecting bus"
             
@@ -428,8 +475,6 @@ async def transit_detail(req: TransitDetailRequest):
             route_options.append(bus_transfer_option)
     
     if mtr_stops_at_end:
-        nearby_mtr = await query_nearby(req.stop_lat, req.stop_lng, radius_m=1500, limit=5, types=["MTR"])
-        
         if nearby_mtr:
             start_mtr = nearby_mtr[0]
             end_mtr = mtr_stops_at_end[0]
@@ -442,8 +487,12 @@ async def transit_detail(req: TransitDetailRequest):
                 mtr_instruction = f"Take {mtr_connection['line']} from {start_station_name} to {end_station_name}"
                 exit_suggestion = "Follow exit signs"
             elif mtr_connection.get("transfer_at"):
-                mtr_instruction = f"Take {mtr_connection.get('start_line', 'MTR')} to {mtr_connection['transfer_at']}, then change to {mtr_connection.get('end_line', 'connecting line')} to {end_station_name}"
-                exit_suggestion = f"Transfer at {mtr_connection['transfer_at']}"
+                mtr_instruction = mtr_journey_instruction(mtr_connection)
+                exit_suggestion = f"Transfer at {' and '.join(mtr_connection['transfers'])}"
+            elif mtr_connection.get("legs"):
+                # One line, with a walk between stations before or after it
+                mtr_instruction = mtr_journey_instruction(mtr_connection)
+                exit_suggestion = "Follow exit signs"
             else:
                 mtr_instruction = f"Take MTR from {start_station_name} to {end_station_name}"
                 exit_suggestion = "Follow exit signs"
@@ -479,15 +528,7 @@ async def transit_detail(req: TransitDetailRequest):
             route_options.append(mtr_walk_option)
             
             if bus_stops_at_end:
-                end_mtr_bus_stops = await query_nearby(end_mtr["lat"], end_mtr["lng"], radius_m=300, limit=5, types=["Bus Stop"])
-                
-                feeder_routes = []
-                if end_mtr_bus_stops:
-                    for stop in end_mtr_bus_stops:
-                        stop_match = re.search(r'\(([A-Z0-9-]+)\)', stop["name"])
-                        if stop_match:
-                            stop_routes = await get_bus_routes_for_stop(stop_match.group(1))
-                            feeder_routes.extend([r["route"] for r in stop_routes])
+                feeder_routes = results.get("feeder", [])
                 
                 unique_feeder = list(set(feeder_routes[:5]))
                 feeder_bus_str = ", ".join(unique_feeder[:3]) if unique_feeder else "feeder bus"
@@ -571,144 +612,154 @@ async def transit_detail(req: TransitDetailRequest):
 
 
 @router.post("/polyline")
-def route_polyline(req: RouteRequest):
-
-    start = f"{req.start_lng},{req.start_lat}"
-    end = f"{req.end_lng},{req.end_lat}"
+async def route_polyline(req: RouteRequest, osrm_client: httpx.AsyncClient = Depends(upstream("osrm"))):
 
-    url = f"{OSRM_URL}{start};{end}?overview=full&geometries=geojson"
-    osrm = requests.get(url).json()
-
-    coords = osrm["routes"][0]["geometry"]["coordinates"]
+    try:
+        route = await osrm.route([(req.start_lat, req.start_lng), (req.end_lat, req.end_lng)], client=osrm_client)
+    except osrm.OSRMTimeout:
+        return {"error": "Route service timeout. Please try again."}
+    except osrm.OSRMError as e:
+        return {"error": f"Routing error: {str(e)}"}
 
     return {
-        "polyline": osrm_polyline(coords),
-        "distance_m": osrm["routes"][0]["distance"],
-        "duration_s": osrm["routes"][0]["duration"]
+        "polyline": format_polyline(osrm_polyline(route["geometry"]["coordinates"]), req.polyline_format, req.zoom),
+        "distance_m": route["distance"],
+        "duration_s": route["duration"]
     }
 
 
 
 @router.post("/multistop")
-def multistop(req: MultiStopRequest):
+async def multistop(req: MultiStopRequest, osrm_client: httpx.AsyncClient = Depends(upstream("osrm"))):
 
     if len(req.points) < 2:
         return {"polyline": []}
 
-    coord_list = ";".join([f"{p['lng']},{p['lat']}" for p in req.points])
-    url = f"{OSRM_URL}{coord_list}?overview=full&geometries=geojson"
-
     try:
-        osrm = requests.get(url, timeout=10).json()
-        
-        if not osrm.get("routes") or len(osrm["routes"]) == 0:
-            return {"error": "No routes found. Please check your waypoints."}
-        
-        coords = osrm["routes"][0]["geometry"]["coordinates"]
-
-        return {
-            "polyline": osrm_polyline(coords),
-            "distance_m": osrm["routes"][0]["distance"],
-            "duration_s": osrm["routes"][0]["duration"]
-        }
-    except requests.exceptions.Timeout:
+        route = await osrm.route([(p["lat"], p["lng"]) for p in req.points], client=osrm_client)
+    except osrm.OSRMNoRoute:
+        return {"error": "No routes found. Please check your waypoints."}
+    except osrm.OSRMTimeout:
         return {"error": "Route service timeout. Please try again."}
-    except requests.exceptions.ConnectionError:
+    except osrm.OSRMUnavailable:
         return {"error": "Cannot connect to routing service. Please check your internet connection."}
-    except Exception as e:
+    except osrm.OSRMError as e:
         return {"error": f"Routing error: {str(e)}"}
 
+    return {
+        "polyline": format_polyline(osrm_polyline(route["geometry"]["coordinates"]), req.polyline_format, req.zoom),
+        "distance_m": route["distance"],
+        "duration_s": route["duration"]
+    }
+
 
 
 @router.post("/optimize")
-def optimize(req: OptimizeRequest):
+async def optimize(req: OptimizeRequest, osrm_client: httpx.AsyncClient = Depends(upstream("osrm"))):
     pts = req.points
 
     if len(pts) < 3:
         return {"error": "Need at least 3 points"}
 
-    coord_list = ";".join([f"{p['lng']},{p['lat']}" for p in pts])
-    table_url = f"http://router.project-osrm.org/table/v1/driving/{coord_list}?annotations=distance,duration"
-
-    try:
-        tbl = requests.get(table_url, timeout=10).json()
-    except requests.exceptions.Timeout:
-        return {"error": "OSRM service timeout. Please try again."}
-    except Exception as e:
-        return {"error": f"OSRM table request failed: {str(e)}"}
+    # Prefer walking distances from the local pedestrian network
+    matrix = await asyncio.to_thread(local_walking_matrix, pts)
+    if matrix is None:
+        try:
+            tbl = await osrm.table([(p["lat"], p["lng"]) for p in pts], client=osrm_client)
+        except osrm.OSRMTimeout:
+            return {"error": "OSRM service timeout. Please try again."}
+        except osrm.OSRMError as e:
+            return {"error": f"OSRM table request failed: {str(e)}"}
 
-    matrix = tbl.get("durations") or tbl.get("distances")
-    if not matrix:
-        return {"error": "OSRM table did not return a distances/durations matrix"}
+        matrix = tbl.get("durations") or tbl.get("distances")
+        if not matrix:
+            return {"error": "OSRM table did not return a distances/durations matrix"}
 
-    order = tsp.solve_tsp_nearest_2opt(matrix, start=0)
+    order = await asyncio.to_thread(tsp.solve_tsp_nearest_2opt, matrix, 0)
 
     ordered_pts = [pts[i] for i in order]
-    coord_list_ordered = ";".join([f"{p['lng']},{p['lat']}" for p in ordered_pts])
-    route_url = f"{OSRM_URL}{coord_list_ordered}?overview=full&geometries=geojson"
 
     try:
-        osrm = requests.get(route_url, timeout=10).json()
-        
-        if not osrm.get("routes") or len(osrm["routes"]) == 0:
-            return {"error": "No optimized route found.", "ordered_index": order}
-        
-        coords = osrm["routes"][0]["geometry"]["coordinates"]
-
-        return {
-            "optimized": ordered_pts,
-            "ordered_index": order,
-            "polyline": osrm_polyline(coords),
-            "distance_m": osrm["routes"][0]["distance"],
-            "duration_s": osrm["routes"][0]["duration"]
-        }
-    except requests.exceptions.Timeout:
+        route = await osrm.route([(p["lat"], p["lng"]) for p in ordered_pts], client=osrm_client)
+    except osrm.OSRMNoRoute:
+        return {"error": "No optimized route found.", "ordered_index": order}
+    except osrm.OSRMTimeout:
         return {"error": "OSRM route service timeout. Please try again.", "ordered_index": order}
-    except Exception as e:
+    except osrm.OSRMError as e:
         return {"error": f"OSRM route request failed: {str(e)}", "ordered_index": order}
 
+    return {
+        "optimized": ordered_pts,
+        "ordered_index": order,
+        "polyline": format_polyline(osrm_polyline(route["geometry"]["coordinates"]), req.polyline_format, req.zoom),
+        "distance_m": route["distance"],
+        "duration_s": route["duration"]
+    }
+
+
+@router.post("/walking-matrix")
+def walking_matrix_endpoint(req: WalkingMatrixRequest):
+    """Many-to-many walking distances (m) and durations (s) over the pedestrian network"""
+    pts = req.points
+    if not pts:
+        return {"distances": [], "durations": []}
+
+    if not PEDESTRIAN_NETWORK_LOADED:
+        return {"error": "Pedestrian network is not loaded"}
+
+    matrix = walking_matrix([(p["lat"], p["lng"]) for p in pts])
+    if matrix is None:
+        return {"error": "Some points are too far from the pedestrian network"}
+
+    # Unreachable pairs are null, as in the OSRM table response
+    distances = [[None if math.isinf(d) else round(d, 1) for d in row] for row in matrix]
+    durations = [[None if d is None else round(d / WALKING_SPEED_M_PER_MIN * 60, 1) for d in row]
+                 for row in distances]
+    return {"distances": distances, "durations": durations}
+
+
+@router.get("/walking-cache")
+def walking_cache():
+    """Size and hit/miss counters of the walking route cache (empty if the network isn't loaded)"""
+    return route_cache_stats()
+
 
 class AlternativesRequest(BaseModel):
     points: list[dict]
 
 
 @router.post('/alternatives')
-def alternatives(req: AlternativesRequest):
+async def alternatives(req: AlternativesRequest, osrm_client: httpx.AsyncClient = Depends(upstream("osrm"))):
     pts = req.points
     if not pts or len(pts) < 2:
         return {"alternatives": []}
 
-    coord_list = ";".join([f"{p['lng']},{p['lat']}" for p in pts])
-    url = f"{OSRM_URL}{coord_list}?overview=full&geometries=geojson"
+    points = [(p['lat'], p['lng']) for p in pts]
     try:
-        base = requests.get(url, timeout=10).json()
-        base_coords = base['routes'][0]['geometry']['coordinates']
+        base = await osrm.route(points, client=osrm_client)
         base_obj = {
             'name': 'In-order',
-            'polyline': osrm_polyline(base_coords),
-            'distance_m': base['routes'][0]['distance'],
-            'duration_s': base['routes'][0]['duration']
+            'polyline': osrm_polyline(base['geometry']['coordinates']),
+            'distance_m': base['distance'],
+            'duration_s': base['duration']
         }
-    except Exception as e:
+    except osrm.OSRMError:
         base_obj = None
 
     try:
-        table_coord_list = coord_list
-        table_url = f"http://router.project-osrm.org/table/v1/driving/{table_coord_list}?annotations=distance,duration"
-        tbl = requests.get(table_url, timeout=10).json()
-        matrix = tbl.get('durations') or tbl.get('distances')
+        matrix = await asyncio.to_thread(local_walking_matrix, pts)
+        if matrix is None:
+            tbl = await osrm.table(points, client=osrm_client)
+            matrix = tbl.get('durations') or tbl.get('distances')
         if matrix:
-            order = tsp.solve_tsp_nearest_2opt(matrix, start=0)
+            order = await asyncio.to_thread(tsp.solve_tsp_nearest_2opt, matrix, 0)
             ordered_pts = [pts[i] for i in order]
-            coord_list_ordered = ";".join([f"{p['lng']},{p['lat']}" for p in ordered_pts])
-            route_url = f"{OSRM_URL}{coord_list_ordered}?overview=full&geometries=geojson"
-            osrm = requests.get(route_url, timeout=10).json()
-            opt_coords = osrm['routes'][0]['geometry']['coordinates']
+            opt = await osrm.route([(p['lat'], p['lng']) for p in ordered_pts], client=osrm_client)
             opt_obj = {
                 'name': 'Optimized',
-                'polyline': osrm_polyline(opt_coords),
-                'distance_m': osrm['routes'][0]['distance'],
-                'duration_s': osrm['routes'][0]['duration'],
+                'polyline': osrm_polyline(opt['geometry']['coordinates']),
+                'distance_m': opt['distance'],
+                'duration_s': opt['duration'],
                 'ordered_index': order
             }
         else:
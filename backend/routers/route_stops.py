@@ -0,0 +1,190 @@
+"""
+KMB route-stop table, indexed both ways.
+
+The /route-stop dataset lists every stop of every route variant (route,
+bound and service type) with its sequence number: tens of thousands of
+rows, several MB of JSON. refresh_loop downloads it at startup and
+again in the background, retrying failed downloads; lookups answer from
+the in-memory index and never download it themselves. The only ones
+that wait are those arriving while the first download is in flight.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import http_clients
+
+ROUTE_STOP_URL = "https://data.etabus.gov.hk/v1/transport/kmb/route-stop"
+FETCH_TIMEOUT = 30.0
+
+# Seconds between background refreshes of the table (0 disables them); it
+# changes when KMB revises its routes, rarely more than daily
+REFRESH_TTL = float(os.getenv("ROUTE_STOPS_REFRESH_TTL", "86400"))
+
+# A refresh that returns fewer rows than this fraction of the current
+# table (e.g. a truncated download) is discarded
+_MIN_REFRESH_RATIO = 0.5
+
+# Seconds to wait after a failed or discarded download before trying again
+_RETRY_DELAY = 60.0
+
+logger = logging.getLogger(__name__)
+
+# (route, bound, service_type), as KMB writes them
+Variant = Tuple[str, str, str]
+
+
+def _seq_key(seq: Any):
+    try:
+        return 0, int(seq)
+    except (TypeError, ValueError):
+        return 1, str(seq)
+
+
+class RouteStopIndex:
+    """Stop -> the route variants calling there, and variant -> its stops in order"""
+
+    def __init__(self, rows: Iterable[Dict[str, Any]]):
+        self.variants: List[Variant] = []
+        variant_ids: Dict[Variant, int] = {}
+        calls: List[Dict[Any, str]] = []
+        # Stop -> (variant id, seq) in the order of the dataset
+        self._by_stop: Dict[str, List[Tuple[int, Any]]] = {}
+        seen = set()
+        self.rows = 0
+        for row in rows:
+            stop, route = row.get("stop"), row.get("route")
+            if not stop or not route:
+                continue
+            variant = (route, row.get("bound"), row.get("service_type"))
+            v = variant_ids.get(variant)
+            if v is None:
+                v = variant_ids[variant] = len(self.variants)
+                self.variants.append(variant)
+                calls.append({})
+            seq = row.get("seq")
+            if (v, seq, stop) in seen:
+                continue
+            seen.add((v, seq, stop))
+            calls[v][seq] = stop
+            self._by_stop.setdefault(stop, []).append((v, seq))
+            self.rows += 1
+        self._variant_ids = variant_ids
+        self._stops: List[Tuple[str, ...]] = [
+            tuple(stop for _, stop in sorted(by_seq.items(), key=lambda item: _seq_key(item[0])))
+            for by_seq in calls
+        ]
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def routes_for_stop(self, stop_id: str) -> List[Dict[str, Any]]:
+        """The route variants calling at a stop, with the stop's seq on each"""
+        return [{"route": route, "bound": bound, "service_type": service_type, "seq": seq}
+                for v, seq in self._by_stop.get(stop_id, ())
+                for route, bound, service_type in (self.variants[v],)]
+
+    def stops_for_route(self, route: str, bound: str, service_type: str) -> List[str]:
+        """The stop IDs of a route variant in seq order (empty if unknown)"""
+        v = self._variant_ids.get((route, bound, service_type))
+        return [] if v is None else list(self._stops[v])
+
+
+# "index" is only ever replaced as a whole, like the nearby stop store
+_cache: Dict[str, Any] = {
+    "index": None,
+    "refreshed_at": None,
+    # In-flight _fetch_index task shared by concurrent loaders
+    "loading": None,
+}
+
+
+def _parse(content: bytes) -> RouteStopIndex:
+    return RouteStopIndex(json.loads(content).get("data") or [])
+
+
+async def _fetch_index() -> RouteStopIndex:
+    res = await http_clients.client("kmb").get(ROUTE_STOP_URL, timeout=FETCH_TIMEOUT)
+    res.raise_for_status()
+    # Parsing and indexing several MB is CPU work; keep it off the event loop
+    return await asyncio.to_thread(_parse, res.content)
+
+
+async def _fetch_index_once() -> RouteStopIndex:
+    """Single-flight _fetch_index (see nearby_utils._build_store_once)"""
+    task: Optional[asyncio.Task] = _cache.get("loading")
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        task = asyncio.ensure_future(_fetch_index())
+        _cache["loading"] = task
+
+        def _done(t: asyncio.Task):
+            if _cache.get("loading") is t:
+                _cache["loading"] = None
+        task.add_done_callback(_done)
+    return await asyncio.shield(task)
+
+
+def _swap_index(index: RouteStopIndex):
+    _cache["index"] = index
+    _cache["refreshed_at"] = time.time()
+
+
+async def get_index() -> Optional[RouteStopIndex]:
+    """
+    The current index, or None if the table isn't loaded. A lookup never
+    starts a download (that is refresh_loop's job); before the first one
+    has finished it waits on the download in flight, if there is one.
+    """
+    task: Optional[asyncio.Task] = _cache.get("loading")
+    if _cache.get("index") is None and task is not None and task.get_loop() is asyncio.get_running_loop():
+        try:
+            # A cancelled lookup must not cancel the shared download
+            index = await asyncio.shield(task)
+        except Exception:
+            return None
+        if _cache.get("index") is None:
+            _swap_index(index)
+    return _cache.get("index")
+
+
+async def refresh_index(force: bool = False) -> bool:
+    """
+    Download the table again and swap it in. Unless forced, a table much
+    smaller than the live one is dropped. Returns whether it was installed.
+    """
+    index = await _fetch_index_once()
+    current: Optional[RouteStopIndex] = _cache.get("index")
+    if not force and current is not None and len(index) < len(current) * _MIN_REFRESH_RATIO:
+        logger.warning("route-stop refresh returned %d rows (had %d); keeping the current table",
+                       len(index), len(current))
+        return False
+    _swap_index(index)
+    return True
+
+
+async def refresh_loop(ttl: float = REFRESH_TTL):
+    """
+    Load the table, then download it again every ttl seconds (0 loads it
+    just once). A failed or discarded download is retried after
+    _RETRY_DELAY. Meant to run as a background task for the app's
+    lifetime; cancel it on shutdown.
+    """
+    while True:
+        loaded = _cache.get("index") is not None
+        if loaded and ttl <= 0:
+            return
+        due = (_cache.get("refreshed_at") or 0.0) + ttl if loaded else 0.0
+        if time.time() < due:
+            await asyncio.sleep(due - time.time())
+            continue
+        try:
+            installed = await refresh_index(force=not loaded)
+        except Exception:
+            logger.exception("route-stop download failed")
+            installed = False
+        if not installed:
+            await asyncio.sleep(_RETRY_DELAY)
@@ -0,0 +1,107 @@
+"""
+Versioned binary snapshots of flat numeric arrays.
+
+A snapshot file is a small JSON header followed by raw little-endian array
+data, each array aligned to 8 bytes:
+
+    magic (8 bytes) | header length (u32) | header JSON | padding | arrays...
+
+The header records the snapshot kind, its schema version, free-form
+metadata and the typecode/offset/length of every array. Reading maps the
+file read-only and returns zero-copy memoryviews over it, so processes that
+load the same snapshot share the same physical pages. The views support
+the buffer protocol (e.g. numpy.frombuffer) as well as plain indexing.
+"""
+
+import json
+import mmap
+import struct
+import sys
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+MAGIC = b"HKSNAP\x00\x01"
+_PREFIX = struct.Struct("<8sI")
+_ALIGN = 8
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot is missing, corrupt, or of the wrong kind/version."""
+
+
+def _padding(n: int) -> int:
+    return (-n) % _ALIGN
+
+
+def _typecode(arr) -> str:
+    return getattr(arr, "typecode", None) or arr.format
+
+
+def write_snapshot(path: Path, kind: str, version: int, arrays: Dict[str, Any], meta: Dict[str, Any] = None):
+    """Write arrays (array.array or memoryview) to path atomically."""
+    if sys.byteorder != "little":
+        raise SnapshotError("snapshots are only written on little-endian hosts")
+
+    entries = {}
+    offset = 0
+    for name, arr in arrays.items():
+        view = memoryview(arr)
+        entries[name] = {"typecode": _typecode(arr), "offset": offset, "length": len(view)}
+        offset += view.nbytes + _padding(view.nbytes)
+
+    header = json.dumps({
+        "kind": kind,
+        "version": version,
+        "meta": meta or {},
+        "arrays": entries,
+    }).encode("utf-8")
+    data_start = _PREFIX.size + len(header)
+    data_start += _padding(data_start)
+
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, len(header)))
+        f.write(header)
+        f.write(b"\x00" * (data_start - _PREFIX.size - len(header)))
+        for arr in arrays.values():
+            view = memoryview(arr).cast("B")
+            f.write(view)
+            f.write(b"\x00" * _padding(view.nbytes))
+    tmp.replace(path)
+
+
+def read_snapshot(path: Path, kind: str, version: int) -> Tuple[Dict[str, memoryview], Dict[str, Any]]:
+    """Memory-map a snapshot and return (arrays, meta); raises SnapshotError."""
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"cannot map {path}: {e}") from e
+
+    if len(mm) < _PREFIX.size:
+        raise SnapshotError(f"{path} is truncated")
+    magic, header_len = _PREFIX.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise SnapshotError(f"{path} is not a snapshot file")
+    try:
+        header = json.loads(mm[_PREFIX.size:_PREFIX.size + header_len].decode("utf-8"))
+    except ValueError as e:
+        raise SnapshotError(f"{path} has a corrupt header") from e
+    if header.get("kind") != kind or header.get("version") != version:
+        raise SnapshotError(
+            f"{path} holds {header.get('kind')} v{header.get('version')}, expected {kind} v{version}"
+        )
+
+    data_start = _PREFIX.size + header_len
+    data_start += _padding(data_start)
+    buf = memoryview(mm)
+    arrays: Dict[str, memoryview] = {}
+    for name, entry in header["arrays"].items():
+        typecode = entry["typecode"]
+        start = data_start + entry["offset"]
+        end = start + entry["length"] * struct.calcsize(typecode)
+        if end > len(mm):
+            raise SnapshotError(f"{path} is truncated (array {name})")
+        arrays[name] = buf[start:end].cast(typecode)
+    return arrays, header.get("meta", {})
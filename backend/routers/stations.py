@@ -1,13 +1,14 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 import httpx
 
+from .http_clients import upstream
+
 router = APIRouter()
 
 @router.get("/bus-stops")
-async def bus_stops():
+async def bus_stops(client: httpx.AsyncClient = Depends(upstream("kmb"))):
     url = "https://data.etabus.gov.hk/v1/transport/kmb/stop"
-    async with httpx.AsyncClient() as client:
-        res = await client.get(url)
+    res = await client.get(url)
     data = res.json()
 
     stops = [
@@ -24,10 +25,9 @@ async def bus_stops():
 
 
 @router.get("/eta/{stop_id}")
-async def bus_eta(stop_id: str):
+async def bus_eta(stop_id: str, client: httpx.AsyncClient = Depends(upstream("kmb"))):
     url = f"https://data.etabus.gov.hk/v1/transport/kmb/eta/{stop_id}/"
-    async with httpx.AsyncClient() as client:
-        res = await client.get(url)
+    res = await client.get(url)
     data = res.json()
 
     eta_list = []
@@ -0,0 +1,521 @@
+"""
+Columnar (struct-of-arrays) store for the merged nearby-stop index.
+
+Instead of one dict per KMB/MTR/minibus/ferry/taxi point, rows live in
+flat arrays: lat/lng doubles, a one-byte type code, and offsets into
+UTF-8 blobs of names and source stop IDs (the KMB stop ID, the MTR
+station code). Queries work on row ids and only the rows
+that are returned get materialized as dicts.
+
+The spatial index is a multi-level grid without any per-cell objects.
+Rows are sorted by type and then by the Morton (Z-order) code of their
+base cell (BASE_CELL_DEG, about 70 m). Any aligned block of 2^L x 2^L
+base cells is then a contiguous code interval, and so a contiguous row
+range found by binary search. Each query picks the level whose blocks
+cover its radius in a handful of steps: small blocks for a 200 m query
+in Mong Kok, large ones for 3 km in the New Territories. A query
+filtered to some types only searches those types' row ranges.
+"""
+
+import heapq
+import math
+from array import array
+from bisect import bisect_left
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .snapshot_utils import SnapshotError, read_snapshot, write_snapshot
+
+try:
+    import numpy as np
+except ImportError:  # optional (see requirements.txt); a pure-Python kernel is used instead
+    np = None
+
+# WGS84 ellipsoid, for local meters-per-degree scales
+_WGS84_A = 6378137.0
+_WGS84_E2 = 6.69437999014e-3
+
+# Average walking speed used for walk_min
+WALK_M_PER_MIN = 70
+
+# Side of a level-0 cell; a level-L block is 2^L cells on a side
+BASE_CELL_DEG = 0.000625
+# Bits per axis of a cell index, counted from (-90, -180)
+_COORD_BITS = 24
+MAX_LEVEL = _COORD_BITS
+
+# A radius query aims for about this many blocks across its bounding box.
+# Each block costs a binary search per type while each row costs a distance;
+# numpy makes rows cheap, so it prefers fewer, larger blocks.
+_BLOCKS_ACROSS_NUMPY = 1.5
+_BLOCKS_ACROSS_PYTHON = 3
+
+# Smallest ring of cells worth handing to numpy in nearest()
+_MIN_VECTOR_ROWS = 64
+
+# Bump the version whenever the arrays written by StopStore.save change
+SNAPSHOT_KIND = "nearby-stops"
+SNAPSHOT_VERSION = 4
+
+Span = Tuple[int, int]
+
+
+def _span_rows(spans: List[Span]):
+    """numpy array of every row id in the given (start, end) ranges"""
+    bounds = np.array(spans, dtype=np.int64).reshape(-1, 2)
+    lengths = bounds[:, 1] - bounds[:, 0]
+    # Shift one arange by each range's start minus the rows that precede it
+    shift = np.repeat(bounds[:, 0] - (np.cumsum(lengths) - lengths), lengths)
+    return np.arange(int(lengths.sum()), dtype=np.int64) + shift
+
+
+class StopType(str, Enum):
+    """The stop types produced by the nearby_utils normalizers"""
+    BUS = "Bus Stop"
+    MINIBUS = "Minibus"
+    MTR = "MTR"
+    FERRY = "Ferry Pier"
+    TAXI = "Taxi Stand"
+
+    @classmethod
+    def parse(cls, name: str) -> Optional["StopType"]:
+        """Resolve a types filter entry: a type name or member name, any case ("mtr", "bus stop", "ferry")"""
+        return _STOP_TYPE_ALIASES.get(name.strip().lower())
+
+
+_STOP_TYPE_ALIASES = {
+    **{t.name.lower(): t for t in StopType},
+    **{t.value.lower(): t for t in StopType},
+}
+
+
+def _spread(n: int) -> int:
+    """Spread the bits of n out to every other bit position"""
+    n &= 0xFFFFFFFF
+    n = (n | (n << 16)) & 0x0000FFFF0000FFFF
+    n = (n | (n << 8)) & 0x00FF00FF00FF00FF
+    n = (n | (n << 4)) & 0x0F0F0F0F0F0F0F0F
+    n = (n | (n << 2)) & 0x3333333333333333
+    n = (n | (n << 1)) & 0x5555555555555555
+    return n
+
+
+def morton(ix: int, iy: int) -> int:
+    """Z-order code of a cell (or of a block, from its block indices)"""
+    return (_spread(ix) << 1) | _spread(iy)
+
+
+def meters_per_degree(lat: float) -> Tuple[float, float]:
+    """Meters per degree of latitude and longitude on the WGS84 ellipsoid at lat"""
+    phi = math.radians(lat)
+    w = 1.0 - _WGS84_E2 * math.sin(phi) ** 2
+    per_rad_lat = _WGS84_A * (1.0 - _WGS84_E2) / (w * math.sqrt(w))
+    per_rad_lng = _WGS84_A / math.sqrt(w) * math.cos(phi)
+    return math.radians(per_rad_lat), math.radians(per_rad_lng)
+
+
+class StopStore:
+    """Stops as parallel arrays, sorted by type and Morton cell code"""
+
+    def __init__(self, lat: array, lng: array, type_codes: array, type_names: List[str],
+                 name_offsets: array, names: bytes, stop_id_offsets: array, stop_ids: bytes,
+                 cell_codes: array, type_starts: array, cell_size_deg: float):
+        self.lat = lat
+        self.lng = lng
+        self.type_codes = type_codes
+        self.type_names = type_names
+        self.name_offsets = name_offsets
+        self.names = names
+        self.stop_id_offsets = stop_id_offsets
+        self.stop_ids = stop_ids
+        self.cell_codes = cell_codes
+        self.type_starts = type_starts
+        self.cell_size_deg = cell_size_deg
+        self._type_lookup = {kind.lower(): code for code, kind in enumerate(type_names)}
+        self._type_extent: Dict[int, Optional[Tuple[float, float, float, float]]] = {}
+        if np is not None and len(lat):
+            self._lat_np = np.frombuffer(lat, dtype=np.float64)
+            self._lng_np = np.frombuffer(lng, dtype=np.float64)
+            self._type_np = np.frombuffer(type_codes, dtype=np.uint8)
+        else:
+            self._lat_np = self._lng_np = self._type_np = None
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    @classmethod
+    def build(cls, points: Iterable[Dict[str, Any]], cell_size_deg: float = BASE_CELL_DEG) -> "StopStore":
+        """
+        Pack normalized points ({name, type, lat, lng}, optionally stop_id)
+        into a store. The StopType members always get codes 0-4 in
+        declaration order; any other type string is interned after them.
+        """
+        if 360.0 / cell_size_deg >= 1 << _COORD_BITS:
+            raise ValueError(f"cell size {cell_size_deg} is too fine for {_COORD_BITS}-bit cell indices")
+        type_names: List[str] = [t.value for t in StopType]
+        type_index: Dict[str, int] = {kind: code for code, kind in enumerate(type_names)}
+        keyed = []
+        for p in points:
+            kind = p.get("type") or ""
+            if kind not in type_index:
+                type_index[kind] = len(type_names)
+                type_names.append(kind)
+            ix, iy = cls._cell(p["lat"], p["lng"], cell_size_deg)
+            keyed.append((type_index[kind], morton(ix, iy), p))
+        keyed.sort(key=lambda item: (item[0], item[1]))
+
+        lat, lng = array('d'), array('d')
+        type_codes = array('B')
+        name_offsets = array('i', [0])
+        names = bytearray()
+        stop_id_offsets = array('i', [0])
+        stop_ids = bytearray()
+        cell_codes = array('q')
+        counts = [0] * len(type_names)
+
+        for code, cell, p in keyed:
+            lat.append(p["lat"])
+            lng.append(p["lng"])
+            type_codes.append(code)
+            names += (p.get("name") or "").encode("utf-8")
+            name_offsets.append(len(names))
+            stop_ids += str(p.get("stop_id") or "").encode("utf-8")
+            stop_id_offsets.append(len(stop_ids))
+            cell_codes.append(cell)
+            counts[code] += 1
+
+        type_starts = array('i', [0])
+        for count in counts:
+            type_starts.append(type_starts[-1] + count)
+        return cls(lat, lng, type_codes, type_names, name_offsets, bytes(names), stop_id_offsets,
+                   bytes(stop_ids), cell_codes, type_starts, cell_size_deg)
+
+    def save(self, snapshot_file: Path, meta: Optional[Dict[str, Any]] = None):
+        """Write the store as a binary snapshot; meta is stored alongside"""
+        write_snapshot(snapshot_file, SNAPSHOT_KIND, SNAPSHOT_VERSION, {
+            "lat": self.lat,
+            "lng": self.lng,
+            "type_codes": self.type_codes,
+            "name_offsets": self.name_offsets,
+            "names": array('B', self.names),
+            "stop_id_offsets": self.stop_id_offsets,
+            "stop_ids": array('B', self.stop_ids),
+            "cell_codes": self.cell_codes,
+            "type_starts": self.type_starts,
+        }, meta={**(meta or {}), "type_names": self.type_names, "cell_size_deg": self.cell_size_deg})
+
+    @classmethod
+    def load(cls, snapshot_file: Path) -> Tuple["StopStore", Dict[str, Any]]:
+        """
+        Map a snapshot written by save; returns (store, meta). All arrays
+        but the names and stop IDs stay memory-mapped. Raises SnapshotError.
+        """
+        arrays, meta = read_snapshot(snapshot_file, SNAPSHOT_KIND, SNAPSHOT_VERSION)
+        try:
+            store = cls(arrays["lat"], arrays["lng"], arrays["type_codes"], list(meta["type_names"]),
+                        arrays["name_offsets"], bytes(arrays["names"]), arrays["stop_id_offsets"],
+                        bytes(arrays["stop_ids"]), arrays["cell_codes"], arrays["type_starts"],
+                        meta["cell_size_deg"])
+        except KeyError as e:
+            raise SnapshotError(f"{snapshot_file} is missing {e}") from e
+        n = len(store)
+        if not (len(store.lng) == len(store.type_codes) == len(store.cell_codes) == len(store.name_offsets) - 1
+                == len(store.stop_id_offsets) - 1 == n
+                and len(store.type_starts) == len(store.type_names) + 1 and store.type_starts[-1] == n):
+            raise SnapshotError(f"{snapshot_file} has inconsistent array lengths")
+        return store, meta
+
+    def name(self, row: int) -> Optional[str]:
+        raw = self.names[self.name_offsets[row]:self.name_offsets[row + 1]]
+        return raw.decode("utf-8") if raw else None
+
+    def stop_id(self, row: int) -> Optional[str]:
+        raw = self.stop_ids[self.stop_id_offsets[row]:self.stop_id_offsets[row + 1]]
+        return raw.decode("utf-8") if raw else None
+
+    def type_codes_for(self, types: Optional[Sequence[str]]) -> Optional[List[int]]:
+        """
+        Resolve a types filter once per query: StopType names and aliases
+        or any stored type name, case-insensitive. None means no filter; an
+        empty list means nothing matches.
+        """
+        if not types:
+            return None
+        codes = set()
+        for name in types:
+            kind = StopType.parse(name)
+            code = self._type_lookup.get(kind.value.lower() if kind else name.strip().lower())
+            if code is not None:
+                codes.add(code)
+        return sorted(codes)
+
+    @staticmethod
+    def _cell(lat: float, lng: float, cell_size_deg: float) -> Tuple[int, int]:
+        """Base cell indices, counted from (-90, -180) so they are never negative"""
+        return int((lat + 90.0) // cell_size_deg), int((lng + 180.0) // cell_size_deg)
+
+    def _level_for(self, lat: float, radius_m: float) -> int:
+        """Block level putting a few blocks across the bounding box of the circle"""
+        _, kx = meters_per_degree(lat)
+        # Longitude degrees are the shorter ones, so this is the wider side
+        cells_across = 2.0 * radius_m / kx / self.cell_size_deg
+        wanted = cells_across / (_BLOCKS_ACROSS_NUMPY if self._lat_np is not None else _BLOCKS_ACROSS_PYTHON)
+        if wanted <= 1.0:
+            return 0
+        return min(math.ceil(math.log2(wanted)), MAX_LEVEL)
+
+    def _block_spans(self, blocks: Iterable[Tuple[int, int]], level: int, codes: Optional[Sequence[int]]) -> List[Span]:
+        """Row ranges of the given level blocks, in the given types (all if None)"""
+        # Blocks with consecutive Morton codes are one code interval
+        prefixes = sorted(morton(bx, by) for bx, by in blocks)
+        intervals = []
+        for prefix in prefixes:
+            if intervals and intervals[-1][1] == prefix:
+                intervals[-1][1] = prefix + 1
+            else:
+                intervals.append([prefix, prefix + 1])
+        shift = 2 * level
+
+        cell_codes, type_starts = self.cell_codes, self.type_starts
+        spans: List[Span] = []
+        for code in (range(len(self.type_names)) if codes is None else codes):
+            lo_row, hi_row = type_starts[code], type_starts[code + 1]
+            for first, last in intervals:
+                if lo_row >= hi_row:
+                    break
+                start = bisect_left(cell_codes, first << shift, lo_row, hi_row)
+                end = bisect_left(cell_codes, last << shift, start, hi_row)
+                if start < end:
+                    # Rows are sorted, so later intervals start past this one
+                    if spans and spans[-1][1] == start:
+                        spans[-1] = (spans[-1][0], end)
+                    else:
+                        spans.append((start, end))
+                lo_row = end
+        return spans
+
+    def _spans_for(self, lat: float, lng: float, radius_m: float, codes: Optional[Sequence[int]],
+                   level: Optional[int] = None) -> List[Span]:
+        """Row ranges covering the bounding box of a circle, at the given block level (picked per radius if None)"""
+        if level is None:
+            level = self._level_for(lat, radius_m)
+        ky, kx = meters_per_degree(lat)
+        lat_deg, lng_deg = radius_m / ky, radius_m / kx
+        ix0, iy0 = self._cell(lat - lat_deg, lng - lng_deg, self.cell_size_deg)
+        ix1, iy1 = self._cell(lat + lat_deg, lng + lng_deg, self.cell_size_deg)
+        blocks = [(bx, by) for bx in range(ix0 >> level, (ix1 >> level) + 1)
+                  for by in range(iy0 >> level, (iy1 >> level) + 1)]
+        return self._block_spans(blocks, level, codes)
+
+    def within(self, lat: float, lng: float, radius_m: float, codes: Optional[List[int]] = None,
+               limit: Optional[int] = None, level: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Rows within radius_m of (lat, lng), optionally restricted to type
+        codes, as (row, distance in meters) nearest first.
+        Distances are equirectangular with the ellipsoid's local scales,
+        which agrees with geodesic to well under a meter within a few km.
+        level pins the block level (for benchmarks); by default it is
+        picked from the radius.
+        """
+        rows, dists = self._ranked(lat, lng, radius_m, codes, level)
+        return self._hits(rows, dists, limit)
+
+    def within_many(self, queries: Sequence[Tuple[float, float, float, Optional[List[int]], Optional[int]]]
+                    ) -> List[List[Tuple[int, float]]]:
+        """
+        Batch form of within: queries are (lat, lng, radius_m, codes, limit)
+        and the result lists come back in the same order, equal to within's.
+        With numpy the whole batch is one distance pass: every query's rows
+        are gathered together, measured from their query's center in one
+        vectorized step, then sorted by query and distance in one more, so
+        a batch pays numpy's per-call overhead once rather than per query.
+        Without numpy each query is answered on its own.
+        """
+        spans = [self._spans_for(lat, lng, radius_m, codes) for lat, lng, radius_m, codes, _ in queries]
+        if self._lat_np is None:
+            return [self._hits(*self._ranked(lat, lng, radius_m, codes, spans=spans[i]), limit)
+                    for i, (lat, lng, radius_m, codes, limit) in enumerate(queries)]
+
+        owners = [i for i, ss in enumerate(spans) for _ in ss]
+        flat = [span for ss in spans for span in ss]
+        if not flat:
+            return [[] for _ in queries]
+        rows = _span_rows(flat)
+        # Query of each gathered row
+        query = np.repeat(np.array(owners, dtype=np.int64), [end - start for start, end in flat])
+        scales = np.array([meters_per_degree(lat) for lat, _, _, _, _ in queries])
+        centers = np.array([(lat, lng, radius_m) for lat, lng, radius_m, _, _ in queries], dtype=np.float64)
+        dists = np.hypot((self._lat_np[rows] - centers[query, 0]) * scales[query, 0],
+                         (self._lng_np[rows] - centers[query, 1]) * scales[query, 1])
+        keep = dists <= centers[query, 2]
+        rows, dists, query = rows[keep], dists[keep], query[keep]
+        # By query, then distance; stable, so ties stay in row order as in within
+        order = np.lexsort((dists, query))
+        rows, dists, query = rows[order], dists[order], query[order]
+        bounds = np.searchsorted(query, np.arange(len(queries) + 1)).tolist()
+        return [self._hits(rows[bounds[i]:bounds[i + 1]], dists[bounds[i]:bounds[i + 1]], limit)
+                for i, (_, _, _, _, limit) in enumerate(queries)]
+
+    def _hits(self, rows, dists, limit: Optional[int]) -> List[Tuple[int, float]]:
+        """within's result from _ranked's (rows, distances)"""
+        if limit is not None and limit <= 0:
+            return []
+        if self._lat_np is not None:
+            return list(zip(rows[:limit].tolist(), dists[:limit].tolist()))
+        return list(zip(rows[:limit], dists[:limit]))
+
+    def _ranked(self, lat: float, lng: float, radius_m: float, codes: Optional[Sequence[int]],
+                level: Optional[int] = None, spans: Optional[List[Span]] = None):
+        """
+        (rows, distances) of every row of the given types within radius_m,
+        nearest first; spans, if given, are the query's from _spans_for
+        """
+        if spans is None:
+            spans = self._spans_for(lat, lng, radius_m, codes, level)
+        ky, kx = meters_per_degree(lat)
+        if self._lat_np is not None:
+            if not spans:
+                return np.empty(0, dtype=np.int64), np.empty(0)
+            rows = _span_rows(spans)
+            dists = np.hypot((self._lat_np[rows] - lat) * ky, (self._lng_np[rows] - lng) * kx)
+            keep = dists <= radius_m
+            rows, dists = rows[keep], dists[keep]
+            order = np.argsort(dists, kind="stable")
+            return rows[order], dists[order]
+        lats, lngs = self.lat, self.lng
+        hits = []
+        for start, end in spans:
+            for row in range(start, end):
+                d = math.hypot((lats[row] - lat) * ky, (lngs[row] - lng) * kx)
+                if d <= radius_m:
+                    hits.append((row, d))
+        hits.sort(key=lambda hit: hit[1])
+        return [row for row, _ in hits], [d for _, d in hits]
+
+    def _extent(self, code: int) -> Optional[Tuple[float, float, float, float]]:
+        """(min lat, max lat, min lng, max lng) of a type's rows; None if it has none"""
+        if code not in self._type_extent:
+            start, end = self.type_starts[code], self.type_starts[code + 1]
+            if start == end:
+                self._type_extent[code] = None
+            else:
+                lats, lngs = self.lat[start:end], self.lng[start:end]
+                self._type_extent[code] = (min(lats), max(lats), min(lngs), max(lngs))
+        return self._type_extent[code]
+
+    @staticmethod
+    def _ring(cx: int, cy: int, r: int, bounds: Tuple[int, int, int, int]) -> List[Tuple[int, int]]:
+        """Blocks at Chebyshev distance exactly r from (cx, cy), within bounds"""
+        min_x, max_x, min_y, max_y = bounds
+        if r == 0:
+            return [(cx, cy)] if min_x <= cx <= max_x and min_y <= cy <= max_y else []
+        ys = range(max(cy - r, min_y), min(cy + r, max_y) + 1)
+        xs = range(max(cx - r + 1, min_x), min(cx + r - 1, max_x) + 1)
+        blocks = [(bx, by) for bx in (cx - r, cx + r) if min_x <= bx <= max_x for by in ys]
+        blocks += [(bx, by) for by in (cy - r, cy + r) if min_y <= by <= max_y for bx in xs]
+        return blocks
+
+    def nearest(self, lat: float, lng: float, k: int, codes: Optional[List[int]] = None,
+                max_radius_m: Optional[float] = None) -> List[Tuple[int, float]]:
+        """
+        The k rows nearest to (lat, lng), optionally restricted to type codes
+        and to max_radius_m, as (row, distance in meters) nearest first.
+        Searches rings of blocks (sized from the types' density and k)
+        outward from the query's block, keeping
+        the best k in a bounded heap, and stops as soon as the k-th distance
+        is no larger than the closest any block outside the searched area
+        can be, so sparse areas don't need a radius that happens to fit.
+        Rings are clipped to the blocks the types span and start at the
+        first one reaching them, so a query far outside that area costs
+        no more than one inside it.
+        """
+        extents = [e for e in (self._extent(code) for code in (range(len(self.type_names)) if codes is None else codes)) if e]
+        if k <= 0 or not extents:
+            return []
+
+        size = self.cell_size_deg
+        # Blocks that would hold about k of the requested rows if they were
+        # spread evenly over their extent: big blocks for sparse types
+        rows = sum(self.type_starts[code + 1] - self.type_starts[code]
+                   for code in (range(len(self.type_names)) if codes is None else codes))
+        area = ((max(e[1] for e in extents) - min(e[0] for e in extents)) / size + 1) * \
+               ((max(e[3] for e in extents) - min(e[2] for e in extents)) / size + 1)
+        level = min(max(0, math.ceil(math.log(k * area / rows, 4))), MAX_LEVEL) if k * area > rows else 0
+        block_deg = size * (1 << level)
+        cx, cy = self._cell(lat, lng, size)
+        cx, cy = cx >> level, cy >> level
+        # Blocks spanned by the requested types; past them there is nothing to find
+        min_x = self._cell(min(e[0] for e in extents), 0.0, size)[0] >> level
+        max_x = self._cell(max(e[1] for e in extents), 0.0, size)[0] >> level
+        min_y = self._cell(0.0, min(e[2] for e in extents), size)[1] >> level
+        max_y = self._cell(0.0, max(e[3] for e in extents), size)[1] >> level
+        # Query position relative to the origin of the block indices
+        qx, qy = lat + 90.0, lng + 180.0
+
+        ky, kx = meters_per_degree(lat)
+        vectorized = self._lat_np is not None
+        limit = max_radius_m if max_radius_m is not None else math.inf
+        heap: List[Tuple[float, int]] = []  # (-distance, row), the worst of the best k on top
+
+        def outside(r: int) -> float:
+            """How far everything outside the (2r+1)-block square around the query is, at least"""
+            return min((qx - (cx - r) * block_deg) * ky, ((cx + r + 1) * block_deg - qx) * ky,
+                       (qy - (cy - r) * block_deg) * kx, ((cy + r + 1) * block_deg - qy) * kx)
+
+        # Rings closer in than the types' blocks are empty
+        r = max(0, min_x - cx, cx - max_x, min_y - cy, cy - max_y)
+        if r > 0 and outside(r - 1) > limit:
+            return []
+        bounds = (min_x, max_x, min_y, max_y)
+        while True:
+            spans = self._block_spans(self._ring(cx, cy, r, bounds), level, codes)
+            # numpy's per-call overhead only pays off on well-filled rings
+            if vectorized and sum(end - start for start, end in spans) >= _MIN_VECTOR_ROWS:
+                rows = _span_rows(spans)
+                dists = np.hypot((self._lat_np[rows] - lat) * ky, (self._lng_np[rows] - lng) * kx)
+                if len(dists) > k:
+                    best = np.argpartition(dists, k - 1)[:k]
+                    rows, dists = rows[best], dists[best]
+                candidates = zip(rows.tolist(), dists.tolist())
+            elif spans:
+                lats, lngs = self.lat, self.lng
+                candidates = (
+                    (row, math.hypot((lats[row] - lat) * ky, (lngs[row] - lng) * kx))
+                    for start, end in spans for row in range(start, end)
+                )
+            else:
+                candidates = ()
+            for row, d in candidates:
+                if d > limit:
+                    continue
+                if len(heap) < k:
+                    heapq.heappush(heap, (-d, row))
+                elif d < -heap[0][0]:
+                    heapq.heapreplace(heap, (-d, row))
+
+            # Everything outside the square searched so far is at least this far away
+            beyond = outside(r)
+            if len(heap) == k and -heap[0][0] <= beyond:
+                break
+            if beyond > limit:
+                break
+            if cx - r <= min_x and cx + r >= max_x and cy - r <= min_y and cy + r >= max_y:
+                break
+            r += 1
+
+        return sorted(((row, -neg) for neg, row in heap), key=lambda hit: hit[1])
+
+    def row(self, row: int, distance: Optional[float] = None) -> Dict[str, Any]:
+        """Materialize one row in the shape query_nearby returns"""
+        item = {
+            "name": self.name(row),
+            "type": self.type_names[self.type_codes[row]],
+            "lat": self.lat[row],
+            "lng": self.lng[row],
+            "stop_id": self.stop_id(row),
+        }
+        if distance is not None:
+            item["distance"] = round(distance)
+            item["walk_min"] = round(distance / WALK_M_PER_MIN)
+        return item